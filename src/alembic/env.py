@@ -23,6 +23,10 @@ from models.eco_action import EcoAction # noqa
 from models.eco_action_achievement import EcoActionAchievement # noqa
 from models.overall_statistics import OverallStats # noqa
 from models.user_statistics import UserStatistics # noqa
+from models.email_outbox import EmailOutbox # noqa
+from models.achievement_reconciliation import AchievementReconciliation # noqa
+from models.job import Job # noqa
+from models.sync_tombstone import SyncTombstone # noqa
 
 
 
@@ -0,0 +1,38 @@
+"""達成記録の外部キーにON DELETE CASCADEを設定
+
+Revision ID: a3d8f6c2e9b1
+Revises: f8c1e5a7d392
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d8f6c2e9b1'
+down_revision: Union[str, Sequence[str], None] = 'f8c1e5a7d392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # これまでの削除でschedule_idがNULLになった達成記録は、どのスケジュールにも属さないので削除する
+    op.execute("DELETE FROM eco_action_achievements WHERE schedule_id IS NULL")
+    # 名前を付けずに作成した外部キー(Postgresが付けた名前)を、ON DELETE CASCADE付きで作り直す
+    op.drop_constraint('eco_action_achievements_schedule_id_fkey', 'eco_action_achievements', type_='foreignkey')
+    op.create_foreign_key(
+        'fk_eco_action_achievements_schedule_id', 'eco_action_achievements', 'schedules',
+        ['schedule_id'], ['schedule_id'], ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_eco_action_achievements_schedule_id', 'eco_action_achievements', type_='foreignkey')
+    op.create_foreign_key(
+        'eco_action_achievements_schedule_id_fkey', 'eco_action_achievements', 'schedules',
+        ['schedule_id'], ['schedule_id']
+    )
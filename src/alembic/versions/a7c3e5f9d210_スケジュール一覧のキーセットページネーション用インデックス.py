@@ -0,0 +1,36 @@
+"""スケジュール一覧のキーセットページネーション用インデックス
+
+Revision ID: a7c3e5f9d210
+Revises: f2a9c4e7b813
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5f9d210'
+down_revision: Union[str, Sequence[str], None] = 'f2a9c4e7b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (user_id, start_schedule)のインデックスを、並び順のタイブレークのschedule_idまで含むものに置き換える
+    op.create_index(
+        'ix_schedules_user_id_start_schedule_schedule_id',
+        'schedules',
+        ['user_id', 'start_schedule', 'schedule_id'],
+        unique=False,
+    )
+    op.drop_index('ix_schedules_user_id_start_schedule', table_name='schedules')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_schedules_user_id_start_schedule', 'schedules', ['user_id', 'start_schedule'], unique=False)
+    op.drop_index('ix_schedules_user_id_start_schedule_schedule_id', table_name='schedules')
@@ -0,0 +1,28 @@
+"""スケジュールの終了日時のインデックスを追加
+
+Revision ID: b5d8f1a3c6e9
+Revises: a7c3e5f9d210
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8f1a3c6e9'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e5f9d210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_schedules_user_id_end_schedule', 'schedules', ['user_id', 'end_schedule'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_schedules_user_id_end_schedule', table_name='schedules')
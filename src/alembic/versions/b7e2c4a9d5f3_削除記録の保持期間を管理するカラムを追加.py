@@ -0,0 +1,30 @@
+"""削除記録の保持期間を管理するカラムを追加
+
+Revision ID: b7e2c4a9d5f3
+Revises: a3d8f6c2e9b1
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c4a9d5f3'
+down_revision: Union[str, Sequence[str], None] = 'a3d8f6c2e9b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('sync_pruned_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_column('users', 'sync_pruned_version')
@@ -0,0 +1,46 @@
+"""リフレッシュトークンを端末ごとのセッションに変更
+
+Revision ID: c3f1a7d29e54
+Revises: 5fa0a0aee1fd
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a7d29e54'
+down_revision: Union[str, Sequence[str], None] = '5fa0a0aee1fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 既存のトークンは1ユーザー1件なので、'default'端末のセッションとして扱う
+    op.add_column('refresh_tokens', sa.Column('device_id', sa.String(), server_default='default', nullable=False))
+    op.alter_column('refresh_tokens', 'device_id', server_default=None)
+
+    op.add_column('refresh_tokens', sa.Column('last_used_at', sa.DateTime(), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('revoked_at', sa.DateTime(), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('replaced_by_id', sa.UUID(), nullable=True))
+    op.create_foreign_key(
+        'fk_refresh_tokens_replaced_by_id', 'refresh_tokens', 'refresh_tokens',
+        ['replaced_by_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index('ix_refresh_tokens_user_id_device_id', 'refresh_tokens', ['user_id', 'device_id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_user_id_device_id', table_name='refresh_tokens')
+    op.drop_constraint('fk_refresh_tokens_replaced_by_id', 'refresh_tokens', type_='foreignkey')
+    op.drop_column('refresh_tokens', 'replaced_by_id')
+    op.drop_column('refresh_tokens', 'revoked_at')
+    op.drop_column('refresh_tokens', 'last_used_at')
+    op.drop_column('refresh_tokens', 'device_id')
@@ -0,0 +1,36 @@
+"""達成記録の再計算キューのテーブルを追加
+
+Revision ID: c9e2a4b7d815
+Revises: b5d8f1a3c6e9
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e2a4b7d815'
+down_revision: Union[str, Sequence[str], None] = 'b5d8f1a3c6e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('achievement_reconciliations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('category_id', sa.UUID(), nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_achievement_reconciliations_category_id', 'achievement_reconciliations', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_achievement_reconciliations_category_id', table_name='achievement_reconciliations')
+    op.drop_table('achievement_reconciliations')
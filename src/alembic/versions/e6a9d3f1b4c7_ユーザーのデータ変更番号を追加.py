@@ -0,0 +1,28 @@
+"""ユーザーのデータ変更番号を追加
+
+Revision ID: e6a9d3f1b4c7
+Revises: d4f7b2c8e1a6
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a9d3f1b4c7'
+down_revision: Union[str, Sequence[str], None] = 'd4f7b2c8e1a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'data_version')
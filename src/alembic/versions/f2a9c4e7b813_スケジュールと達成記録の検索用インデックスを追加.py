@@ -0,0 +1,62 @@
+"""スケジュールと達成記録の検索用インデックスを追加
+
+Revision ID: f2a9c4e7b813
+Revises: e8b4d0c6a1f2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9c4e7b813'
+down_revision: Union[str, Sequence[str], None] = 'e8b4d0c6a1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ユニーク制約を付ける前に、同じスケジュール・エコ活動の重複した達成記録を1件にまとめる
+    # 達成済みのもの、達成日時が新しいものを残す
+    op.execute(
+        """
+        DELETE FROM eco_action_achievements
+        WHERE achievement_id IN (
+            SELECT achievement_id FROM (
+                SELECT
+                    achievement_id,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY schedule_id, eco_action_id
+                        ORDER BY is_completed DESC, achieved_at DESC NULLS LAST, achievement_id
+                    ) AS row_number
+                FROM eco_action_achievements
+                WHERE schedule_id IS NOT NULL AND eco_action_id IS NOT NULL
+            ) AS ranked
+            WHERE ranked.row_number > 1
+        )
+        """
+    )
+    op.create_unique_constraint(
+        'uq_eco_action_achievements_schedule_id_eco_action_id',
+        'eco_action_achievements',
+        ['schedule_id', 'eco_action_id'],
+    )
+    op.create_index(op.f('ix_eco_action_achievements_eco_action_id'), 'eco_action_achievements', ['eco_action_id'], unique=False)
+
+    op.create_index('ix_schedules_user_id_start_schedule', 'schedules', ['user_id', 'start_schedule'], unique=False)
+    op.create_index(op.f('ix_schedules_category_id'), 'schedules', ['category_id'], unique=False)
+
+    op.create_index(op.f('ix_eco_actions_category_id'), 'eco_actions', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_eco_actions_category_id'), table_name='eco_actions')
+    op.drop_index(op.f('ix_schedules_category_id'), table_name='schedules')
+    op.drop_index('ix_schedules_user_id_start_schedule', table_name='schedules')
+    op.drop_index(op.f('ix_eco_action_achievements_eco_action_id'), table_name='eco_action_achievements')
+    op.drop_constraint('uq_eco_action_achievements_schedule_id_eco_action_id', 'eco_action_achievements', type_='unique')
@@ -0,0 +1,50 @@
+"""差分同期用の変更番号と削除記録を追加
+
+Revision ID: f8c1e5a7d392
+Revises: e6a9d3f1b4c7
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8c1e5a7d392'
+down_revision: Union[str, Sequence[str], None] = 'e6a9d3f1b4c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('schedules', sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(
+        'ix_schedules_user_id_sync_version_schedule_id', 'schedules', ['user_id', 'sync_version', 'schedule_id'], unique=False
+    )
+    op.add_column('eco_action_achievements', sa.Column('sync_version', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('entity_type', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.UUID(), nullable=False),
+    sa.Column('sync_version', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_sync_tombstones_user_id_sync_version_entity_id', 'sync_tombstones', ['user_id', 'sync_version', 'entity_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sync_tombstones_user_id_sync_version_entity_id', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_column('eco_action_achievements', 'sync_version')
+    op.drop_index('ix_schedules_user_id_sync_version_schedule_id', table_name='schedules')
+    op.drop_column('schedules', 'sync_version')
@@ -1,18 +1,20 @@
 import os
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Form, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from main import templates 
 from core.token import create_access_token, create_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from core.email_verification import send_message, verify_verification_token
-from crud.user import authenticate_user, get_user_by_email, get_user_by_google_id, create_user as crud_create_user
-from crud.refresh_token import get_user_by_refresh_token, insert_refresh_token
+from core.email_verification import enqueue_verification_email, verify_verification_token
+from core.google_verifier import google_verifier
+from core.rate_limit import rate_limiter
+from crud.user import get_user_by_email
+from crud.aio.user import authenticate_user, get_user_by_email as get_user_by_email_async, get_user_by_google_id, create_user as crud_create_user
+from crud.aio.refresh_token import rotate_refresh_token, insert_refresh_token
 from schemas.user import TokenResponse, GoogleAuthResponse
-from db.session import get_db
+from db.session import get_db, get_async_db
 
 load_dotenv()
 # define the rule to get token from the request
@@ -22,9 +24,18 @@ router = APIRouter()
 
 # authentication and token generation
 @router.post("/auth/login/", response_model=TokenResponse, tags=["auth"])
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    device_id: str | None = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # bcryptの検証やメール送信の前に、IPアドレスとメールアドレスごとの頻度を確認する
+    await rate_limiter.check(request, scope="login", email=form_data.username)
+
     # verify user credentials and generate token
-    user = authenticate_user(db, email=form_data.username, password=form_data.password)
+    # bcryptの検証は専用のプロセスプールで行い、その間イベントループは他のリクエストを処理できる
+    user = await authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,7 +45,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 
     # existing user but not active
     if not user.is_active:
-        send_message(user.email)
+        await db.run_sync(enqueue_verification_email, user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="メールアドレスが確認されていません。確認メールを再送信しました。",
@@ -45,8 +56,9 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         data={"sub": user.email} # sub is the unique identifier in JWT, typically the user ID or email
     )
     # create refresh token and store it in the database
+    # 端末ごとにセッションを保存するので、他の端末のログイン状態は維持される
     refresh_token = create_refresh_token()
-    insert_refresh_token(db=db, user_id=user.id, refresh_token=refresh_token)
+    db_refresh_token = await insert_refresh_token(db=db, user_id=user.id, refresh_token=refresh_token, device_id=device_id)
     
     return {
         "id": user.id,
@@ -55,6 +67,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         "access_token": access_token,
         "token_type": "bearer",
         "refresh_token": refresh_token,
+        "device_id": db_refresh_token.device_id,
         "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60 # 秒単位で返す
     }
 
@@ -97,32 +110,34 @@ def verify_email(request: Request, token: str, db: Session = Depends(get_db)):
 
 @router.post("/auth/refresh/", response_model=TokenResponse)
 async def refresh_access_token(
+    request: Request,
     refresh_token: str = Body(..., embed=True),
     email: str = Body(..., embed=True), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # 1. DBからリフレッシュトークンを検証
-    user = get_user_by_refresh_token(db=db, email=email, refresh_token=refresh_token)
+    await rate_limiter.check(request, scope="refresh", email=email)
 
-    if not user:
+    # 1. DBからリフレッシュトークンを検証し、同じ端末の新しいトークンに交換する
+    # 古いトークンは失効し、再度使われた場合はその端末のセッションごと失効する
+    rotated = await rotate_refresh_token(db=db, email=email, refresh_token=refresh_token)
+
+    if not rotated:
         raise HTTPException(
             status_code=401,
             detail="Invalid refresh token",
         )
+    user, new_refresh_token = rotated
 
     # 2. 新しいアクセストークンを生成
     new_access_token = create_access_token(data={"sub": user.email})
 
-    # 本来なら、新しいリフレッシュトークンも発行してDBに保存し、古いリフレッシュトークンは無効化するべき
-    # ここでは簡略化のため、同じリフレッシュトークンを返す
-
     return {
         "id": user.id,
         "email": user.email,
         "is_active": user.is_active,
         "access_token": new_access_token,
         "token_type": "bearer",
-        "refresh_token": refresh_token,  # 今回は同じリフレッシュトークンを返す
+        "refresh_token": new_refresh_token,
         "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60 # 秒単位で返す
     }
 
@@ -130,18 +145,20 @@ async def refresh_access_token(
 ANDROID_CLIENT_ID = os.getenv("ANDROID_CLIENT_ID")
 
 @router.post("/auth/google", response_model=GoogleAuthResponse, tags=["auth"])
-async def verify_google_token(token: str = Body(..., embed=True), db: Session = Depends(get_db)):
+async def verify_google_token(
+    token: str = Body(..., embed=True),
+    device_id: str | None = Body(None, embed=True),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Androidアプリから受け取ったGoogle IDトークンを検証する
     """
     try:
-        # id_token.verify_oauth2_tokenが以下のトークンの検証をすべて行ってくれる
-        # - 署名の検証
+        # google_verifierが以下のトークンの検証をすべて行ってくれる
+        # - 署名の検証（メモリに保持している証明書を使うので、ネットワークアクセスは発生しない）
         # - 有効期限の確認
         # - aud（オーディエンス）がこちらのクライアントIDと一致するかの確認
-        idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), ANDROID_CLIENT_ID
-        )
+        idinfo = await google_verifier.verify_async(token, ANDROID_CLIENT_ID)
 
         # ここまで来ればトークンは正当
         # idinfoからユーザー情報を取得
@@ -150,19 +167,19 @@ async def verify_google_token(token: str = Body(..., embed=True), db: Session =
         name = idinfo.get('name')
 
         # ユーザーをデータベースから取得
-        user = get_user_by_google_id(db=db, google_id=google_user_id)
+        user = await get_user_by_google_id(db=db, google_id=google_user_id)
 
         # Googleアカウントと連携していない場合
         if not user:
-            user = get_user_by_email(db=db, email=email)
+            user = await get_user_by_email_async(db=db, email=email)
             if user:
                 user.credential.google_id = google_user_id
-                db.commit()
+                await db.commit()
             else:
                 # google_idとemailでもユーザーが存在しない場合、有効化して新規作成
-                user = crud_create_user(db=db, email=email, google_id=google_user_id)
+                user = await crud_create_user(db=db, email=email, google_id=google_user_id)
                 user.is_active = True
-                db.commit()
+                await db.commit()
 
         access_token = create_access_token(
             data={"sub": user.email} # sub is the unique identifier in JWT, typically the user ID or email
@@ -170,7 +187,7 @@ async def verify_google_token(token: str = Body(..., embed=True), db: Session =
 
         # create refresh token and store it in the database
         refresh_token = create_refresh_token()
-        insert_refresh_token(db=db, user_id=user.id, refresh_token=refresh_token)
+        db_refresh_token = await insert_refresh_token(db=db, user_id=user.id, refresh_token=refresh_token, device_id=device_id)
 
         return {
             "id": user.id,
@@ -179,6 +196,7 @@ async def verify_google_token(token: str = Body(..., embed=True), db: Session =
             "access_token": access_token,
             "token_type": "bearer",
             "refresh_token": refresh_token,
+            "device_id": db_refresh_token.device_id,
             "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60, # 秒単位で返す
             "message": "Successfully authenticated"
         }
@@ -0,0 +1,116 @@
+import hmac
+import os
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.achievement_reconciler import reconciliation_progress
+from core.hashing import hashing_service
+from core.jobs import enqueue, job_runner, registry
+from crud.job import count_jobs_by_status, get_jobs
+from core.master_data import master_data_cache
+from core.principal_cache import principal_cache
+from core.push import push_hub
+from db.pool import pool_stats
+from db.routing import replica_key, replica_lags
+from db.session import (
+    get_db, engine, async_engine, engine_pool_metrics, async_engine_pool_metrics,
+    replica_engines, async_replica_engines, replica_pool_metrics,
+)
+
+def verify_internal_token(x_internal_token: str | None = Header(None)):
+    """
+    運用向けの内部APIの認証。X-Internal-TokenヘッダーがINTERNAL_API_TOKENと一致する場合のみ許可する。
+    INTERNAL_API_TOKENが未設定の場合は、内部APIが存在しないものとして404を返す。
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token, settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(verify_internal_token)],
+    include_in_schema=False,
+)
+
+@router.get("/stats")
+def read_internal_stats():
+    """
+    ワーカー内のコネクションプール・キャッシュ・ハッシュ計算の状態を返す。
+    gunicornのワーカーごとの値なので、pidでどのワーカーの値かを区別する。
+    """
+    return {
+        "pid": os.getpid(),
+        "db_pool": {
+            "sync": pool_stats(engine, engine_pool_metrics),
+            "async": pool_stats(async_engine.sync_engine, async_engine_pool_metrics),
+        },
+        "db_replicas": [
+            {
+                "replica": replica_key(replica_engine),
+                "lag_seconds": replica_lags.get(replica_key(replica_engine)),
+                "sync": pool_stats(replica_engine, metrics),
+                "async": pool_stats(async_replica_engine.sync_engine, async_metrics),
+            }
+            for replica_engine, async_replica_engine, (metrics, async_metrics)
+            in zip(replica_engines, async_replica_engines, replica_pool_metrics)
+        ],
+        "principal_cache": principal_cache.stats(),
+        "master_data": master_data_cache.stats(),
+        "push": push_hub.stats(),
+        "hashing": hashing_service.stats(),
+        "achievement_reconciliation": reconciliation_progress.stats(),
+    }
+
+
+class JobEnqueueRequest(BaseModel):
+    kind: str
+    payload: dict = {}
+    run_at: datetime | None = None
+    unique_key: str | None = None
+
+def _job_to_dict(db_job) -> dict:
+    return {
+        "id": str(db_job.id),
+        "kind": db_job.kind,
+        "status": db_job.status,
+        "attempts": db_job.attempts,
+        "max_attempts": db_job.max_attempts,
+        "run_at": db_job.run_at,
+        "locked_by": db_job.locked_by,
+        "last_error": db_job.last_error,
+        "created_at": db_job.created_at,
+        "finished_at": db_job.finished_at,
+    }
+
+@router.get("/jobs")
+def read_jobs(status: str | None = None, kind: str | None = None, limit: int = 50, db: Session = Depends(get_db)):
+    """
+    バックグラウンドジョブの状態を返す。
+    状態ごとの件数、実行時刻の新しい順のジョブ、このワーカーのジョブの実行状況(pidで区別する)。
+    """
+    return {
+        "pid": os.getpid(),
+        "kinds": registry.kinds(),
+        "counts": count_jobs_by_status(db),
+        "runner": {"concurrency": job_runner.concurrency, **job_runner.stats.as_dict()},
+        "jobs": [_job_to_dict(db_job) for db_job in get_jobs(db, status=status, kind=kind, limit=min(limit, 500))],
+    }
+
+@router.post("/jobs", status_code=status.HTTP_201_CREATED)
+def create_job(request: JobEnqueueRequest, db: Session = Depends(get_db)):
+    """ジョブを登録する(集計の再実行など)"""
+    try:
+        db_job = enqueue(db, request.kind, payload=request.payload, run_at=request.run_at, unique_key=request.unique_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if db_job is None:
+        raise HTTPException(status_code=409, detail="A job with the same unique_key is already pending")
+    db.commit()
+    return _job_to_dict(db_job)
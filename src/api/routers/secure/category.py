@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
-from db.session import get_db
+from db.session import get_read_db
 from core.auth import get_current_user
+from core.etag import is_not_modified, not_modified, set_etag
+from core.master_data import master_data_cache
 from schemas.category import CategoryResponse
-from models.category import Category
 
 router = APIRouter(
     tags=["categories"],          # このルーターのタグを統一
@@ -13,7 +13,12 @@ router = APIRouter(
 )
 
 @router.get("/categories", response_model=list[CategoryResponse])
-def read_categories(db: Session = Depends(get_db)):
-    categories = db.query(Category).all()
-
-    return categories
+def read_categories(request: Request, db: Session = Depends(get_read_db)):
+    # マスターデータのキャッシュにあるシリアライズ済みのレスポンスをそのまま返す
+    # 端末が同じ内容を持っている場合(If-None-MatchがETagと一致)は304を返す
+    snapshot = master_data_cache.get(db)
+    if is_not_modified(request, snapshot.categories_etag):
+        return not_modified(snapshot.categories_etag)
+    response = Response(content=snapshot.categories_json, media_type="application/json")
+    set_etag(response, snapshot.categories_etag)
+    return response
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
-from db.session import get_db
+from db.session import get_read_db
 from core.auth import get_current_user
+from core.etag import is_not_modified, not_modified, set_etag
+from core.master_data import master_data_cache
 from schemas.eco_action import EcoActionResponse
-from models.eco_action import EcoAction
 
 router = APIRouter(
     tags=["eco_actions"],          # このルーターのタグを統一
@@ -13,7 +13,12 @@ router = APIRouter(
 )
 
 @router.get("/eco_actions", response_model=list[EcoActionResponse])
-def read_eco_actions(db: Session = Depends(get_db)):
-    eco_actions = db.query(EcoAction).all()
-
-    return eco_actions
+def read_eco_actions(request: Request, db: Session = Depends(get_read_db)):
+    # マスターデータのキャッシュにあるシリアライズ済みのレスポンスをそのまま返す
+    # 端末が同じ内容を持っている場合(If-None-MatchがETagと一致)は304を返す
+    snapshot = master_data_cache.get(db)
+    if is_not_modified(request, snapshot.eco_actions_etag):
+        return not_modified(snapshot.eco_actions_etag)
+    response = Response(content=snapshot.eco_actions_json, media_type="application/json")
+    set_etag(response, snapshot.eco_actions_etag)
+    return response
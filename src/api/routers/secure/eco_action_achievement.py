@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 from datetime import datetime
 
 # 必要なモジュールをインポート
-from db.session import get_db
-from schemas.eco_action_achievement import AchievementStatusUpdate, AchievementResponse
-from crud.eco_action_achievement import get_achievement_by_schedule_and_action, set_completed_status, get_achievements_by_schedule
+from db.session import get_async_db
+from schemas.eco_action_achievement import AchievementStatusUpdate, AchievementStatusBulkUpdate, AchievementResponse
+from crud.aio.eco_action_achievement import (
+    get_achievement_by_schedule_and_action, set_completed_status, get_achievements_by_schedule,
+    get_owned_schedule_ids, set_completed_statuses,
+)
 from core.auth import get_current_user
 from models.schedule import Schedule
 from models.user import User as UserModel
@@ -16,9 +19,9 @@ router = APIRouter(
 )
 
 @router.patch("/achievements/status")
-def update_achievement_status(
+async def update_achievement_status(
     status_update: AchievementStatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_user),
 ):
     """
@@ -27,12 +30,12 @@ def update_achievement_status(
     # 1. スケジュールが存在し、かつログインユーザーのものであるかを確認
     current_schedule_id = status_update.schedule_id
 
-    schedule = db.query(Schedule).filter(Schedule.schedule_id == current_schedule_id).first()
+    schedule = await db.get(Schedule, current_schedule_id)
     if not schedule or schedule.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized for this schedule")
 
     # 2. 対応する達成記録をDBから取得
-    db_achievement = get_achievement_by_schedule_and_action(
+    db_achievement = await get_achievement_by_schedule_and_action(
         db,
         schedule_id=status_update.schedule_id,
         eco_action_id=status_update.eco_action_id
@@ -43,24 +46,53 @@ def update_achievement_status(
     
     db_achievement.achieved_at = datetime.utcnow() if status_update.is_completed else None
     # 3. 取得した達成記録のステータスを更新
-    return set_completed_status(
+    return await set_completed_status(
         db=db, 
         db_achievement=db_achievement, 
         status=status_update.is_completed
     )
 
+@router.patch("/achievements/status/bulk", response_model=list[AchievementResponse])
+async def update_achievement_statuses(
+    bulk_update: AchievementStatusBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(get_current_user),
+):
+    """
+    複数の達成記録の完了状態をまとめて更新します。
+    1件でも他のユーザーのスケジュールや存在しない達成記録が含まれる場合は、何も更新しません。
+    """
+    # 同じ達成記録への更新は後のものを優先する
+    statuses = {(item.schedule_id, item.eco_action_id): item.is_completed for item in bulk_update.updates}
+
+    # 1. 全てのスケジュールがログインユーザーのものであるかを、1回のクエリで確認
+    schedule_ids = {schedule_id for schedule_id, _ in statuses}
+    if await get_owned_schedule_ids(db, schedule_ids, current_user.id) != schedule_ids:
+        raise HTTPException(status_code=403, detail="Not authorized for this schedule")
+
+    # 2. 1回のUPDATEでまとめて更新し、存在しない達成記録があれば取り消す
+    db_achievements = await set_completed_statuses(db, statuses)
+    if len(db_achievements) != len(statuses):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Achievement not found for the given schedule and eco action")
+    await db.commit()
+
+    # リクエストの順に並べて返す
+    updated = {(achievement.schedule_id, achievement.eco_action_id): achievement for achievement in db_achievements}
+    return [updated[key] for key in statuses]
+
 @router.get("/achievements/by-schedule/{schedule_id}", response_model=list[AchievementResponse])
-def get_achievements_for_schedule(
+async def get_achievements_for_schedule(
     schedule_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_user)
 ):
     """
     指定されたスケジュールIDに紐づく、エコ活動の達成記録一覧を取得します。
     """
     # スケジュールが存在し、かつログインユーザーのものであるかを確認
-    schedule = db.query(Schedule).filter(Schedule.schedule_id == schedule_id).first()
+    schedule = await db.get(Schedule, schedule_id)
     if not schedule or schedule.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view these achievements")
 
-    return get_achievements_by_schedule(db=db, schedule_id=schedule_id)
\ No newline at end of file
+    return await get_achievements_by_schedule(db=db, schedule_id=schedule_id)
\ No newline at end of file
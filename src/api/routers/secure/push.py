@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import core.auth as auth
+from core.push import push_hub
+from db.session import get_async_db
+from models.user import User
+
+router = APIRouter(
+    tags=["push"],          # このルーターのタグを統一
+)
+
+# 変更のプッシュ通知(Server-Sent Events)
+# カテゴリ・エコ活動の変更、ログインユーザーのスケジュール・達成記録・統計の変更をイベントとして送る
+# イベントを受け取ったら、該当するAPIをIf-None-Match付きで取り直す
+@router.get("/push/stream")
+async def stream_push_events(
+    current_user: User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # 認証に使ったDBセッションは、接続が続いている間も保持されるので先に閉じておく
+    await db.close()
+
+    subscriber = push_hub.subscribe(current_user.id)
+
+    async def events():
+        try:
+            async for message in push_hub.stream(subscriber):
+                yield message
+        finally:
+            push_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # リバースプロキシ(Nginx)でバッファリングせずにすぐ送る
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
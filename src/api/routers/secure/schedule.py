@@ -1,54 +1,197 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+from datetime import datetime, timedelta, timezone
 import uuid
 
 import core.auth as auth
-import crud.schedule
-from crud.user import get_user_by_id
-from schemas.schedule import ScheduleResponse, ScheduleCreate, ScheduleUpdate
+import crud.aio.schedule
+import crud.aio.sync
+from core.etag import is_not_modified, make_etag, not_modified, set_etag
+from core.master_data import master_data_cache
+from core.pagination import InvalidCursorError, decode_schedule_cursor, encode_schedule_cursor, decode_sync_cursor, encode_sync_cursor
+from crud.aio.user import get_user_by_id, get_user_data_version
+from models.user import User
+from schemas.schedule import (
+    ScheduleResponse, ScheduleCreate, ScheduleUpdate, ScheduleBulkCreate, ScheduleBulkCreateResponse, ScheduleBulkDeleteResponse,
+    ScheduleChangesResponse, SCHEDULE_CHANGES_MAX_LIMIT,
+)
 
-from db.session import get_db
+from db.session import get_async_db, get_async_read_db
 
 router = APIRouter(
     tags=["schedules"],          # このルーターのタグを統一
     dependencies=[Depends(auth.get_current_user)]
 )
 
+# 期間指定で一度に取得できる最大の期間(カレンダーの年表示まで)
+MAX_SCHEDULE_RANGE = timedelta(days=366)
+
+async def _schedules_etag(db: AsyncSession, user_id: uuid.UUID, *params) -> str:
+    """
+    ユーザーのスケジュール一覧のETag。スケジュール自体は読み込まず、
+    ユーザーの変更番号(users.data_version)と、レスポンスに含まれるカテゴリの内容、クエリパラメータから作る。
+    """
+    data_version = await get_user_data_version(db, user_id)
+    master_data = await db.run_sync(master_data_cache.get)
+    return make_etag("schedules", user_id, data_version, master_data.categories_etag, *params)
+
+def _as_naive_utc(value: datetime) -> datetime:
+    # start_schedule等はタイムゾーンなしで保存しているので、タイムゾーン付きの値はUTCに揃えてから比較する
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _validate_range(range_from: datetime, range_to: datetime) -> tuple[datetime, datetime]:
+    range_from, range_to = _as_naive_utc(range_from), _as_naive_utc(range_to)
+    if range_to <= range_from:
+        raise HTTPException(status_code=400, detail="'to' must be later than 'from'")
+    if range_to - range_from > MAX_SCHEDULE_RANGE:
+        raise HTTPException(status_code=400, detail=f"The range must be at most {MAX_SCHEDULE_RANGE.days} days")
+    return range_from, range_to
+
 # スケジュールを作成
 @router.post("/users/{user_id}/schedules", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
-def get_user_schedules(user_id: uuid.UUID, schedule: ScheduleCreate, db: Session = Depends(get_db)):
-    db_user = get_user_by_id(db, user_id=user_id)
+async def get_user_schedules(user_id: uuid.UUID, schedule: ScheduleCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_id(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return crud.schedule.create_schedule(db=db, schedule=schedule, user_id=user_id)
+    return await crud.aio.schedule.create_schedule(db=db, schedule=schedule, user_id=user_id)
+
+# スケジュールをまとめて作成(時間割の取り込みなど)
+# 作成できなかったスケジュールはerrorsで返す。all_or_nothingがTrueの場合は、1件でもエラーがあれば400を返し、何も作成しない
+# ログインユーザー以外のスケジュールは作成できない(403)
+@router.post("/users/{user_id}/schedules/bulk", response_model=ScheduleBulkCreateResponse, status_code=status.HTTP_201_CREATED)
+async def create_user_schedules_bulk(
+    user_id: uuid.UUID,
+    request: ScheduleBulkCreate,
+    current_user: User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to create schedules for this user")
+    created, errors = await crud.aio.schedule.create_schedules(
+        db, schedules=request.schedules, user_id=user_id, all_or_nothing=request.all_or_nothing
+    )
+    if errors and request.all_or_nothing:
+        raise HTTPException(status_code=400, detail=[error.model_dump() for error in errors])
+    return {"created": created, "errors": errors}
+
+# カレンダーの表示期間[from, to)と重なる、ログインユーザーのスケジュールを取得
+# /users/{user_id}/schedulesより前に定義し、"me"がuser_idとして解釈されないようにする
+@router.get("/users/me/schedules", response_model=List[ScheduleResponse])
+async def read_my_schedules_in_range(
+    range_from: datetime = Query(..., alias="from"),
+    range_to: datetime = Query(..., alias="to"),
+    *,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    range_from, range_to = _validate_range(range_from, range_to)
+
+    etag = await _schedules_etag(db, current_user.id, range_from.isoformat(), range_to.isoformat())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return await crud.aio.schedule.get_schedules_in_range(db, user_id=current_user.id, range_from=range_from, range_to=range_to)
+
+# 開始日時が[from, to)のログインユーザーのスケジュールをまとめて削除(「今週の予定を全て削除」など)
+# 期間の前から続いているスケジュールは削除しない。達成記録も一緒に削除される
+@router.delete("/users/me/schedules", response_model=ScheduleBulkDeleteResponse)
+async def delete_my_schedules_in_range(
+    range_from: datetime = Query(..., alias="from"),
+    range_to: datetime = Query(..., alias="to"),
+    *,
+    current_user: User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    range_from, range_to = _validate_range(range_from, range_to)
+    deleted_schedule_ids = await crud.aio.schedule.delete_schedules_in_range(
+        db, user_id=current_user.id, range_from=range_from, range_to=range_to
+    )
+    return {"deleted_schedule_ids": deleted_schedule_ids}
+
+# ログインユーザーのスケジュールの差分同期
+# cursorを指定しない場合は全てのスケジュールを返す。前回のレスポンスのcursorを指定すると、それ以降に作成・変更・削除されたものだけを返す
+# has_moreがTrueの場合は、返したcursorで続きを取得する
+# cursorが削除記録の保持期間(SYNC_TOMBSTONE_RETENTION_DAYS)より古い場合は、reset=Trueで全てのスケジュールを返す
+@router.get("/users/me/schedules/changes", response_model=ScheduleChangesResponse)
+async def read_my_schedule_changes(
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=SCHEDULE_CHANGES_MAX_LIMIT),
+    current_user: User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    try:
+        after = decode_sync_cursor(cursor) if cursor is not None else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    schedules, deleted_schedule_ids, next_key, has_more, reset = await crud.aio.sync.get_schedule_changes(
+        db, user_id=current_user.id, after=after, limit=limit
+    )
+    return {
+        "schedules": schedules,
+        "deleted_schedule_ids": deleted_schedule_ids,
+        "cursor": encode_sync_cursor(*next_key),
+        "has_more": has_more,
+        "reset": reset,
+    }
 
 # ユーザーのスケジュール一覧を取得
+# 開始日時順に返す。次のページがある場合は、X-Next-Cursorヘッダーの値をcursorに指定して次のページを取得する
+# skipを指定した場合は、従来どおりのOFFSETによるページネーション(ページが深いほど遅くなる)
+# 前回のETagをIf-None-Matchに指定した場合、変更がなければ304を返す
 @router.get("/users/{user_id}/schedules", response_model=List[ScheduleResponse])
-def get_user_schedules(user_id: uuid.UUID, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    schedules = crud.schedule.get_schedules_by_user(db, user_id=user_id, skip=skip, limit=limit)
+async def get_user_schedules(
+    user_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if skip and cursor is not None:
+        raise HTTPException(status_code=400, detail="skip and cursor cannot be used together")
+    try:
+        after = decode_schedule_cursor(cursor) if cursor is not None else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    etag = await _schedules_etag(db, user_id, skip, limit, cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    if skip:
+        return await crud.aio.schedule.get_schedules_by_user(db, user_id=user_id, skip=skip, limit=limit)
+
+    schedules, next_key = await crud.aio.schedule.get_schedules_page(db, user_id=user_id, limit=limit, after=after)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_schedule_cursor(*next_key)
     return schedules
 
 # 単一のスケジュールを取得
 @router.get("/schedules/{schedule_id}", response_model=ScheduleResponse)
-def read_schedule(schedule_id: uuid.UUID, db: Session = Depends(get_db)):
-    db_schedule = crud.schedule.get_schedule(db, schedule_id=schedule_id)
+async def read_schedule(schedule_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    db_schedule = await crud.aio.schedule.get_schedule(db, schedule_id=schedule_id)
     if db_schedule is None:
         raise HTTPException(status_code=404, detail="Schedule not found")
     return db_schedule
 
 # スケジュールを更新
 @router.put("/schedules/{schedule_id}", response_model=ScheduleResponse)
-def update_schedule(schedule_id: uuid.UUID, schedule: ScheduleUpdate, db: Session = Depends(get_db)):
-    db_schedule = crud.schedule.update_schedule(db, schedule_id=schedule_id, schedule_update=schedule)
+async def update_schedule(schedule_id: uuid.UUID, schedule: ScheduleUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_schedule = await crud.aio.schedule.update_schedule(db, schedule_id=schedule_id, schedule_update=schedule)
     if db_schedule is None:
         raise HTTPException(status_code=404, detail="Schedule not found")
     return db_schedule
 
 # スケジュールを削除
 @router.delete("/schedules/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_schedule(schedule_id: uuid.UUID, db: Session = Depends(get_db)):
-    db_schedule = crud.schedule.delete_schedule(db, schedule_id=schedule_id)
+async def delete_schedule(schedule_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    db_schedule = await crud.aio.schedule.delete_schedule(db, schedule_id=schedule_id)
     if db_schedule is None:
         raise HTTPException(status_code=404, detail="Schedule not found")
     return None
\ No newline at end of file
@@ -1,12 +1,13 @@
 # APIエンドポイントのための最低限のインポート
 
 import uuid
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from db.session import get_db
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_async_db, get_async_read_db
 
 # 認証モジュールをインポート
 import core.auth as auth
+from core.etag import is_not_modified, make_etag, not_modified, set_etag
 
 # 統計関連のスキーマをインポート
 from schemas.statistics import (
@@ -16,7 +17,7 @@ from schemas.statistics import (
 )
 
 # 統計関連のCRUD操作をインポート
-from crud.simple_statistics import (
+from crud.aio.simple_statistics import (
     read_user_statistics,
     read_overall_statistics,
     create_user_statistics,
@@ -30,30 +31,37 @@ router = APIRouter(
 )
 
 @router.get("/{user_id}/simple_statistics", response_model=UserStatsResponse)
-def get_user_statistics(user_id: uuid.UUID, db: Session = Depends(get_db)):
-    stats = ensure_user_statistics_exists(db, user_id)
+async def get_user_statistics(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    stats = await ensure_user_statistics_exists(db, user_id)
 
     return stats
 
 @router.get("/overall_statistics", response_model=OverallStatsResponse)
-def get_overall_statistics(db: Session = Depends(get_db)):
-    stats = read_overall_statistics(db)
+async def get_overall_statistics(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    stats = await read_overall_statistics(db)
+
+    # 全体の統計は1行だけなので、その値からETagを作る
+    if stats is not None:
+        etag = make_etag("overall_statistics", stats.id, stats.total_money_saved, stats.total_co2_reduction, stats.calculated_at)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
 
     return stats
 
 @router.post("/{user_id}/simple_statistics", response_model=UserStatsResponse)
-def post_achievement(user_id: uuid.UUID, achieved: UpdateStatsRequest, db: Session = Depends(get_db)):
-    stats = ensure_user_statistics_exists(db, user_id)
+async def post_achievement(user_id: uuid.UUID, achieved: UpdateStatsRequest, db: AsyncSession = Depends(get_async_db)):
+    stats = await ensure_user_statistics_exists(db, user_id)
 
-    stats = update_user_statistics(db, user_id, achieved.money_saved, achieved.co2_reduction)
-    overall_stats = update_overall_statistics(db, achieved.money_saved, achieved.co2_reduction)
+    stats = await update_user_statistics(db, user_id, achieved.money_saved, achieved.co2_reduction)
+    overall_stats = await update_overall_statistics(db, achieved.money_saved, achieved.co2_reduction)
 
     return stats
 
 # 統計が存在しない場合に作成するユーティリティ関数
-def ensure_user_statistics_exists(db: Session, user_id: uuid.UUID):
-    stats = read_user_statistics(db, user_id)
+async def ensure_user_statistics_exists(db: AsyncSession, user_id: uuid.UUID):
+    stats = await read_user_statistics(db, user_id)
 
     if not stats:
-        stats = create_user_statistics(db, user_id)
+        stats = await create_user_statistics(db, user_id)
     return stats
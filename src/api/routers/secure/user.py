@@ -1,15 +1,15 @@
 import os
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
 import core.auth as auth
+from core.google_verifier import google_verifier
 import schemas.user
-import crud.user, schemas.user
-from db.session import get_db
+import crud.aio.user
+import crud.aio.refresh_token
+from db.session import get_async_db
 
 load_dotenv()
 
@@ -24,12 +24,12 @@ router = APIRouter(
 )
 
 @router.get("/users/me", response_model=schemas.user.UserResponse, tags=["users"])
-def read_users_me(current_user: schemas.user.UserResponse = Depends(auth.get_current_user)):
+async def read_users_me(current_user: schemas.user.UserResponse = Depends(auth.get_current_user)):
     return current_user
 
 @router.patch("/users/me/link-google", response_model=schemas.user.UserResponse, tags=["users"])
-def link_google_account(
-    db: Session = Depends(get_db),
+async def link_google_account(
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.user.UserResponse = Depends(auth.get_current_user), # 独自トークンで認証
     google_token: str = Body(..., embed=True, alias="token")
 ):
@@ -38,9 +38,8 @@ def link_google_account(
     """
     # 1. Google IDトークンを検証、これはおまじない
     try:
-        idinfo = id_token.verify_oauth2_token(
-            google_token, requests.Request(), ANDROID_CLIENT_ID
-        )
+        # 証明書はメモリに保持しているものを使う
+        idinfo = await google_verifier.verify_async(google_token, ANDROID_CLIENT_ID)
         google_user_id = idinfo["sub"]
         google_email = idinfo["email"]
     except ValueError:
@@ -55,7 +54,7 @@ def link_google_account(
         )
 
     # このGoogleアカウントが、他のユーザーに既に紐付けられていないか確認
-    existing_google_user = crud.user.get_user_by_google_id(db, google_id=google_user_id)
+    existing_google_user = await crud.aio.user.get_user_by_google_id(db, google_id=google_user_id)
     if existing_google_user and existing_google_user.id != current_user.id:
         raise HTTPException(
             status_code=409, # Conflict
@@ -66,7 +65,41 @@ def link_google_account(
     current_user.credential.google_id = google_user_id
 
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
     
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.get("/users/me/sessions", response_model=list[schemas.user.RefreshSessionResponse], tags=["users"])
+async def read_my_sessions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.user.UserResponse = Depends(auth.get_current_user),
+):
+    """
+    ログイン中のユーザーの、端末ごとの有効なセッション一覧を取得する
+    """
+    return await crud.aio.refresh_token.get_active_refresh_tokens(db, user_id=current_user.id)
+
+@router.delete("/users/me/sessions/{device_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["users"])
+async def revoke_my_session(
+    device_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.user.UserResponse = Depends(auth.get_current_user),
+):
+    """
+    指定した端末のセッションを失効させる(その端末のリフレッシュトークンが使えなくなる)
+    """
+    revoked_count = await crud.aio.refresh_token.revoke_refresh_token(db, user_id=current_user.id, device_id=device_id)
+    if revoked_count == 0:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return None
+
+@router.delete("/users/me/sessions", status_code=status.HTTP_204_NO_CONTENT, tags=["users"])
+async def revoke_all_my_sessions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.user.UserResponse = Depends(auth.get_current_user),
+):
+    """
+    全端末のセッションを失効させる
+    """
+    await crud.aio.refresh_token.revoke_refresh_token(db, user_id=current_user.id)
+    return None
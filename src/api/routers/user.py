@@ -1,12 +1,14 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
-import crud.user, schemas.user
+import crud.aio.user, schemas.user
 import core.email_verification
-from db.session import get_db
+from core.security import get_password_hash_async
+from core.rate_limit import rate_limiter
+from db.session import get_async_db
 
 load_dotenv()
 
@@ -19,12 +21,15 @@ ANDROID_CLIENT_ID = os.getenv("ANDROID_CLIENT_ID")
 
 # endpoint to create a new user
 @router.post("/users/create", status_code=status.HTTP_201_CREATED, tags=["users"])
-def create_new_user(user: schemas.user.UserCreate, db: Session = Depends(get_db)):
+async def create_new_user(request: Request, user: schemas.user.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # bcryptの計算やメール送信の前に、IPアドレスとメールアドレスごとの頻度を確認する
+    await rate_limiter.check(request, scope="signup", email=user.email)
+
     # check if the user already exists
-    db_user = crud.user.get_user_by_email(db=db, email=user.email)
+    db_user = await crud.aio.user.get_user_by_email(db=db, email=user.email)
     if db_user and not db_user.is_active:
-        # 再度メールアドレス確認用のメールを送信
-        core.email_verification.send_message(user.email)
+        # 再度メールアドレス確認用のメールを送信キューに登録(直近に登録済みなら重複して送らない)
+        await db.run_sync(core.email_verification.enqueue_verification_email, user.email)
         raise HTTPException(status_code=400, detail="このメールアドレスを持つユーザーは既に存在します。再度確認メールを送信しました。")
 
     if db_user and db_user.is_active:
@@ -32,8 +37,11 @@ def create_new_user(user: schemas.user.UserCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="このメールアドレスを持つユーザーは既に存在します。")
 
     # create new user
-    created_user = crud.user.create_user(db=db, email=user.email, password=user.password)
+    # bcryptのハッシュ化は専用のプロセスプールで行う
+    hashed_password = await get_password_hash_async(user.password)
+    created_user = await crud.aio.user.create_user(db=db, email=user.email, hashed_password=hashed_password)
 
-    core.email_verification.send_message(user.email)
+    # 確認メールは送信キューに登録し、バックグラウンドのワーカーが送信する
+    await db.run_sync(core.email_verification.enqueue_verification_email, user.email)
 
     return [created_user, {"message": "ユーザーが作成されました。確認メールを送信しました。"}]
\ No newline at end of file
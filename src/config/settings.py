@@ -2,4 +2,143 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-EMAIL_VERIFICATION_SECRET_KEY = os.getenv("EMAIL_VERIFICATION_SECRET_KEY")
\ No newline at end of file
+EMAIL_VERIFICATION_SECRET_KEY = os.getenv("EMAIL_VERIFICATION_SECRET_KEY")
+
+# 認証済みユーザーキャッシュ(core.principal_cache)の設定
+# TTLを0にするとキャッシュを無効化できる
+# アカウントの無効化・パスワード変更・リフレッシュトークンの失効は、同じワーカーではすぐに、
+# 他のワーカーではコミット時の通知(core.push、PostgresのLISTEN/NOTIFY)で反映される。
+# 通知が届かない場合(Postgres以外、LISTENの接続が切れている間)は、最大でTTLの秒数だけ古い状態で認証されるので、
+# TTLは「失効が全ワーカーに反映されるまでの上限」として許容できる値にすること
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+# カテゴリ・エコ活動のキャッシュ(core.master_data)の設定
+# 別のワーカーで変更された場合はTTLを過ぎると反映される。0にするとキャッシュを無効化できる
+MASTER_DATA_CACHE_TTL_SECONDS = float(os.getenv("MASTER_DATA_CACHE_TTL_SECONDS", "60"))
+
+# 変更のプッシュ通知(core.push、GET /push/stream)の設定
+# 接続ごとに保持する未送信のイベントの上限(超えたら捨ててresyncを送る)
+PUSH_MAX_PENDING_EVENTS = int(os.getenv("PUSH_MAX_PENDING_EVENTS", "32"))
+# イベントがない間に接続を維持するためのコメントを送る間隔
+PUSH_HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT_SECONDS", "25"))
+# 全接続に送るイベント(全体の統計の更新など)をまとめる間隔
+PUSH_BROADCAST_INTERVAL_SECONDS = float(os.getenv("PUSH_BROADCAST_INTERVAL_SECONDS", "5"))
+# 切断されたクライアントが再接続するまでの時間(SSEのretry)
+PUSH_RETRY_MILLISECONDS = int(os.getenv("PUSH_RETRY_MILLISECONDS", "5000"))
+# LISTENしている接続が生きているかを確認する間隔
+PUSH_LISTENER_CHECK_INTERVAL_SECONDS = float(os.getenv("PUSH_LISTENER_CHECK_INTERVAL_SECONDS", "30"))
+
+# リフレッシュトークンのHMACダイジェストに使う鍵
+# 未設定の場合はJWTの秘密鍵を使う
+REFRESH_TOKEN_HMAC_KEY = os.getenv("REFRESH_TOKEN_HMAC_KEY") or os.getenv("JWT_SECRET_KEY")
+# HMACダイジェストで見つからなかった場合に、bcryptで照合する移行前のトークンの最大件数(新しい順)
+# メールアドレスを知っていれば誰でも照合を発生させられるので、1リクエストあたりのbcryptの回数を抑える
+LEGACY_REFRESH_TOKEN_MAX_CANDIDATES = int(os.getenv("LEGACY_REFRESH_TOKEN_MAX_CANDIDATES", "3"))
+
+# パスワードハッシュ用プロセスプール(core.hashing)の設定
+# ワーカー数を0にするとプロセスプールを使わずスレッドで実行する
+HASHING_POOL_WORKERS = int(os.getenv("HASHING_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASHING_MAX_QUEUE_DEPTH = int(os.getenv("HASHING_MAX_QUEUE_DEPTH", "64"))
+
+# 期限切れ・失効済みリフレッシュトークンの掃除(ジョブrefresh_tokens.sweep)の設定
+# 間隔を0にすると掃除を行わない
+REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS = float(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS", "3600"))
+REFRESH_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_SWEEP_BATCH_SIZE", "1000"))
+# 失効済みトークンを再利用検知のために残しておく日数
+REFRESH_TOKEN_REVOKED_RETENTION_DAYS = int(os.getenv("REFRESH_TOKEN_REVOKED_RETENTION_DAYS", "7"))
+
+# GoogleのIDトークン検証用の証明書の取得先(core.google_verifier)
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# 起動時に証明書の取得・定期更新を行うか
+GOOGLE_CERTS_REFRESH_ENABLED = os.getenv("GOOGLE_CERTS_REFRESH_ENABLED", "true").lower() == "true"
+
+# メール送信(core.email_outbox)の設定
+# EMAIL_TRANSPORTは"gmail"(Gmail API)または"smtp"
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "gmail")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+# 送信する間隔(ジョブemails.dispatch)。0の場合は登録された時だけ実行する
+EMAIL_DISPATCH_INTERVAL_SECONDS = float(os.getenv("EMAIL_DISPATCH_INTERVAL_SECONDS", "2"))
+EMAIL_DISPATCH_BATCH_SIZE = int(os.getenv("EMAIL_DISPATCH_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("EMAIL_RETRY_BACKOFF_SECONDS", "30"))
+# 同じ宛先に同じ種類のメールを再送しない期間
+EMAIL_DEDUPE_WINDOW_SECONDS = float(os.getenv("EMAIL_DEDUPE_WINDOW_SECONDS", "300"))
+
+# X-Forwarded-For/X-Forwarded-Protoを信頼するリバースプロキシのアドレス(カンマ区切り、CIDRも可)
+# ここに含まれない接続元からのヘッダーは無視し、接続元のアドレスをそのままクライアントのIPアドレスとして扱う
+# (レート制限のキーになるので、"*"にするとヘッダーを偽装して制限を回避できる)
+# Nginxを別コンテナで動かす場合は、そのコンテナのアドレスを指定する(docker-compose.prod.ymlではnginxのアドレスを固定している)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# 認証系エンドポイントのレート制限(core.rate_limit)の設定
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory"(ワーカーごと)または"redis"(全ワーカーで共有、redisパッケージが必要)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# IPアドレスごと: BURST回まで連続で許可し、1分あたりPER_MINUTE回ずつ回復する
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "30"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+# メールアドレスごと
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "10"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "5"))
+# メモリに保持するバケットの最大数
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# データベースのコネクションプール(db.pool)の設定。gunicornのワーカーごとに同期・非同期それぞれのプールを持つ
+# "queue"はワーカー内でコネクションを保持する。"null"は保持せず、PgBouncer(transactionモード)などのプロキシに任せる
+# "null"の場合、PgBouncer経由の接続ではLISTENが届かないので、ワーカー間の通知(core.push)には
+# PUSH_LISTEN_DATABASE_URL(db.session)でPostgresに直接接続するURLを指定する。指定しない場合は通知を受け取らず、
+# 他のワーカーでの失効・変更はキャッシュのTTL(PRINCIPAL_CACHE_TTL_SECONDS等)が過ぎるまで反映されない
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# コネクションが空くのを待つ最大秒数
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# 使う前にコネクションが生きているか確認する
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# この秒数より古いコネクションは張り直す(-1で無効)
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+
+# 内部API(/internal/*)の認証トークン。X-Internal-Tokenヘッダーで渡す。未設定の場合、内部APIは無効
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+# 読み込みレプリカへの振り分け(db.routing)の設定。レプリカのURLはDATABASE_REPLICA_URLSで指定する
+# ユーザーが書き込んでからこの秒数の間は、そのユーザーの読み込みもプライマリで行う(別のワーカーには変更の通知で伝える)
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "5"))
+# レプリカの遅延がこの秒数を超えたらプライマリから読み込む。0の場合は遅延を確認しない
+# 通知が届く前の読み込みなどで古いデータを返しうる時間の上限は、おおよそこの値とREPLICA_LAG_CHECK_INTERVAL_SECONDSの和になる
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "1"))
+REPLICA_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_SECONDS", "1"))
+
+# エコ活動の変更に伴う達成記録の再計算(ジョブachievements.reconcile)の設定
+# 再計算待ちを確認する間隔。0にすると定期実行しない
+ACHIEVEMENT_RECONCILE_INTERVAL_SECONDS = float(os.getenv("ACHIEVEMENT_RECONCILE_INTERVAL_SECONDS", "5"))
+# 1回のトランザクションで再計算するスケジュールの件数
+ACHIEVEMENT_RECONCILE_CHUNK_SIZE = int(os.getenv("ACHIEVEMENT_RECONCILE_CHUNK_SIZE", "500"))
+# 処理中のワーカーが落ちた場合に、他のワーカーが処理を引き継ぐまでの秒数
+ACHIEVEMENT_RECONCILE_LEASE_SECONDS = float(os.getenv("ACHIEVEMENT_RECONCILE_LEASE_SECONDS", "300"))
+
+# バックグラウンドジョブ(core.jobs)の設定
+# gunicornのワーカーごとに起動するジョブのワーカー数。0にするとこのプロセスではジョブを実行しない
+# (scripts.run_jobsで別プロセスとして実行する場合など)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "1"))
+# 実行待ちのジョブがない場合に、次に確認するまでの秒数
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+# 実行中のワーカーが落ちた場合に、他のワーカーが再実行するまでの秒数
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+# 終了したジョブを残しておく日数と、削除する間隔
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOB_CLEANUP_INTERVAL_SECONDS = float(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", "3600"))
+# 全ユーザーの統計情報を集計し直す間隔(ジョブstatistics.overall)。0の場合は登録された時だけ実行する
+OVERALL_STATS_INTERVAL_SECONDS = float(os.getenv("OVERALL_STATS_INTERVAL_SECONDS", "0"))
+# 差分同期の削除記録(sync_tombstones)を残しておく日数と、削除する間隔(ジョブsync_tombstones.cleanup)
+# この日数より前に同期した端末は、差分ではなく全件を取り直す(/users/me/schedules/changesのreset)
+SYNC_TOMBSTONE_RETENTION_DAYS = float(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+SYNC_TOMBSTONE_CLEANUP_INTERVAL_SECONDS = float(os.getenv("SYNC_TOMBSTONE_CLEANUP_INTERVAL_SECONDS", "3600"))
+SYNC_TOMBSTONE_CLEANUP_BATCH_SIZE = int(os.getenv("SYNC_TOMBSTONE_CLEANUP_BATCH_SIZE", "1000"))
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from crud.achievement_reconciliation import claim_reconciliation, complete_reconciliation, get_schedule_ids_by_category
+from crud.helper.schedule_helper import reconcile_achievements
+
+
+class ReconciliationProgress:
+    """
+    ワーカー内の達成記録の再計算の進捗。/internal/statsで確認する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current_category_id = None
+        self.current_schedules = 0
+        self.completed_categories = 0
+        self.completed_schedules = 0
+        self.last_completed_at = None
+        self.last_error = None
+
+    def start(self, category_id) -> None:
+        with self._lock:
+            self.current_category_id = category_id
+            self.current_schedules = 0
+
+    def advance(self, schedules: int) -> None:
+        with self._lock:
+            self.current_schedules += schedules
+            self.completed_schedules += schedules
+
+    def finish(self, error: str | None = None) -> None:
+        with self._lock:
+            if error is None:
+                self.completed_categories += 1
+                self.last_completed_at = time.time()
+            self.last_error = error
+            self.current_category_id = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "current_category_id": str(self.current_category_id) if self.current_category_id else None,
+                "current_schedules": self.current_schedules,
+                "completed_categories": self.completed_categories,
+                "completed_schedules": self.completed_schedules,
+                "last_completed_at": self.last_completed_at,
+                "last_error": self.last_error,
+            }
+
+
+reconciliation_progress = ReconciliationProgress()
+
+
+def reconcile_category(db: Session, category_id, chunk_size: int = settings.ACHIEVEMENT_RECONCILE_CHUNK_SIZE) -> int:
+    """
+    カテゴリのスケジュールの達成記録を、chunk_size件ずつ再計算する。
+    チャンクごとにコミットし、長いトランザクションで達成記録をロックし続けないようにする。
+    処理したスケジュールの件数を返す。
+    """
+    processed = 0
+    last_schedule_id = None
+    while True:
+        schedule_ids = get_schedule_ids_by_category(db, category_id, limit=chunk_size, after=last_schedule_id)
+        if not schedule_ids:
+            return processed
+        reconcile_achievements(db, category_id, schedule_ids)
+        db.commit()
+        processed += len(schedule_ids)
+        last_schedule_id = schedule_ids[-1]
+        reconciliation_progress.advance(len(schedule_ids))
+        print(f"Reconciled achievements: category={category_id}, schedules={processed}")
+
+
+def process_pending_reconciliations(db: Session) -> int:
+    """再計算待ちのカテゴリを全て処理し、処理したカテゴリの数を返す"""
+    processed_categories = 0
+    while True:
+        claimed = claim_reconciliation(db, lease_seconds=settings.ACHIEVEMENT_RECONCILE_LEASE_SECONDS)
+        if claimed is None:
+            return processed_categories
+        category_id, request_ids = claimed
+
+        reconciliation_progress.start(category_id)
+        try:
+            reconcile_category(db, category_id)
+        except Exception as e:
+            # 登録は残し、ロックの期限が切れたら再試行する
+            db.rollback()
+            reconciliation_progress.finish(error=str(e))
+            raise
+        # 処理中に同じカテゴリが再登録された場合は、その登録は残して次回もう一度処理する
+        complete_reconciliation(db, request_ids)
+        reconciliation_progress.finish()
+        processed_categories += 1
@@ -1,12 +1,14 @@
 import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 
-import crud.user
-from db.session import get_db
+import crud.aio.user
+from core.principal_cache import principal_cache
+from db.session import get_async_db
+from db.routing import current_principal_id
 
 load_dotenv()
 
@@ -18,7 +20,7 @@ ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # Decode the JWT token to get the current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="認証情報が無効です",
@@ -38,10 +40,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         # If the token were invalid or expired, raise an exception
         raise credentials_exception
 
+    # まずワーカー内のキャッシュを確認し、なければDBから取得してキャッシュする
+    # (キャッシュからの取り出しはSELECTを発行しない)
+    user = await db.run_sync(principal_cache.get, email)
+    if user is not None:
+        current_principal_id.set(user.id)
+        return user
+
     # get user from the database by email
-    user = crud.user.get_user_by_email(db, email=email)
+    user = await crud.aio.user.get_user_by_email(db, email=email)
     
     if user is None:
         raise credentials_exception
     
+    principal_cache.set(user)
+    # 読み込みをレプリカに振り分ける際に、このユーザーが直近に書き込んだかどうかを確認するために使う
+    current_principal_id.set(user.id)
     return user
\ No newline at end of file
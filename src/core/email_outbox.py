@@ -0,0 +1,149 @@
+import smtplib
+import threading
+from email.mime.text import MIMEText
+
+from sqlalchemy.orm import Session
+
+from config import settings
+import core.email_verification
+from crud.email_outbox import lock_pending_emails, mark_email_sent, mark_email_failed
+from models.email_outbox import EmailOutbox
+
+
+class GmailTransport:
+    """
+    Gmail APIでメールを送信する。
+    認証とAPIクライアントの構築は最初の送信時に一度だけ行い、以降は使い回す。
+    """
+
+    def __init__(self):
+        self._service = None
+        self._lock = threading.Lock()
+
+    def send(self, email: EmailOutbox) -> None:
+        message = core.email_verification.create_message(
+            core.email_verification.SENDER_EMAIL, email.to_address, email.subject, email.body
+        )
+        with self._lock:
+            self._get_service().users().messages().send(userId="me", body=message).execute()
+
+    def close(self) -> None:
+        self._service = None
+
+    def _get_service(self):
+        if self._service is None:
+            self._service = core.email_verification.get_gmail_service()
+        return self._service
+
+
+class SmtpTransport:
+    """
+    SMTPでメールを送信する。
+    接続はバッチをまたいで維持し、切断されていた場合は一度だけ再接続して送り直す。
+    """
+
+    def __init__(self, host: str, port: int, username: str | None = None, password: str | None = None, use_tls: bool = False):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._connection: smtplib.SMTP | None = None
+        self._lock = threading.Lock()
+
+    def send(self, email: EmailOutbox) -> None:
+        message = MIMEText(email.body, "html")
+        message["to"] = email.to_address
+        message["from"] = f"{core.email_verification.SENDER_NAME} <{core.email_verification.SENDER_EMAIL}>"
+        message["subject"] = email.subject
+
+        with self._lock:
+            try:
+                self._get_connection().send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self._connection = None
+                self._get_connection().send_message(message)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._connection = None
+
+    def _get_connection(self) -> smtplib.SMTP:
+        # ロックを取得した状態で呼び出すこと
+        if self._connection is None:
+            connection = smtplib.SMTP(self.host, self.port, timeout=10)
+            if self.use_tls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password or "")
+            self._connection = connection
+        return self._connection
+
+
+def get_transport():
+    if settings.EMAIL_TRANSPORT == "smtp":
+        return SmtpTransport(
+            host=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+        )
+    return GmailTransport()
+
+
+def dispatch_pending_emails(db: Session, transport, batch_size: int = settings.EMAIL_DISPATCH_BATCH_SIZE) -> dict:
+    """
+    送信待ちのメールを1バッチ分送信し、結果を記録する。
+    バッチ全体を1つのトランザクションで処理し、行ロックで他のワーカーとの二重送信を防ぐ。
+    送信件数と失敗件数を返す。
+    """
+    result = {"sent": 0, "failed": 0}
+    try:
+        for db_email in lock_pending_emails(db, batch_size=batch_size):
+            try:
+                transport.send(db_email)
+            except Exception as e:
+                mark_email_failed(
+                    db,
+                    db_email,
+                    error=str(e),
+                    max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+                    backoff_seconds=settings.EMAIL_RETRY_BACKOFF_SECONDS,
+                )
+                result["failed"] += 1
+            else:
+                mark_email_sent(db, db_email)
+                result["sent"] += 1
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return result
+
+
+# ジョブのワーカー間で共有する送信手段(認証・接続を送信のたびに作り直さない)
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+def get_shared_transport():
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            _shared_transport = get_transport()
+        return _shared_transport
+
+
+def close_shared_transport() -> None:
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is not None:
+            _shared_transport.close()
+            _shared_transport = None
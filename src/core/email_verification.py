@@ -9,14 +9,17 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from itsdangerous import URLSafeTimedSerializer
+from sqlalchemy.orm import Session
+
+from crud.email_outbox import enqueue_email
 
 # このスコープは、メールの送信権限を要求することを意味します。
 # 変更する場合は、token.jsonを削除してください。
 SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
 SENDER_EMAIL = "ecodule@gmail.com" # あなたのGmailアドレス
 SENDER_NAME = "Ecodule"
+VERIFICATION_EMAIL_KIND = "verification"
 load_dotenv()
 
 # ----------------
@@ -49,13 +52,11 @@ def get_gmail_service():
     return build("gmail", "v1", credentials=creds)
 
 
-def create_message(sender, to, subject, verification_url):
+def create_verification_body(verification_url: str) -> str:
     """
-    MIMETextオブジェクトを作成し、Base64エンコードします。
+    確認メールの本文（HTML形式）を作成します。
     """
-
-    # メール本文（HTML形式）
-    message_text = f"""
+    return f"""
     <html><body>
         <h2>ご登録ありがとうございます！</h2>
         <p>アカウントを有効にするには、以下のボタンをクリックしてください。</p>
@@ -65,7 +66,12 @@ def create_message(sender, to, subject, verification_url):
     </body></html>
     """
 
-    message = MIMEText(message_text, "html") # HTML形式で送信
+
+def create_message(sender, to, subject, html_body):
+    """
+    MIMETextオブジェクトを作成し、Base64エンコードします。
+    """
+    message = MIMEText(html_body, "html") # HTML形式で送信
     message["to"] = to
     message["from"] = f"{SENDER_NAME} <{sender}>"
     message["subject"] = subject
@@ -75,31 +81,34 @@ def create_message(sender, to, subject, verification_url):
     return {"raw": raw_message}
 
 
-def send_message(user_email: str):
+def create_verification_email(user_email: str) -> tuple[str, str]:
     """
-    Gmail APIを使ってメールを送信します。
+    確認メールの件名と本文を作成します。
     """
-    # Gmail APIサービスを取得(準備)
-    service = get_gmail_service()
-
     subject = "メールアドレスの確認"
     verification_token = generate_verification_token(user_email)
 
     # 確認用URLを生成、あとで環境変数にする
     verification_url = f"{os.getenv('ECODULE_URL')}/auth/verify-email/?token={verification_token}"
-    message = create_message(SENDER_EMAIL, user_email, subject, verification_url)
-
-    try:
-        message = (
-            # meは認証済みユーザーであることを示す。
-            service.users().messages().send(userId="me", body=message).execute()
-        )
-        print(f"メッセージが送信されました。Message ID: {message['id']}")
-        return message
-    except HttpError as error:
-        print(f"エラーが発生しました: {error}")
-        return None
-    
+    return subject, create_verification_body(verification_url)
+
+
+def enqueue_verification_email(db: Session, user_email: str):
+    """
+    確認メールを送信キューに登録します。実際の送信はジョブemails.dispatch(core.job_definitions)が行います。
+    同じアドレスへの確認メールが直近に登録されている場合は、重複して送信しません。
+    """
+    subject, body = create_verification_email(user_email)
+    return enqueue_email(
+        db,
+        kind=VERIFICATION_EMAIL_KIND,
+        to_address=user_email,
+        subject=subject,
+        body=body,
+        dedupe_window_seconds=settings.EMAIL_DEDUPE_WINDOW_SECONDS,
+    )
+
+
 # -----------------------------------
 
 def generate_verification_token(email: str) -> str:
@@ -0,0 +1,36 @@
+import hashlib
+
+from fastapi import Request, Response
+
+# 条件付きGETのレスポンスに付けるCache-Control
+# 端末にはキャッシュさせるが、使う前に毎回If-None-Matchで確認させる
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    ETagを作る。partsには結果が変わると変わる値(変更番号、クエリパラメータ等)を渡す。
+    結果そのものは読み込まずに計算できるようにすること。
+    """
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-MatchヘッダーにETagが含まれているか(弱い比較)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
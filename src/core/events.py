@@ -1,37 +1,195 @@
-from sqlalchemy import event
+from sqlalchemy import event, inspect, select
 from sqlalchemy.orm import Session
 
+from models.achievement_reconciliation import AchievementReconciliation
+from models.category import Category
 from models.eco_action import EcoAction
-from scripts.notify import notify_frontend_update # declarative_base()インスタンス
+from models.eco_action_achievement import EcoActionAchievement
+from models.schedule import Schedule
+from models.sync_tombstone import SyncTombstone
+from models.overall_statistics import OverallStats
+from models.user import User, UserCredential, RefreshToken
+from models.user_statistics import UserStatistics
+from core.principal_cache import principal_cache
+from crud.sync import touch_user_data
+from core.push import publish
+from core.master_data import MASTER_DATA_CHANGED, master_data_cache
 
 @event.listens_for(Session, 'before_flush')
-def before_flush(session, flush_context, instances):
+def capture_eco_action_changes(session, flush_context, instances):
     """
-    flushが始まる前に、変更されたEcoActionをセッションのinfoに保存する
+    エコ活動の追加・削除・カテゴリ変更を検出し、達成記録の再計算が必要なカテゴリを登録する。
+    同じトランザクションで登録するので、変更がコミットされた場合だけ再計算される。
+    再計算はcore.achievement_reconcilerのワーカーが行い、このflushの中では行わない。
     """
-    updated_eco_actions = []
-    for obj in session.dirty: # session.dirtyに変更があったオブジェクトが入っている
+    category_ids = set()
+    for obj in session.new:
         if isinstance(obj, EcoAction):
-            updated_eco_actions.append(obj)
-    
-    # セッションのinfo辞書を使って、情報を次のイベントに渡す
-    session.info['updated_eco_actions'] = updated_eco_actions
+            category_ids.add(obj.category_id)
+    for obj in session.deleted:
+        if isinstance(obj, EcoAction):
+            category_ids.add(obj.category_id)
+    for obj in session.dirty:
+        if isinstance(obj, EcoAction):
+            # 変更前と変更後の両方のカテゴリが対象(内容だけの変更では再計算しない)
+            history = inspect(obj).attrs.category_id.history
+            if history.has_changes():
+                category_ids.update(history.added)
+                category_ids.update(history.deleted)
+
+    category_ids.discard(None)
+    for category_id in category_ids:
+        session.add(AchievementReconciliation(category_id=category_id))
+
+
+# 認証済みユーザーキャッシュの無効化
+# is_active・認証情報・リフレッシュトークンが変わったユーザーのキャッシュを破棄する
+PRINCIPAL_MODELS = (User, UserCredential, RefreshToken)
+
+@event.listens_for(Session, 'after_flush')
+def collect_principal_changes(session, flush_context):
+    """
+    flushされたユーザー関連の変更を記録し、その場でキャッシュを破棄する。
+    他のワーカーのキャッシュは、コミット時の通知(core.push)で破棄する。
+    """
+    flushed_user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            flushed_user_ids.add(obj.id)
+        elif isinstance(obj, PRINCIPAL_MODELS) and obj.user_id is not None:
+            flushed_user_ids.add(obj.user_id)
+    flushed_user_ids.discard(None)
+
+    changed_user_ids = session.info.setdefault('principal_user_ids', set())
+    changed_user_ids.update(flushed_user_ids)
+    for user_id in changed_user_ids:
+        principal_cache.invalidate(user_id=user_id)
+    if flushed_user_ids:
+        publish(session, {"type": "principal", "user_ids": sorted(str(user_id) for user_id in flushed_user_ids)})
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_principal_cache(session):
+    """
+    コミット完了後にもう一度破棄する
+    (flushからコミットまでの間に、別リクエストが古い値をキャッシュしている可能性があるため)
+    """
+    for user_id in session.info.pop('principal_user_ids', set()):
+        principal_cache.invalidate(user_id=user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_principal_changes(session):
+    session.info.pop('principal_user_ids', None)
+
 
+# カテゴリ・エコ活動のキャッシュの無効化
+MASTER_DATA_MODELS = (Category, EcoAction)
 
-# ★★★ after_flushイベントリスナーを追加 ★★★
 @event.listens_for(Session, 'after_flush')
-def after_flush(session, flush_context):
+def collect_master_data_changes(session, flush_context):
     """
-    flushが完了した後に、保存しておいた情報を使って安全にDB操作を行う
+    カテゴリ・エコ活動の変更がflushされたらキャッシュを破棄する。
+    コミットまでの間、このセッションではキャッシュを使わない(core.master_data.MasterDataCache.get)
     """
-    # before_flushで保存したオブジェクトリストを取得
-    if 'updated_eco_actions' in session.info:
-        updated_eco_actions = session.info['updated_eco_actions']
-        
-        for eco_action in updated_eco_actions:
-            # 以前のnotify_frontend_updateを呼び出す
-            # この時点ではflushが完了しているので、DB操作は安全
-            notify_frontend_update(eco_action, action_type="UPDATE", db=session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, MASTER_DATA_MODELS):
+            session.info[MASTER_DATA_CHANGED] = True
+            master_data_cache.invalidate()
+            # 他のワーカーのキャッシュの破棄と、端末への通知
+            publish(session, {"type": "master_data"})
+            return
 
-        # 使い終わった情報はクリアする
-        del session.info['updated_eco_actions']
\ No newline at end of file
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_master_data_cache(session):
+    """
+    コミット完了後にもう一度破棄する
+    (flushからコミットまでの間に、別リクエストが古い値をキャッシュしている可能性があるため)
+    """
+    if session.info.pop(MASTER_DATA_CHANGED, False):
+        master_data_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_master_data_changes(session):
+    # ロールバックした場合も、flushした内容を読み込んだキャッシュが残らないよう破棄する
+    if session.info.pop(MASTER_DATA_CHANGED, False):
+        master_data_cache.invalidate()
+
+
+@event.listens_for(Session, 'before_flush')
+def stamp_sync_versions(session, flush_context, instances):
+    """
+    スケジュール・達成記録の変更をflushする前に、持ち主のユーザーのdata_versionを上げ(一覧取得のETagが変わる)、
+    変更する行のsync_versionにその値を入れる。達成記録だけが変わった場合もスケジュールのsync_versionを更新する。
+    削除したスケジュールは削除記録(SyncTombstone)を残す。
+    同じトランザクションで更新するので、ロールバックされた場合は元に戻る。
+    session.execute(insert(...))等の一括更新はflushを経由しないので、それぞれの処理でcrud.syncの関数を呼ぶ。
+    """
+    deleted = set(session.deleted)
+    schedules = {}
+    deleted_schedules = []
+    achievements = []
+    for obj in list(session.new) + list(session.dirty) + list(deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Schedule):
+            if obj in deleted:
+                deleted_schedules.append(obj)
+            else:
+                schedules[obj.schedule_id or id(obj)] = obj
+        elif isinstance(obj, EcoActionAchievement):
+            achievements.append(obj)
+    if not (schedules or deleted_schedules or achievements):
+        return
+
+    # 達成記録のスケジュール(持ち主の確認と、sync_versionの更新に使う)
+    deleted_schedule_ids = {schedule.schedule_id for schedule in deleted_schedules}
+    parents = {}
+    missing_ids = set()
+    for achievement in achievements:
+        parent = achievement.__dict__.get("schedule")
+        if parent is not None:
+            parents[id(achievement)] = parent
+        elif achievement.schedule_id is not None and achievement.schedule_id not in deleted_schedule_ids:
+            missing_ids.add(achievement.schedule_id)
+    loaded = {}
+    if missing_ids:
+        with session.no_autoflush:
+            loaded = {schedule.schedule_id: schedule for schedule in session.scalars(
+                select(Schedule).where(Schedule.schedule_id.in_(missing_ids))
+            )}
+    for achievement in achievements:
+        parent = parents.get(id(achievement)) or loaded.get(achievement.schedule_id)
+        if parent is None or parent in deleted:
+            parents.pop(id(achievement), None)
+            continue
+        parents[id(achievement)] = parent
+        schedules.setdefault(parent.schedule_id or id(parent), parent)
+
+    user_ids = {schedule.user_id for schedule in list(schedules.values()) + deleted_schedules} - {None}
+    versions = touch_user_data(session, user_ids=user_ids)
+
+    for schedule in schedules.values():
+        if schedule.user_id in versions:
+            schedule.sync_version = versions[schedule.user_id]
+    for achievement in achievements:
+        parent = parents.get(id(achievement))
+        if achievement not in deleted and parent is not None and parent.user_id in versions:
+            achievement.sync_version = versions[parent.user_id]
+    for schedule in deleted_schedules:
+        if schedule.user_id in versions:
+            session.add(SyncTombstone(
+                user_id=schedule.user_id, entity_id=schedule.schedule_id, sync_version=versions[schedule.user_id]
+            ))
+
+
+@event.listens_for(Session, 'after_flush')
+def publish_statistics_changes(session, flush_context):
+    """ユーザーの統計・全体の統計の変更を端末に通知する(コミット時に送られる)"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, UserStatistics) and obj.user_id is not None:
+            publish(session, {"type": "statistics", "user_id": str(obj.user_id)})
+        elif isinstance(obj, OverallStats):
+            publish(session, {"type": "overall_statistics"})
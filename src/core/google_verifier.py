@@ -0,0 +1,129 @@
+import asyncio
+import re
+import threading
+import time
+
+import requests
+from google.auth import jwt as google_jwt
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# Googleが発行するIDトークンのiss
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Cache-Controlがない場合に証明書を保持する秒数
+DEFAULT_CERTS_MAX_AGE_SECONDS = 3600
+# 期限切れになる何秒前にバックグラウンドで証明書を更新するか
+CERTS_REFRESH_MARGIN_SECONDS = 300
+# 更新に失敗した場合に再試行するまでの秒数
+CERTS_RETRY_INTERVAL_SECONDS = 60
+
+
+class GoogleIdTokenVerifier:
+    """
+    GoogleのIDトークンを検証するコンポーネント。
+
+    id_token.verify_oauth2_tokenはリクエストのたびに証明書を取得しうるため、
+    証明書をメモリに保持し、Cache-Controlのmax-ageに従ってバックグラウンドで更新する。
+    検証自体はネットワークI/Oなしで行い、verify_asyncはスレッドプールで実行してイベントループを塞がない。
+    証明書がない・期限切れの場合(起動直後など)は、verify_asyncがバックグラウンドと同じ更新処理を待つ。
+    """
+
+    def __init__(self, certs_url: str):
+        self.certs_url = certs_url
+        self._certs: dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._http = requests.Session()
+        # 実行中の証明書の取得。同時に必要になったリクエストとバックグラウンドの更新で共有する
+        self._refresh_task: asyncio.Future | None = None
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def refresh_certs(self) -> float:
+        """証明書を取得してメモリに保持し、次に更新するまでの秒数を返す"""
+        response = self._http.get(self.certs_url, timeout=10)
+        response.raise_for_status()
+        certs = response.json()
+
+        max_age = _parse_max_age(response.headers.get("Cache-Control"))
+        # 経由したキャッシュで既に経過している秒数を差し引く
+        age = int(response.headers.get("Age", "0") or 0)
+        ttl = max(max_age - age, 0)
+
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.time() + ttl
+
+        return max(ttl - CERTS_REFRESH_MARGIN_SECONDS, CERTS_RETRY_INTERVAL_SECONDS)
+
+    async def refresh_certs_async(self) -> float:
+        """
+        refresh_certsをスレッドプールで実行する。
+        取得中に呼ばれた場合は新たに取得せず、実行中の取得の結果を待つ(シングルフライト)。
+        """
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.ensure_future(run_in_threadpool(self.refresh_certs))
+        # 待っているリクエストがキャンセルされても、他のリクエストのために取得は続ける
+        return await asyncio.shield(task)
+
+    def verify(self, token: str, audience: str | None) -> dict:
+        """
+        IDトークンの署名・有効期限・aud・issを検証し、ペイロードを返す。
+        無効な場合、または証明書を取得できていない場合はValueErrorを送出する。
+        ネットワークI/Oは行わないので、証明書の取得はverify_asyncまたはrefresh_certsで済ませておくこと。
+        """
+        certs = self._get_certs()
+        idinfo = google_jwt.decode(token, certs=certs, audience=audience, clock_skew_in_seconds=10)
+
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}")
+
+        return idinfo
+
+    async def verify_async(self, token: str, audience: str | None) -> dict:
+        # バックグラウンド更新が間に合っていない場合(起動直後など)は、取得を待ってから検証する
+        if not self._has_valid_certs():
+            try:
+                await self.refresh_certs_async()
+            except Exception as e:
+                # 取得に失敗した場合は保持している証明書で検証する(証明書がなければverifyがValueErrorを送出する)
+                print(f"Failed to refresh Google certificates: {e}")
+        # 署名検証はCPUを使うので、イベントループではなくスレッドプールで実行する
+        return await run_in_threadpool(self.verify, token, audience)
+
+    async def run_refresher(self):
+        """証明書を定期的に更新するバックグラウンドタスク。起動直後に一度取得しておく"""
+        while True:
+            try:
+                wait_seconds = await self.refresh_certs_async()
+            except Exception as e:
+                print(f"Failed to refresh Google certificates: {e}")
+                wait_seconds = CERTS_RETRY_INTERVAL_SECONDS
+            await asyncio.sleep(wait_seconds)
+
+    def _has_valid_certs(self) -> bool:
+        with self._lock:
+            return bool(self._certs) and self._expires_at >= time.time()
+
+    def _get_certs(self) -> dict[str, str]:
+        with self._lock:
+            certs = self._certs
+        if not certs:
+            raise ValueError("Google certificates are not available yet")
+        return certs
+
+
+def _parse_max_age(cache_control: str | None) -> int:
+    if cache_control:
+        match = re.search(r"max-age=(\d+)", cache_control)
+        if match:
+            return int(match.group(1))
+    return DEFAULT_CERTS_MAX_AGE_SECONDS
+
+
+google_verifier = GoogleIdTokenVerifier(certs_url=settings.GOOGLE_CERTS_URL)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import settings
+
+
+class HashingQueueFullError(Exception):
+    """ハッシュ計算の待ち行列が上限に達している"""
+
+
+def _timed_call(fn, *args):
+    # プロセスプール内で実行される。開始・終了時刻を一緒に返して待ち時間と計算時間を測る
+    started_at = time.time()
+    result = fn(*args)
+    return started_at, time.time(), result
+
+
+class PasswordHashingService:
+    """
+    bcryptによるパスワードのハッシュ化・検証を専用のプロセスプールで実行するサービス。
+
+    anyioのスレッドプール(同期ルートが共有している)を占有せず、複数コアでbcryptを計算する。
+    待ち行列がmax_queue_depthを超えた場合はHashingQueueFullErrorを送出し、
+    ログインが殺到してもリクエストが際限なく積み上がらないようにする。
+    max_workersが0の場合はプロセスプールを使わず、スレッドで実行する。
+    """
+
+    def __init__(self, max_workers: int, max_queue_depth: int):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._metrics = {
+            "completed": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "hash_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+        }
+
+    async def run(self, fn, *args):
+        """fn(*args)をプール上で実行し、その結果を返す。fnはpickle可能なモジュールレベルの関数であること"""
+        if self._pending >= self.max_queue_depth:
+            self._metrics["rejected"] += 1
+            raise HashingQueueFullError()
+
+        self._pending += 1
+        submitted_at = time.time()
+        try:
+            if self.max_workers > 0:
+                loop = asyncio.get_running_loop()
+                started_at, finished_at, result = await loop.run_in_executor(
+                    self._get_executor(), _timed_call, fn, *args
+                )
+            else:
+                started_at, finished_at, result = await asyncio.to_thread(_timed_call, fn, *args)
+        except BrokenProcessPool:
+            # ワーカープロセスが落ちた場合は、次回の呼び出しでプールを作り直す
+            self.shutdown()
+            raise
+        finally:
+            self._pending -= 1
+
+        self._record(max(started_at - submitted_at, 0.0), finished_at - started_at)
+        return result
+
+    def stats(self) -> dict:
+        completed = self._metrics["completed"]
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_depth": self._pending,
+            **self._metrics,
+            "queue_wait_seconds_avg": self._metrics["queue_wait_seconds_total"] / completed if completed else 0.0,
+            "hash_seconds_avg": self._metrics["hash_seconds_total"] / completed if completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # 最初に使われたときにプロセスを起動する
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _record(self, queue_wait: float, hash_time: float) -> None:
+        self._metrics["completed"] += 1
+        self._metrics["queue_wait_seconds_total"] += queue_wait
+        self._metrics["queue_wait_seconds_max"] = max(self._metrics["queue_wait_seconds_max"], queue_wait)
+        self._metrics["hash_seconds_total"] += hash_time
+        self._metrics["hash_seconds_max"] = max(self._metrics["hash_seconds_max"], hash_time)
+
+
+hashing_service = PasswordHashingService(
+    max_workers=settings.HASHING_POOL_WORKERS,
+    max_queue_depth=settings.HASHING_MAX_QUEUE_DEPTH,
+)
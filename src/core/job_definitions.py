@@ -0,0 +1,59 @@
+"""
+定期実行・非同期実行するジョブの一覧
+ここで登録した種類のジョブだけが、core.jobsのワーカーで実行される
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.achievement_reconciler import process_pending_reconciliations
+from core.email_outbox import dispatch_pending_emails, get_shared_transport
+from core.jobs import job
+from crud.job import delete_finished_jobs
+from crud.refresh_token import delete_stale_refresh_tokens
+from crud.simple_statistics import calculate_overall_statistics
+from crud.sync import delete_expired_tombstones
+
+
+@job("refresh_tokens.sweep", every=settings.REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS)
+def sweep_refresh_tokens(db: Session, payload: dict) -> None:
+    """期限切れ・失効済みのリフレッシュトークンを削除する"""
+    deleted_count = delete_stale_refresh_tokens(db, batch_size=settings.REFRESH_TOKEN_SWEEP_BATCH_SIZE)
+    print(f"Deleted {deleted_count} stale refresh tokens")
+
+
+@job("emails.dispatch", every=settings.EMAIL_DISPATCH_INTERVAL_SECONDS)
+def dispatch_emails(db: Session, payload: dict) -> None:
+    """送信キューのメールを1バッチ分送信する(リクエストの処理中にはメールを送らない)"""
+    result = dispatch_pending_emails(db, get_shared_transport())
+    if result["sent"] or result["failed"]:
+        print(f"Dispatched emails: sent={result['sent']}, failed={result['failed']}")
+
+
+@job("achievements.reconcile", every=settings.ACHIEVEMENT_RECONCILE_INTERVAL_SECONDS)
+def reconcile_achievements(db: Session, payload: dict) -> None:
+    """エコ活動の変更で登録されたカテゴリの達成記録を再計算する"""
+    process_pending_reconciliations(db)
+
+
+@job("statistics.overall", every=settings.OVERALL_STATS_INTERVAL_SECONDS)
+def calculate_overall_stats(db: Session, payload: dict) -> None:
+    """全ユーザーの統計情報を達成記録から集計し直す"""
+    calculate_overall_statistics(db)
+
+
+@job("jobs.cleanup", every=settings.JOB_CLEANUP_INTERVAL_SECONDS)
+def cleanup_jobs(db: Session, payload: dict) -> None:
+    """保持期間を過ぎた終了済みのジョブを削除する"""
+    older_than = datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    deleted_count = delete_finished_jobs(db, older_than=older_than)
+    print(f"Deleted {deleted_count} finished jobs")
+
+
+@job("sync_tombstones.cleanup", every=settings.SYNC_TOMBSTONE_CLEANUP_INTERVAL_SECONDS)
+def cleanup_sync_tombstones(db: Session, payload: dict) -> None:
+    """保持期間を過ぎた差分同期の削除記録を削除する"""
+    older_than = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted_count = delete_expired_tombstones(db, older_than=older_than, batch_size=settings.SYNC_TOMBSTONE_CLEANUP_BATCH_SIZE)
+    print(f"Deleted {deleted_count} sync tombstones")
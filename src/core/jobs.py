@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from crud.job import claim_job, enqueue_job, mark_job_failed, mark_job_succeeded
+from db.session import SessionLocal
+
+# ジョブの処理。同じセッションでDBを操作し、コミットはジョブの終了時にまとめて行われる
+JobHandler = Callable[[Session, dict], None]
+
+
+@dataclass(frozen=True)
+class JobDefinition:
+    kind: str
+    handler: JobHandler
+    max_attempts: int
+    # 定期実行の間隔(秒)。Noneの場合は登録された時だけ実行する
+    interval_seconds: float | None
+
+
+class JobRegistry:
+    """ジョブの種類と処理の対応"""
+
+    def __init__(self):
+        self._definitions: dict[str, JobDefinition] = {}
+
+    def register(self, kind: str, max_attempts: int = 5, every: float | None = None):
+        """
+        ジョブの処理を登録するデコレータ。
+        everyを指定すると定期実行のジョブになる(0以下の場合は定期実行しない)。
+        """
+        def decorator(handler: JobHandler) -> JobHandler:
+            interval_seconds = every if every and every > 0 else None
+            self._definitions[kind] = JobDefinition(kind, handler, max_attempts, interval_seconds)
+            return handler
+        return decorator
+
+    def get(self, kind: str) -> JobDefinition | None:
+        return self._definitions.get(kind)
+
+    def recurring(self) -> list[JobDefinition]:
+        return [definition for definition in self._definitions.values() if definition.interval_seconds]
+
+    def kinds(self) -> list[str]:
+        return sorted(self._definitions)
+
+
+registry = JobRegistry()
+job = registry.register
+
+
+def enqueue(db: Session, kind: str, payload: dict | None = None, run_at: datetime | None = None, unique_key: str | None = None):
+    """登録済みの種類のジョブを登録する(コミットは呼び出し側で行う)"""
+    definition = registry.get(kind)
+    if definition is None:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return enqueue_job(
+        db, kind, payload=payload, run_at=run_at, max_attempts=definition.max_attempts, unique_key=unique_key
+    )
+
+
+def ensure_recurring_jobs(db: Session) -> None:
+    """定期実行のジョブが登録されていなければ登録する(ワーカーごとに呼ばれても1つだけ登録される)"""
+    for definition in registry.recurring():
+        enqueue(db, definition.kind, unique_key=f"recurring:{definition.kind}")
+    db.commit()
+
+
+def run_next_job(db: Session, worker_id: str) -> bool:
+    """
+    実行時刻になったジョブを1つ実行する。実行するジョブがなかった場合はFalseを返す。
+    ジョブの処理が失敗した場合は、その変更をロールバックしてから失敗を記録する。
+    """
+    db_job = claim_job(db, worker_id=worker_id, lease_seconds=settings.JOB_LEASE_SECONDS)
+    if db_job is None:
+        return False
+
+    definition = registry.get(db_job.kind)
+    if definition is None:
+        db_job.attempts = db_job.max_attempts
+        mark_job_failed(db, db_job, error=f"Unknown job kind: {db_job.kind}", backoff_seconds=0)
+        db.commit()
+        job_runner.stats.record(failed=True)
+        return True
+
+    next_run_at = None
+    if definition.interval_seconds:
+        next_run_at = datetime.utcnow() + timedelta(seconds=definition.interval_seconds)
+
+    try:
+        definition.handler(db, dict(db_job.payload or {}))
+    except Exception as e:
+        db.rollback()
+        print(f"Job {db_job.kind} ({db_job.id}) failed: {e}")
+        traceback.print_exc()
+        mark_job_failed(db, db_job, error=str(e) or type(e).__name__, backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS, next_run_at=next_run_at)
+        db.commit()
+        job_runner.stats.record(failed=True)
+        return True
+
+    mark_job_succeeded(db, db_job, next_run_at=next_run_at)
+    db.commit()
+    job_runner.stats.record(failed=False)
+    return True
+
+
+class JobRunnerStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+
+    def record(self, failed: bool) -> None:
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {"succeeded": self.succeeded, "failed": self.failed}
+
+
+class JobRunner:
+    """
+    ジョブを実行するワーカーのプール。
+    gunicornの各ワーカーのlifespanで起動するか、scripts.run_jobsで別プロセスとして起動する。
+    ジョブの処理はスレッドプールで実行し、イベントループを塞がない。
+    """
+
+    def __init__(self):
+        self.stats = JobRunnerStats()
+        self.concurrency = 0
+
+    def _run_one(self, worker_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return run_next_job(db, worker_id)
+        finally:
+            db.close()
+
+    def _ensure_recurring_jobs(self) -> None:
+        db = SessionLocal()
+        try:
+            ensure_recurring_jobs(db)
+        finally:
+            db.close()
+
+    async def _worker(self, worker_id: str, poll_interval_seconds: float) -> None:
+        while True:
+            try:
+                ran = await run_in_threadpool(self._run_one, worker_id)
+            except Exception as e:
+                # ジョブの取得自体が失敗しても(DBの一時的な障害など)次の間隔で再試行する
+                print(f"Job worker {worker_id} failed: {e}")
+                ran = False
+            if not ran:
+                await asyncio.sleep(poll_interval_seconds)
+
+    async def run(
+        self,
+        concurrency: int = settings.JOB_WORKER_CONCURRENCY,
+        poll_interval_seconds: float = settings.JOB_POLL_INTERVAL_SECONDS,
+    ) -> None:
+        """concurrency個のワーカーでジョブを実行し続ける(キャンセルされるまで戻らない)"""
+        try:
+            await run_in_threadpool(self._ensure_recurring_jobs)
+        except Exception as e:
+            print(f"Failed to register recurring jobs: {e}")
+
+        self.concurrency = concurrency
+        workers = [
+            asyncio.create_task(self._worker(f"{os.getpid()}-{i}", poll_interval_seconds))
+            for i in range(concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.concurrency = 0
+
+
+job_runner = JobRunner()
@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.category import Category
+from models.eco_action import EcoAction
+from schemas.category import CategoryResponse
+from schemas.eco_action import EcoActionResponse
+
+# カテゴリ・エコ活動の変更をflushしたセッションに付ける印(core.eventsで設定する)
+MASTER_DATA_CHANGED = "master_data_changed"
+
+_categories_adapter = TypeAdapter(list[CategoryResponse])
+_eco_actions_adapter = TypeAdapter(list[EcoActionResponse])
+
+
+@dataclass(frozen=True)
+class MasterDataSnapshot:
+    """
+    ある時点のカテゴリ・エコ活動の内容。作成後は変更しない。
+    APIのレスポンスはシリアライズ済みのバイト列として、ETagはその内容のハッシュとして持っておく。
+    versionはワーカーごとの番号なので、ワーカーをまたいで使うETagには内容のハッシュを使う。
+    """
+    version: int
+    categories: list[CategoryResponse]
+    eco_actions: list[EcoActionResponse]
+    categories_json: bytes
+    eco_actions_json: bytes
+    categories_etag: str
+    eco_actions_etag: str
+    eco_action_ids_by_category: dict[uuid.UUID, list[uuid.UUID]] = field(default_factory=dict)
+
+    def is_category_valid(self, category_id) -> bool:
+        return category_id in self.eco_action_ids_by_category
+
+    def eco_action_ids(self, category_id) -> list[uuid.UUID]:
+        return self.eco_action_ids_by_category.get(category_id, [])
+
+
+def load_snapshot(db: Session, version: int = 0) -> MasterDataSnapshot:
+    """カテゴリとエコ活動を1回ずつ読み込み、スナップショットを作る"""
+    categories = [CategoryResponse.model_validate(category) for category in db.scalars(
+        select(Category).order_by(Category.category_name)
+    )]
+    categories_by_id = {category.category_id: category for category in categories}
+
+    eco_actions = []
+    eco_action_ids_by_category: dict[uuid.UUID, list[uuid.UUID]] = {category_id: [] for category_id in categories_by_id}
+    for row in db.execute(
+        select(
+            EcoAction.eco_action_id, EcoAction.content, EcoAction.money_saved,
+            EcoAction.co2_reduction, EcoAction.category_id,
+        ).order_by(EcoAction.content, EcoAction.eco_action_id)
+    ):
+        eco_actions.append(EcoActionResponse(
+            eco_action_id=row.eco_action_id,
+            content=row.content,
+            money_saved=row.money_saved,
+            co2_reduction=row.co2_reduction,
+            category=categories_by_id.get(row.category_id),
+        ))
+        if row.category_id in eco_action_ids_by_category:
+            eco_action_ids_by_category[row.category_id].append(row.eco_action_id)
+
+    categories_json = _categories_adapter.dump_json(categories)
+    eco_actions_json = _eco_actions_adapter.dump_json(eco_actions)
+    return MasterDataSnapshot(
+        version=version,
+        categories=categories,
+        eco_actions=eco_actions,
+        categories_json=categories_json,
+        eco_actions_json=eco_actions_json,
+        categories_etag=_content_etag(categories_json),
+        eco_actions_etag=_content_etag(eco_actions_json),
+        eco_action_ids_by_category=eco_action_ids_by_category,
+    )
+
+
+def _content_etag(content: bytes) -> str:
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class MasterDataCache:
+    """
+    カテゴリ・エコ活動(マスターデータ)のワーカー単位のキャッシュ。
+    管理画面からしか変更されないので、全件をスナップショットとして持ち、
+    /categories・/eco_actionsとスケジュール作成時のカテゴリ確認・エコ活動の取得に使う。
+
+    - 変更がflushされたらinvalidateでバージョンを上げ、次に使う時に読み込み直す
+    - 別のワーカーでの変更はTTLを過ぎたら反映される
+    - 読み込み中にinvalidateされた場合、読み込んだスナップショットは保存しない
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self._version = 0
+        self._snapshot: MasterDataSnapshot | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, db: Session) -> MasterDataSnapshot:
+        """
+        スナップショットを返す。なければdbから読み込む。
+        このセッションでマスターデータを変更している場合は、コミット前の内容をキャッシュしないよう毎回読み込む。
+        """
+        if not self.enabled or db.info.get(MASTER_DATA_CHANGED):
+            return load_snapshot(db)
+
+        with self._lock:
+            if self._snapshot is not None and self._expires_at > time.monotonic():
+                self.hits += 1
+                return self._snapshot
+            version = self._version
+
+        snapshot = load_snapshot(db, version=version)
+
+        with self._lock:
+            self.loads += 1
+            if version == self._version:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl_seconds
+        return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "cached": self._snapshot is not None,
+                "ttl_seconds": self.ttl_seconds,
+                "categories": len(self._snapshot.categories) if self._snapshot else None,
+                "eco_actions": len(self._snapshot.eco_actions) if self._snapshot else None,
+                "hits": self.hits,
+                "loads": self.loads,
+                "invalidations": self.invalidations,
+            }
+
+
+master_data_cache = MasterDataCache(ttl_seconds=settings.MASTER_DATA_CACHE_TTL_SECONDS)
@@ -0,0 +1,47 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+
+class InvalidCursorError(ValueError):
+    """クライアントから受け取ったカーソルを解釈できない"""
+
+
+def encode_schedule_cursor(start_schedule: datetime, schedule_id: uuid.UUID) -> str:
+    """
+    スケジュール一覧の次のページのカーソルを作る。
+    クライアントには中身を意識させないよう、最後に返した行の(start_schedule, schedule_id)をURLセーフなBase64で包む。
+    """
+    payload = json.dumps([start_schedule.isoformat(), str(schedule_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_schedule_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_schedule, schedule_id = json.loads(payload)
+        return datetime.fromisoformat(start_schedule), uuid.UUID(schedule_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def encode_sync_cursor(sync_version: int, schedule_id: uuid.UUID | None = None) -> str:
+    """
+    差分同期のカーソルを作る。(sync_version, schedule_id)より後の変更が次の対象。
+    schedule_idがNoneの場合は、sync_versionまでの変更を全て受け取った状態を表す。
+    """
+    payload = json.dumps([sync_version, str(schedule_id) if schedule_id else None], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str) -> tuple[int, uuid.UUID | None]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sync_version, schedule_id = json.loads(payload)
+        if not isinstance(sync_version, int):
+            raise TypeError("sync_version must be an integer")
+        return sync_version, uuid.UUID(schedule_id) if schedule_id is not None else None
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
@@ -0,0 +1,149 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from config import settings
+import models.user
+
+# キャッシュに保持するカラム(モデルの全カラム)
+# 非同期セッションでは、スナップショットにないカラムを読むと遅延ロードになり失敗するので、カラムを追加しても漏れないようにモデルから作る
+# data_version等、他のトランザクションの一括更新で変わるカラムはキャッシュした時点の値なので、
+# 最新の値が必要な場合はDBから読むこと(crud.aio.user.get_user_data_version等)
+# (マッパーの構成は全モデルの読み込み後に行われるので、最初に使う時点で作る)
+@functools.cache
+def _column_keys(model) -> tuple[str, ...]:
+    return tuple(attr.key for attr in inspect(model).column_attrs)
+
+
+class PrincipalCache:
+    """
+    認証済みユーザー(プリンシパル)のワーカー単位のキャッシュ。
+    get_current_userが毎リクエストでユーザーをDBから読み直すのを避ける。
+
+    - TTLを過ぎたエントリは使わない
+    - 最大件数を超えたら最も古く使われたエントリから捨てる(LRU)
+    - is_active、認証情報、リフレッシュトークンが変更されたらinvalidateで明示的に破棄する
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._emails_by_user_id: dict = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, db: Session, email: str) -> models.user.User | None:
+        """
+        キャッシュからユーザーを取り出し、渡されたセッションにSELECTなしで結びつけて返す。
+        キャッシュにない、または期限切れの場合はNoneを返す。
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                self._remove(email)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(email)
+            self.hits += 1
+
+        return _attach_snapshot(db, snapshot)
+
+    def set(self, user: models.user.User) -> None:
+        """DBから読み込んだユーザーをキャッシュに保存する"""
+        if not self.enabled:
+            return
+
+        snapshot = _take_snapshot(user)
+
+        with self._lock:
+            self._remove(user.email)
+            self._entries[user.email] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._emails_by_user_id[user.id] = user.email
+
+            while len(self._entries) > self.max_size:
+                _, (_, oldest_snapshot) = self._entries.popitem(last=False)
+                self._emails_by_user_id.pop(oldest_snapshot["user"]["id"], None)
+                self.evictions += 1
+
+    def invalidate(self, email: str | None = None, user_id=None) -> None:
+        """メールアドレスまたはユーザーIDを指定してエントリを破棄する"""
+        with self._lock:
+            if email is None and user_id is not None:
+                email = self._emails_by_user_id.get(user_id)
+            if email is not None:
+                self._remove(email)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._emails_by_user_id.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def _remove(self, email: str) -> None:
+        # ロックを取得した状態で呼び出すこと
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            user_id = entry[1]["user"]["id"]
+            self._emails_by_user_id.pop(user_id, None)
+
+
+def _take_snapshot(user: models.user.User) -> dict:
+    credential = user.credential
+    return {
+        "user": {column: getattr(user, column) for column in _column_keys(models.user.User)},
+        "credential": (
+            {column: getattr(credential, column) for column in _column_keys(models.user.UserCredential)}
+            if credential is not None else None
+        ),
+    }
+
+
+def _attach_snapshot(db: Session, snapshot: dict) -> models.user.User:
+    # スナップショットから「DBから読み込んだばかり」の状態のオブジェクトを組み立てる
+    user = models.user.User(**snapshot["user"])
+    if snapshot["credential"] is not None:
+        user.credential = models.user.UserCredential(**snapshot["credential"])
+        make_transient_to_detached(user.credential)
+    make_transient_to_detached(user)
+
+    # load=Falseでmergeすると、SELECTを発行せずにセッションに登録される
+    # credential以外のrelationshipは、アクセスされた時点で通常通り遅延ロードされる
+    return db.merge(user, load=False)
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.master_data import master_data_cache
+from core.principal_cache import principal_cache
+from db.routing import recent_writes
+
+# ワーカー間で変更を通知するPostgresのチャンネル(LISTEN/NOTIFY)
+PUSH_CHANNEL = "eco_push"
+# NOTIFYのペイロードの上限(8000バイト)に収まるように、1回の通知に入れるイベントを分ける
+MAX_NOTIFY_PAYLOAD_BYTES = 7000
+
+# session.infoに、コミット時に通知するイベントを貯めておくキー
+PENDING_PUSH_EVENTS = "push_events"
+
+# 全接続に送るイベント(それ以外はuser_idのユーザーの接続にだけ送る)
+#   master_data: カテゴリ・エコ活動が変わった(/categories・/eco_actionsを取り直す)
+#   overall_statistics: 全体の統計が変わった
+#   resync: 取りこぼした通知がある可能性がある(全て取り直す)
+# ワーカー間でだけ使うイベント(接続には送らない)
+#   principal: user_idsのユーザーのis_active・認証情報・リフレッシュトークンが変わった(認証済みユーザーのキャッシュを破棄する)
+# ユーザーごとのイベント
+#   user_data: スケジュール・達成記録が変わった(data_versionは一覧のETagの元になる変更番号)
+#   statistics: ユーザーの統計が変わった
+
+
+def publish(session: Session, push_event: dict) -> None:
+    """
+    イベントを通知する。セッションのトランザクションがコミットされた場合だけ、全ワーカーの接続に届く。
+    同じコミットでの重複したイベントは1つにまとめる。
+    """
+    pending = session.info.setdefault(PENDING_PUSH_EVENTS, [])
+    if push_event not in pending:
+        pending.append(push_event)
+
+
+class Subscriber:
+    """
+    1つのSSE接続。アイドル状態の接続を大量に保持するので、未送信のイベントと起床用のEventだけを持つ。
+    未送信のイベントが上限を超えた場合(クライアントが読み込まない)は、捨ててresyncを送る。
+    """
+    __slots__ = ("user_id", "pending", "wakeup", "overflowed")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.pending: deque[str] = deque()
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+    def put(self, message: str, max_pending: int) -> bool:
+        if len(self.pending) >= max_pending:
+            self.pending.clear()
+            self.overflowed = True
+            self.wakeup.set()
+            return False
+        self.pending.append(message)
+        self.wakeup.set()
+        return True
+
+
+class PushHub:
+    """
+    ワーカー内のSSE接続を管理し、イベントを該当する接続に配る。
+    ワーカー間の配信はPostgresのLISTEN/NOTIFY(run_push_listener)で行い、Postgres以外では同じワーカー内にだけ配る。
+    全接続に送るイベントは、broadcast_interval_seconds内に続いた場合は1つにまとめて送る。
+    """
+
+    def __init__(self, max_pending: int, heartbeat_seconds: float, broadcast_interval_seconds: float):
+        self.max_pending = max_pending
+        self.heartbeat_seconds = heartbeat_seconds
+        self.broadcast_interval_seconds = broadcast_interval_seconds
+        self.listening = False
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscribers_by_user: dict[str, set[Subscriber]] = {}
+        self._connections = 0
+        self._last_broadcast_at: dict[str, float] = {}
+        self._delayed_broadcasts: dict[str, asyncio.TimerHandle] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    # --- 接続の管理(イベントループ上で呼び出すこと) ---
+
+    def subscribe(self, user_id) -> Subscriber:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 別のイベントループ(テスト等)で予約した送信は実行されないので捨てる
+            self._loop = loop
+            self._delayed_broadcasts.clear()
+            self._last_broadcast_at.clear()
+        subscriber = Subscriber(str(user_id))
+        self._subscribers_by_user.setdefault(subscriber.user_id, set()).add(subscriber)
+        self._connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers_by_user.get(subscriber.user_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers_by_user[subscriber.user_id]
+        self._connections -= 1
+
+    async def stream(self, subscriber: Subscriber):
+        """SSEの形式でイベントを返す。一定時間イベントがなければ、接続を維持するためのコメントを送る"""
+        yield f"retry: {int(settings.PUSH_RETRY_MILLISECONDS)}\n\n"
+        while True:
+            try:
+                await asyncio.wait_for(subscriber.wakeup.wait(), timeout=self.heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            subscriber.wakeup.clear()
+            if subscriber.overflowed:
+                subscriber.overflowed = False
+                yield _format_event({"type": "resync"})
+            while subscriber.pending:
+                yield subscriber.pending.popleft()
+
+    # --- イベントの配信 ---
+
+    def receive(self, payload: str) -> None:
+        """NOTIFYで受け取ったペイロード(イベントのリスト)を配る"""
+        self.received += 1
+        try:
+            push_events = json.loads(payload)
+        except ValueError:
+            print(f"Invalid push payload: {payload[:200]}")
+            return
+        for push_event in push_events:
+            self.dispatch(push_event)
+
+    def dispatch(self, push_event: dict) -> None:
+        """イベントを該当する接続に配る。イベントループ上で呼び出すこと"""
+        if not _invalidate_caches(push_event):
+            return
+
+        user_id = push_event.get("user_id")
+        if user_id is not None:
+            self._deliver(self._subscribers_by_user.get(user_id, ()), _format_event(push_event))
+            return
+
+        event_type = push_event["type"]
+        if event_type in self._delayed_broadcasts:
+            return
+        elapsed = time.monotonic() - self._last_broadcast_at.get(event_type, float("-inf"))
+        if elapsed < self.broadcast_interval_seconds and self._loop is not None:
+            self._delayed_broadcasts[event_type] = self._loop.call_later(
+                self.broadcast_interval_seconds - elapsed, self._broadcast, push_event
+            )
+            return
+        self._broadcast(push_event)
+
+    def dispatch_threadsafe(self, push_events: list[dict]) -> None:
+        """イベントループ以外のスレッド(同期のエンドポイント等)からも呼び出せるdispatch"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            # 接続を受け付けたことがないワーカーでは、キャッシュの破棄だけ行う
+            for push_event in push_events:
+                _invalidate_caches(push_event)
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for push_event in push_events:
+            if running_loop is loop:
+                self.dispatch(push_event)
+            else:
+                loop.call_soon_threadsafe(self.dispatch, push_event)
+
+    def _broadcast(self, push_event: dict) -> None:
+        event_type = push_event["type"]
+        self._delayed_broadcasts.pop(event_type, None)
+        self._last_broadcast_at[event_type] = time.monotonic()
+        message = _format_event(push_event)
+        for subscribers in list(self._subscribers_by_user.values()):
+            self._deliver(subscribers, message)
+
+    def _deliver(self, subscribers, message: str) -> None:
+        for subscriber in list(subscribers):
+            if subscriber.put(message, self.max_pending):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "connections": self._connections,
+            "users": len(self._subscribers_by_user),
+            "listening": self.listening,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def _invalidate_caches(push_event: dict) -> bool:
+    """
+    イベントに対応するワーカー内のキャッシュを破棄する(別のワーカーでの変更も、TTLを待たずに反映する)。
+    ユーザーごとの変更は直近の書き込みとして記録し、別のワーカーでもそのユーザーの読み込みをプライマリで行う。
+    接続に送るイベントの場合はTrueを返す。
+    """
+    if push_event["type"] == "master_data":
+        master_data_cache.invalidate()
+    elif push_event["type"] == "principal":
+        for user_id in push_event["user_ids"]:
+            principal_cache.invalidate(user_id=uuid.UUID(user_id))
+            recent_writes.record(user_id)
+        return False
+    if push_event.get("user_id") is not None:
+        recent_writes.record(push_event["user_id"])
+    return True
+
+
+def _format_event(push_event: dict) -> str:
+    return f"event: {push_event['type']}\ndata: {json.dumps(push_event, separators=(',', ':'))}\n\n"
+
+
+push_hub = PushHub(
+    max_pending=settings.PUSH_MAX_PENDING_EVENTS,
+    heartbeat_seconds=settings.PUSH_HEARTBEAT_SECONDS,
+    broadcast_interval_seconds=settings.PUSH_BROADCAST_INTERVAL_SECONDS,
+)
+
+
+# --- コミット時の通知 ---
+
+def _notify_payloads(push_events: list[dict]) -> list[str]:
+    # NOTIFYのペイロードの上限を超えないように分ける
+    payloads, chunk = [], []
+    for push_event in push_events:
+        candidate = json.dumps(chunk + [push_event], separators=(',', ':'))
+        if chunk and len(candidate.encode()) > MAX_NOTIFY_PAYLOAD_BYTES:
+            payloads.append(json.dumps(chunk, separators=(',', ':')))
+            chunk = []
+        chunk.append(push_event)
+    if chunk:
+        payloads.append(json.dumps(chunk, separators=(',', ':')))
+    return payloads
+
+
+@event.listens_for(Session, "before_commit")
+def send_push_notifications(session):
+    """
+    Postgresでは、コミットするトランザクションの中でNOTIFYを発行する。
+    NOTIFYはコミットされた時点で配信されるので、ロールバックされた変更は通知されない。
+    """
+    # コミット時のflushで追加されるイベントも含めるため、先にflushしておく
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    push_events = session.info.get(PENDING_PUSH_EVENTS)
+    if not push_events:
+        return
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    for payload in _notify_payloads(push_events):
+        connection.execute(select(func.pg_notify(PUSH_CHANNEL, payload)))
+    # LISTENしていないワーカー(切断中、PUSH_LISTEN_DATABASE_URLなしでDB_POOL_MODE="null"など)では
+    # 自分の通知も届かないので、コミット後に同じワーカー内に配る
+    if push_hub.listening:
+        session.info[PENDING_PUSH_EVENTS] = []
+
+
+@event.listens_for(Session, "after_commit")
+def dispatch_local_push_events(session):
+    # Postgres以外(LISTEN/NOTIFYがない)やLISTENしていない場合は、コミット後に同じワーカー内の接続に配る
+    push_events = session.info.pop(PENDING_PUSH_EVENTS, None)
+    if push_events:
+        push_hub.dispatch_threadsafe(push_events)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_push_events(session):
+    session.info.pop(PENDING_PUSH_EVENTS, None)
+
+
+async def run_push_listener(async_engine: AsyncEngine, check_interval_seconds: float = settings.PUSH_LISTENER_CHECK_INTERVAL_SECONDS):
+    """
+    Postgresの通知をLISTENし、このワーカーの接続に配るバックグラウンドタスク。
+    LISTEN用にエンジン(db.session.push_listen_engine)の接続を1つ使い続ける。
+    接続が切れた場合は再接続し、その間の通知を取りこぼした可能性があるのでresyncを送る。
+    """
+    if async_engine.dialect.name != "postgresql":
+        return
+
+    def on_notification(connection, pid, channel, payload):
+        push_hub.receive(payload)
+
+    while True:
+        try:
+            async with async_engine.connect() as conn:
+                raw_connection = await conn.get_raw_connection()
+                listener_connection = raw_connection.driver_connection
+                await listener_connection.add_listener(PUSH_CHANNEL, on_notification)
+                if not push_hub.listening:
+                    push_hub.listening = True
+                    # 接続していなかった間の変更を取り直させる
+                    # 認証済みユーザーのキャッシュも、その間の失効を取りこぼしている可能性があるので全て破棄する
+                    principal_cache.clear()
+                    push_hub.dispatch({"type": "master_data"})
+                    push_hub.dispatch({"type": "resync"})
+                try:
+                    while True:
+                        await asyncio.sleep(check_interval_seconds)
+                        # 接続が生きていることを確認する
+                        await listener_connection.execute("SELECT 1")
+                finally:
+                    await listener_connection.remove_listener(PUSH_CHANNEL, on_notification)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Push listener disconnected: {e}")
+            push_hub.listening = False
+        await asyncio.sleep(check_interval_seconds)
@@ -0,0 +1,170 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import Request
+
+from config import settings
+
+
+class RateLimitExceededError(Exception):
+    """リクエストの頻度が上限を超えている"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded. Retry after {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    # バケットの容量(連続して許可するリクエスト数)
+    capacity: int
+    # 1秒あたりに補充されるトークン数
+    refill_per_second: float
+
+
+class MemoryRateLimitBackend:
+    """
+    トークンバケットをワーカーのメモリに保持するバックエンド。
+    ワーカーごとに独立したカウンタになるので、実際の上限はワーカー数倍になる。
+    キー数がmax_keysを超えたら、最も古く使われたバケットから捨てる。
+    """
+
+    def __init__(self, max_keys: int, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def consume(self, key: str, limit: RateLimit) -> float:
+        """トークンを1つ消費する。許可された場合は0を、拒否された場合は再試行までの秒数を返す"""
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (float(limit.capacity), now))
+            tokens = min(float(limit.capacity), tokens + (now - updated_at) * limit.refill_per_second)
+
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / limit.refill_per_second
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisRateLimitBackend:
+    """
+    トークンバケットをRedisに保持するバックエンド。全ワーカーで同じカウンタを共有する。
+    redisパッケージが必要。Redisに接続できない場合はリクエストを許可する。
+    """
+
+    # バケットの読み出し・補充・消費を1回の往復でアトミックに行う
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError(
+                "RATE_LIMIT_BACKEND=redis requires the redis package (pip install -r requirements-prod.txt)"
+            ) from e
+
+        self._redis = redis.asyncio.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, limit: RateLimit) -> float:
+        try:
+            retry_after = await self._script(
+                keys=[f"rate_limit:{key}"],
+                args=[limit.capacity, limit.refill_per_second, time.time()],
+            )
+        except Exception as e:
+            print(f"Failed to check rate limit: {e}")
+            return 0.0
+        return float(retry_after)
+
+    def reset(self) -> None:
+        pass
+
+
+class RateLimiter:
+    """
+    認証系エンドポイントの呼び出し頻度を、IPアドレスごととメールアドレスごとに制限する。
+    bcryptの計算やメール送信が発生する前に呼び出し、上限を超えていたらRateLimitExceededErrorを送出する。
+    """
+
+    def __init__(self, backend, ip_limit: RateLimit, email_limit: RateLimit, enabled: bool = True):
+        self.backend = backend
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.enabled = enabled
+
+    async def check(self, request: Request, scope: str, email: str | None = None) -> None:
+        if not self.enabled:
+            return
+
+        # ProxyHeadersMiddlewareにより、信頼するプロキシ(FORWARDED_ALLOW_IPS)経由の場合だけX-Forwarded-Forのアドレスが入る
+        # それ以外は接続元のアドレスなので、ヘッダーを偽装しても別のバケットにはならない
+        client_ip = request.client.host if request.client else "unknown"
+        retry_after = await self.backend.consume(f"{scope}:ip:{client_ip}", self.ip_limit)
+
+        if not retry_after and email:
+            retry_after = await self.backend.consume(f"{scope}:email:{email.lower()}", self.email_limit)
+
+        if retry_after:
+            raise RateLimitExceededError(retry_after)
+
+    def reset(self) -> None:
+        self.backend.reset()
+
+
+def retry_after_header(exc: RateLimitExceededError) -> str:
+    # Retry-Afterは整数の秒数で返す
+    return str(max(math.ceil(exc.retry_after), 1))
+
+
+def _create_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(
+    backend=_create_backend(),
+    ip_limit=RateLimit(
+        capacity=settings.RATE_LIMIT_IP_BURST,
+        refill_per_second=settings.RATE_LIMIT_IP_PER_MINUTE / 60,
+    ),
+    email_limit=RateLimit(
+        capacity=settings.RATE_LIMIT_EMAIL_BURST,
+        refill_per_second=settings.RATE_LIMIT_EMAIL_PER_MINUTE / 60,
+    ),
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
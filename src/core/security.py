@@ -1,9 +1,20 @@
+import hashlib
+import hmac
+
 from passlib.context import CryptContext
 
+from config import settings
+from core.hashing import hashing_service
+
 # specify the hashing algorithm as bcrypt
 # the deprecated option is set to automatically use the latest algorithm
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# リフレッシュトークンはcreate_refresh_tokenで生成した32バイトの乱数なので、
+# bcryptのような低速ハッシュは不要。鍵付きHMACのダイジェストを保存し、
+# refresh_tokens.hashed_tokenのユニークインデックスで直接検索できるようにする。
+REFRESH_TOKEN_HASH_PREFIX = "hmac-sha256$"
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Compare the plain password with the hashed password
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,10 +23,31 @@ def get_password_hash(password: str) -> str:
     # Generate a hash from the plain password
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    # パスワードの検証を専用のプロセスプールで行う
+    return await hashing_service.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    # パスワードのハッシュ化を専用のプロセスプールで行う
+    return await hashing_service.run(get_password_hash, password)
+
 def verify_refresh_token(plain_token: str, hashed_token: str) -> bool:
     # Compare the plain token with the hashed token
-    return pwd_context.verify(plain_token, hashed_token)
+    if refresh_token_needs_rehash(hashed_token):
+        # 移行前のbcryptハッシュ
+        return pwd_context.verify(plain_token, hashed_token)
+    return hmac.compare_digest(get_refresh_token_hash(plain_token), hashed_token)
 
 def get_refresh_token_hash(token: str) -> str:
-    # Generate a hash from the plain token
-    return pwd_context.hash(token)
\ No newline at end of file
+    # Generate a keyed digest from the plain token
+    if not settings.REFRESH_TOKEN_HMAC_KEY:
+        raise RuntimeError("REFRESH_TOKEN_HMAC_KEY (or JWT_SECRET_KEY) is not set")
+
+    digest = hmac.new(
+        settings.REFRESH_TOKEN_HMAC_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+    return REFRESH_TOKEN_HASH_PREFIX + digest
+
+def refresh_token_needs_rehash(hashed_token: str) -> bool:
+    # HMACダイジェストでないもの(以前のbcryptハッシュ)は再ハッシュが必要
+    return not hashed_token.startswith(REFRESH_TOKEN_HASH_PREFIX)
@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from models.achievement_reconciliation import AchievementReconciliation
+from models.schedule import Schedule as ScheduleModel
+
+def claim_reconciliation(db: Session, lease_seconds: float) -> tuple[uuid.UUID, list[uuid.UUID]] | None:
+    """
+    再計算待ちのカテゴリを1つ取得し、lease_secondsの間は他のワーカーが取得しないようにする。
+    同じカテゴリの登録はまとめて1回で処理する。(カテゴリID, 登録のIDのリスト)を返す。
+    """
+    now = datetime.utcnow()
+    claimable = or_(AchievementReconciliation.locked_until.is_(None), AchievementReconciliation.locked_until < now)
+    first = db.execute(
+        select(AchievementReconciliation.category_id)
+        .where(claimable)
+        .order_by(AchievementReconciliation.requested_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if first is None:
+        db.rollback()
+        return None
+
+    category_id = first.category_id
+    requests = db.scalars(
+        select(AchievementReconciliation)
+        .where(AchievementReconciliation.category_id == category_id, claimable)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for request in requests:
+        request.locked_until = now + timedelta(seconds=lease_seconds)
+    db.commit()
+    return category_id, [request.id for request in requests]
+
+def complete_reconciliation(db: Session, request_ids: list[uuid.UUID]) -> None:
+    db.execute(delete(AchievementReconciliation).where(AchievementReconciliation.id.in_(request_ids)))
+    db.commit()
+
+def get_schedule_ids_by_category(db: Session, category_id: uuid.UUID, limit: int, after: uuid.UUID | None = None) -> list[uuid.UUID]:
+    """カテゴリのスケジュールIDをschedule_id順にlimit件取得する(afterより後から)"""
+    query = select(ScheduleModel.schedule_id).where(ScheduleModel.category_id == category_id)
+    if after is not None:
+        query = query.where(ScheduleModel.schedule_id > after)
+    return list(db.scalars(query.order_by(ScheduleModel.schedule_id).limit(limit)))
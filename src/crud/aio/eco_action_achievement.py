@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import case, null, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.eco_action_achievement import EcoActionAchievement
+from models.schedule import Schedule
+from crud.sync import achievement_owner_data_version, stamp_schedules, touch_user_data
+
+async def get_achievement_by_schedule_and_action(db: AsyncSession, schedule_id: uuid.UUID, eco_action_id: uuid.UUID):
+    """スケジュールIDとエコ活動IDで達成記録を検索"""
+    result = await db.execute(
+        select(EcoActionAchievement).where(
+            EcoActionAchievement.schedule_id == schedule_id,
+            EcoActionAchievement.eco_action_id == eco_action_id,
+        )
+    )
+    return result.scalars().first()
+
+async def set_completed_status(db: AsyncSession, db_achievement: EcoActionAchievement, status: bool):
+    """達成記録のis_completedステータスを更新"""
+    db_achievement.is_completed = status
+    await db.commit()
+    await db.refresh(db_achievement)
+    return db_achievement
+
+async def get_achievements_by_schedule(db: AsyncSession, schedule_id: uuid.UUID):
+    """
+    指定されたschedule_idに紐づく全ての達成記録を取得します。
+    """
+    result = await db.execute(
+        select(EcoActionAchievement).where(EcoActionAchievement.schedule_id == schedule_id)
+    )
+    return result.scalars().all()
+
+
+async def get_owned_schedule_ids(db: AsyncSession, schedule_ids: set[uuid.UUID], user_id: uuid.UUID) -> set[uuid.UUID]:
+    """指定されたスケジュールのうち、ユーザーのものであるスケジュールのIDを返す"""
+    result = await db.execute(
+        select(Schedule.schedule_id).where(Schedule.schedule_id.in_(schedule_ids), Schedule.user_id == user_id)
+    )
+    return set(result.scalars().all())
+
+async def set_completed_statuses(db: AsyncSession, statuses: dict[tuple[uuid.UUID, uuid.UUID], bool]) -> list[EcoActionAchievement]:
+    """
+    (schedule_id, eco_action_id)ごとの達成状態を、1回のUPDATEでまとめて更新する。
+    達成にしたものはachieved_atを現在時刻に、未達成にしたものはNoneにする。
+    更新した達成記録を返す(コミットは呼び出し側で行う)。
+    """
+    pair = tuple_(EcoActionAchievement.schedule_id, EcoActionAchievement.eco_action_id)
+    completed_pairs = [key for key, is_completed in statuses.items() if is_completed]
+    is_completed = case((pair.in_(completed_pairs), True), else_=False) if completed_pairs else False
+    achieved_at = case((pair.in_(completed_pairs), datetime.utcnow()), else_=null()) if completed_pairs else None
+
+    # 一括UPDATEはflushを経由しないので、先にユーザーの変更番号を上げて、更新する行のsync_versionに入れる
+    schedule_ids = {schedule_id for schedule_id, _ in statuses}
+    await db.run_sync(touch_user_data, schedule_ids=schedule_ids)
+    result = await db.execute(
+        update(EcoActionAchievement)
+        .where(pair.in_(list(statuses)))
+        .values(is_completed=is_completed, achieved_at=achieved_at, sync_version=achievement_owner_data_version())
+        .returning(EcoActionAchievement)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    db_achievements = result.scalars().all()
+    await db.run_sync(stamp_schedules, schedule_ids)
+    return db_achievements
@@ -0,0 +1,72 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+import crud.refresh_token
+import models.user
+from core.hashing import hashing_service
+from core.security import get_refresh_token_hash, verify_refresh_token
+
+async def get_active_refresh_tokens(db: AsyncSession, user_id) -> list[models.user.RefreshToken]:
+    # ユーザーの有効なセッション(端末ごとの最新トークン)を取得する
+    result = await db.execute(
+        select(models.user.RefreshToken)
+        .where(
+            models.user.RefreshToken.user_id == user_id,
+            models.user.RefreshToken.is_revoked == False,  # noqa: E712
+            models.user.RefreshToken.expires_at > crud.refresh_token._utcnow(),
+        )
+        .order_by(models.user.RefreshToken.created_at.desc())
+    )
+    return result.scalars().all()
+
+async def rehash_legacy_refresh_token(db: AsyncSession, email: str, refresh_token: str) -> models.user.RefreshToken | None:
+    """
+    移行前のbcryptのトークンを照合し、成功したらHMACダイジェストに置き換える(crud.refresh_token.rehash_legacy_refresh_tokenと同じ)。
+    bcryptの照合はイベントループを止めないよう、専用のプロセスプール(core.hashing)で行う。
+    """
+    result = await db.execute(
+        crud.refresh_token.select_legacy_refresh_token_candidates(email).options(joinedload(models.user.RefreshToken.user))
+    )
+    for db_token in result.scalars().all():
+        if not await hashing_service.run(verify_refresh_token, refresh_token, db_token.hashed_token):
+            continue
+
+        db_token.hashed_token = get_refresh_token_hash(refresh_token)
+        await db.flush()
+        return db_token
+
+    return None
+
+async def find_refresh_token(db: AsyncSession, email: str, refresh_token: str) -> models.user.RefreshToken | None:
+    # トークンを検索し、指定されたメールアドレスのユーザーのものであれば返す(userも一緒に読み込む)
+    result = await db.execute(
+        select(models.user.RefreshToken)
+        .options(joinedload(models.user.RefreshToken.user))
+        .where(models.user.RefreshToken.hashed_token == get_refresh_token_hash(refresh_token))
+    )
+    db_token = result.scalars().first()
+
+    if not db_token:
+        # HMACダイジェストで見つからない場合だけ、移行前のトークンを照合する
+        db_token = await rehash_legacy_refresh_token(db, email=email, refresh_token=refresh_token)
+
+    if not db_token or not db_token.user or db_token.user.email != email:
+        return None
+
+    return db_token
+
+# トークンの照合は非同期で行い、ローテーション(再利用検知などの分岐が多い)は同期版の処理をそのまま使う
+# bcryptをrun_syncの中(イベントループ上)で実行しないこと
+
+async def rotate_refresh_token(db: AsyncSession, email: str, refresh_token: str) -> tuple[models.user.User, str] | None:
+    db_token = await find_refresh_token(db, email=email, refresh_token=refresh_token)
+    if not db_token:
+        return None
+    return await db.run_sync(crud.refresh_token.rotate_found_refresh_token, db_token)
+
+async def insert_refresh_token(db: AsyncSession, user_id, refresh_token: str, device_id: str | None = None) -> models.user.RefreshToken:
+    return await db.run_sync(crud.refresh_token.insert_refresh_token, user_id, refresh_token, device_id)
+
+async def revoke_refresh_token(db: AsyncSession, user_id, device_id: str | None = None) -> int:
+    return await db.run_sync(crud.refresh_token.revoke_refresh_token, user_id, device_id)
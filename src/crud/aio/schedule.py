@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud.schedule
+from crud.schedule import SCHEDULE_RESPONSE_OPTIONS
+from models.schedule import Schedule as ScheduleModel
+from schemas.schedule import ScheduleCreate, ScheduleUpdate
+
+# 非同期セッションでは遅延ロードできないので、ScheduleResponseで返すrelationshipは
+# 同期版と同じローダーオプション(crud.schedule.SCHEDULE_RESPONSE_OPTIONS)で一緒に読み込む
+
+async def get_schedule(db: AsyncSession, schedule_id: uuid.UUID, populate_existing: bool = False):
+    query = select(ScheduleModel).options(*SCHEDULE_RESPONSE_OPTIONS).where(ScheduleModel.schedule_id == schedule_id)
+    if populate_existing:
+        query = query.execution_options(populate_existing=True)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def get_schedules_by_user(db: AsyncSession, user_id: uuid.UUID, skip: int = 0, limit: int = 100):
+    result = await db.execute(crud.schedule.select_schedules_by_user(user_id, limit=limit, skip=skip))
+    return result.scalars().all()
+
+async def get_schedules_page(
+    db: AsyncSession, user_id: uuid.UUID, limit: int, after: tuple[datetime, uuid.UUID] | None = None
+):
+    """
+    キーセットページネーションでスケジュールを取得する。
+    (スケジュールのリスト, 次のページの開始位置)を返す。次のページがない場合、開始位置はNone。
+    """
+    # 1件多く取得して、次のページがあるかを判定する
+    result = await db.execute(crud.schedule.select_schedules_by_user(user_id, limit=limit + 1, after=after))
+    schedules = result.scalars().all()
+    if len(schedules) <= limit:
+        return schedules, None
+    schedules = schedules[:limit]
+    return schedules, (schedules[-1].start_schedule, schedules[-1].schedule_id)
+
+async def get_schedules_in_range(db: AsyncSession, user_id: uuid.UUID, range_from: datetime, range_to: datetime):
+    """[range_from, range_to)と重なるスケジュールを開始日時順に取得する"""
+    result = await db.execute(crud.schedule.select_schedules_in_range(user_id, range_from, range_to))
+    return [
+        schedule for schedule in result.scalars().all()
+        if crud.schedule.overlaps_range(schedule, range_from, range_to)
+    ]
+
+# 達成記録の作成・更新を伴う書き込みは、同期版の処理をそのまま使う
+# run_syncの中ではI/Oがイベントループ上で実行されるので、スレッドプールは使わない
+
+async def create_schedule(db: AsyncSession, schedule: ScheduleCreate, user_id: uuid.UUID):
+    db_schedule = await db.run_sync(crud.schedule.create_schedule, schedule, user_id)
+    return await get_schedule(db, db_schedule.schedule_id, populate_existing=True)
+
+async def create_schedules(
+    db: AsyncSession, schedules: list[ScheduleCreate], user_id: uuid.UUID, all_or_nothing: bool = False
+):
+    """スケジュールをまとめて作成し、(作成したスケジュールのリスト, エラーのリスト)を返す"""
+    schedule_ids, errors = await db.run_sync(crud.schedule.create_schedules, schedules, user_id, all_or_nothing)
+    if not schedule_ids:
+        return [], errors
+    result = await db.execute(
+        select(ScheduleModel).options(*SCHEDULE_RESPONSE_OPTIONS).where(ScheduleModel.schedule_id.in_(schedule_ids))
+    )
+    # リクエストの順に並べて返す
+    created = {schedule.schedule_id: schedule for schedule in result.scalars().all()}
+    return [created[schedule_id] for schedule_id in schedule_ids], errors
+
+async def update_schedule(db: AsyncSession, schedule_id: uuid.UUID, schedule_update: ScheduleUpdate):
+    if not await db.run_sync(crud.schedule.apply_schedule_update, schedule_id, schedule_update):
+        return None
+    return await get_schedule(db, schedule_id, populate_existing=True)
+
+async def delete_schedule(db: AsyncSession, schedule_id: uuid.UUID):
+    return await db.run_sync(crud.schedule.delete_schedule, schedule_id)
+
+async def delete_schedules_in_range(db: AsyncSession, user_id: uuid.UUID, range_from: datetime, range_to: datetime):
+    """開始日時が[range_from, range_to)のスケジュールをまとめて削除し、削除したIDのリストを返す"""
+    return await db.run_sync(crud.schedule.delete_schedules_in_range, user_id, range_from, range_to)
@@ -0,0 +1,81 @@
+import uuid
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user_statistics import UserStatistics as UserStatisticsModel
+from models.overall_statistics import OverallStats as OverallStatisticsModel
+
+"""
+READ
+"""
+async def read_user_statistics(db: AsyncSession, user_id: uuid.UUID):
+    """
+    指定されたユーザーの統計情報を取得する
+    """
+    result = await db.execute(
+        select(UserStatisticsModel).where(UserStatisticsModel.user_id == user_id)
+    )
+    return result.scalars().first()
+
+async def read_overall_statistics(db: AsyncSession):
+    """
+    全ユーザーの統計情報を取得する
+    """
+    result = await db.execute(select(OverallStatisticsModel))
+    return result.scalars().first()
+
+"""
+CREATE
+"""
+async def create_user_statistics(db: AsyncSession, user_id: uuid.UUID):
+    """
+    ユーザーの統計情報を作成する
+    """
+    new_statistics = UserStatisticsModel(
+        user_id=user_id,
+        total_money_saved=0.0,
+        total_co2_reduction=0.0
+    )
+
+    db.add(new_statistics)
+    await db.commit()
+    await db.refresh(new_statistics)
+
+    return new_statistics
+
+"""
+UPDATE
+"""
+async def update_user_statistics(db: AsyncSession, user_id: uuid.UUID, money_saved: float, co2_reduction: float):
+    """
+    ユーザーの統計情報を更新する
+    """
+    user_statistics = await read_user_statistics(db, user_id)
+
+    if not user_statistics:
+        return None
+
+    user_statistics.total_money_saved += money_saved
+    user_statistics.total_co2_reduction += co2_reduction
+
+    await db.commit()
+    await db.refresh(user_statistics)
+
+    return user_statistics
+
+async def update_overall_statistics(db: AsyncSession, money_saved: float, co2_reduction: float):
+    """
+    全ユーザーの統計情報を更新する
+    """
+    overall_statistics = await read_overall_statistics(db)
+
+    if not overall_statistics:
+        return None
+
+    overall_statistics.total_money_saved += money_saved
+    overall_statistics.total_co2_reduction += co2_reduction
+
+    await db.commit()
+    await db.refresh(overall_statistics)
+
+    return overall_statistics
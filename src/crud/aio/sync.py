@@ -0,0 +1,47 @@
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud.sync
+from crud.schedule import SCHEDULE_RESPONSE_OPTIONS
+from models.user import User
+
+async def get_schedule_changes(db: AsyncSession, user_id: uuid.UUID, after: tuple[int, uuid.UUID | None] | None, limit: int):
+    """
+    afterより後に作成・変更・削除されたユーザーのスケジュールを、(sync_version, schedule_id)の順にlimit件まで取得する。
+    (変更されたスケジュール, 削除されたスケジュールのID, 次のカーソルの位置, 続きがあるか, 全件の取り直しか)を返す。
+    afterがNoneの場合は全てのスケジュールを返す(削除の記録は返さない)。
+    同期済みのカーソルが、保持期間を過ぎて削除した削除記録より前の場合も、全件を返す(端末は手元のスケジュールを置き換える)。
+    """
+    # 読み込みの途中にコミットされた変更を中途半端に返さないよう、現在の変更番号までを対象にする
+    result = await db.execute(select(User.data_version, User.sync_pruned_version).where(User.id == user_id))
+    upto, pruned_version = result.one_or_none() or (0, 0)
+    # 続きの取得(schedule_idあり)のカーソルは、最初のページで確認済みなので対象にしない
+    reset = after is not None and after[1] is None and after[0] < pruned_version
+    if reset:
+        after = None
+    full_sync = after is None
+    if full_sync:
+        after = (-1, None)
+
+    result = await db.execute(
+        crud.sync.select_changed_schedules(user_id, after, upto, limit + 1).options(*SCHEDULE_RESPONSE_OPTIONS)
+    )
+    changes = [(schedule.sync_version, schedule.schedule_id, schedule) for schedule in result.scalars().all()]
+    if not full_sync:
+        result = await db.execute(crud.sync.select_deleted_schedules(user_id, after, upto, limit + 1))
+        changes.extend((sync_version, schedule_id, None) for sync_version, schedule_id in result.all())
+
+    # 変更と削除を変更番号の順に並べ、limit件に切り詰める
+    changes.sort(key=lambda change: (change[0], change[1]))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    schedules = [schedule for _, _, schedule in changes if schedule is not None]
+    deleted_schedule_ids = [schedule_id for _, schedule_id, schedule in changes if schedule is None]
+    if has_more:
+        next_key = (changes[-1][0], changes[-1][1])
+    else:
+        next_key = (upto, None)
+    return schedules, deleted_schedule_ids, next_key, has_more, reset
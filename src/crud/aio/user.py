@@ -0,0 +1,64 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import crud.user
+import models.user
+from core.security import verify_password_async
+
+# 非同期セッションでは遅延ロードができないので、認証で使うcredentialは一緒に読み込む
+
+async def get_user_by_id(db: AsyncSession, user_id) -> models.user.User | None:
+    result = await db.execute(
+        select(models.user.User)
+        .options(selectinload(models.user.User.credential))
+        .where(models.user.User.id == user_id)
+    )
+    return result.scalars().first()
+
+async def get_user_data_version(db: AsyncSession, user_id) -> int | None:
+    """ユーザーのスケジュール・達成記録の変更番号(users.data_version)を返す。ユーザーが存在しない場合はNone"""
+    result = await db.execute(select(models.user.User.data_version).where(models.user.User.id == user_id))
+    return result.scalar_one_or_none()
+
+async def get_user_by_email(db: AsyncSession, email: str) -> models.user.User | None:
+    result = await db.execute(
+        select(models.user.User)
+        .options(selectinload(models.user.User.credential))
+        .where(models.user.User.email == email)
+    )
+    return result.scalars().first()
+
+async def get_user_by_google_id(db: AsyncSession, google_id: str) -> models.user.User | None:
+    result = await db.execute(
+        select(models.user.User)
+        .join(models.user.UserCredential)
+        .options(selectinload(models.user.User.credential))
+        .where(models.user.UserCredential.google_id == google_id)
+    )
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, email: str, google_id: str = None, hashed_password: str = None) -> models.user.User | None:
+    """
+    新規ユーザーを作成する(処理はcrud.user.create_userと同じ)
+    パスワードは事前にハッシュ化したものを渡すこと
+    """
+    user = await db.run_sync(crud.user.create_user, email, None, google_id, hashed_password)
+    if user is None:
+        return None
+    # create_user内のcommitで期限切れになったcredentialを読み直しておく
+    return await get_user_by_id(db, user.id)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> models.user.User | None:
+    """ユーザーを認証する(パスワードの検証は専用のプロセスプールで行う)"""
+    user = await get_user_by_email(db, email)
+
+    # ユーザーが存在しない、またはパスワードが登録されていない場合は失敗
+    if not user or not user.credential or not user.credential.hashed_password:
+        return None
+
+    # パスワードを検証
+    if not await verify_password_async(password, user.credential.hashed_password):
+        return None
+
+    return user
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+from models.email_outbox import EmailOutbox
+
+def enqueue_email(
+    db: Session, kind: str, to_address: str, subject: str, body: str, dedupe_window_seconds: float = 0
+) -> EmailOutbox | None:
+    """
+    メールを送信キューに登録する。
+    同じ宛先・同じ種類のメールがdedupe_window_seconds以内に登録済みの場合は登録せずNoneを返す。
+    """
+    now = datetime.utcnow()
+
+    if dedupe_window_seconds > 0:
+        recent_email = db.query(EmailOutbox).filter(
+            EmailOutbox.to_address == to_address,
+            EmailOutbox.kind == kind,
+            EmailOutbox.status != "failed",
+            EmailOutbox.created_at >= now - timedelta(seconds=dedupe_window_seconds),
+        ).first()
+        if recent_email:
+            return None
+
+    db_email = EmailOutbox(
+        kind=kind,
+        to_address=to_address,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(db_email)
+    db.commit()
+    db.refresh(db_email)
+
+    return db_email
+
+def lock_pending_emails(db: Session, batch_size: int) -> list[EmailOutbox]:
+    """
+    送信時刻になった送信待ちメールを古い順に取得し、行ロックする。
+    SKIP LOCKEDなので、他のワーカーが処理中のメールは飛ばされる。
+    ロックはコミットまたはロールバックで解放される。
+    """
+    return (
+        db.query(EmailOutbox)
+        .filter(
+            EmailOutbox.status == "pending",
+            EmailOutbox.next_attempt_at <= datetime.utcnow(),
+        )
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+def mark_email_sent(db: Session, db_email: EmailOutbox) -> None:
+    db_email.status = "sent"
+    db_email.attempts += 1
+    db_email.sent_at = datetime.utcnow()
+    db_email.last_error = None
+    db.add(db_email)
+
+def mark_email_failed(db: Session, db_email: EmailOutbox, error: str, max_attempts: int, backoff_seconds: float) -> None:
+    """送信失敗を記録し、指数バックオフで次の送信時刻を決める。上限回数に達したらfailedにする"""
+    db_email.attempts += 1
+    db_email.last_error = error[:1000]
+
+    if db_email.attempts >= max_attempts:
+        db_email.status = "failed"
+    else:
+        delay = backoff_seconds * (2 ** (db_email.attempts - 1))
+        db_email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.add(db_email)
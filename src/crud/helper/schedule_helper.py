@@ -1,22 +1,24 @@
+from sqlalchemy import delete, false, insert, literal, select, update
 from sqlalchemy.orm import Session
 
 from models.schedule import Schedule as ScheduleModel
 from models.eco_action_achievement import EcoActionAchievement as AchievementModel
-from models.category import Category  # 遅延インポートで循環参照を回避
 from models.eco_action import EcoAction
 
-from schemas.eco_action_achievement import AchievementCreate, AchievementDelete
+from schemas.eco_action_achievement import AchievementCreate
+
+from crud.eco_action_achievement import create_achievement
+from crud.sync import achievement_owner_data_version, stamp_schedules, touch_user_data
+from core.master_data import master_data_cache
+from db.functions import new_uuid
 
-from crud.eco_action import get_eco_actions_by_category
-from crud.eco_action_achievement import create_achievement, delete_achievement
 def is_category_valid(db: Session, category_id) -> bool:
     """
     指定されたカテゴリIDが有効かどうかを確認する。
     有効な場合はTrue、無効な場合はFalseを返す。
+    カテゴリはマスターデータのキャッシュ(core.master_data)で確認する。
     """
-    
-    category = db.query(Category).filter(Category.category_id == category_id).first()
-    return category is not None
+    return master_data_cache.get(db).is_category_valid(category_id)
 
 def create_achievements_for_schedule(db: Session, schedule: ScheduleModel) -> None:
     """
@@ -31,20 +33,20 @@ def create_achievements_for_schedule(db: Session, schedule: ScheduleModel) -> No
     if is_category_valid(db, schedule.category_id) is False:
         return  
 
-    # カテゴリに紐づくエコ活動を取得
-    eco_actions = get_eco_actions_by_category(db, schedule.category_id)
+    # カテゴリに紐づくエコ活動を取得(マスターデータのキャッシュから)
+    eco_action_ids = master_data_cache.get(db).eco_action_ids(schedule.category_id)
 
     # もし、エコ活動が存在しない場合、何もしない
-    if not eco_actions:
+    if not eco_action_ids:
         return 
 
     # 各エコ活動に対応する達成記録を作成
-    for eco_action in eco_actions:
+    for eco_action_id in eco_action_ids:
         create_achievement(
             db=db,
             achievement=AchievementCreate(
                 schedule_id=schedule.schedule_id,
-                eco_action_id=eco_action.eco_action_id
+                eco_action_id=eco_action_id
             )
         )
 
@@ -53,6 +55,8 @@ def update_achievements_by_update_schedule(db: Session, schedule: ScheduleModel)
     スケジュールの変更またはエコ活動の変更に伴い、達成記録を更新する。
     ①古いカテゴリに基づく達成記録を削除し、新しいカテゴリに基づく達成記録を作成する。元の状態を維持する。
     ②エコ活動の削除、追加に伴う達成記録の削除、追加を行う。元の状態を維持する。
+    差分はSQLで求め、不足分を1回のINSERT ... SELECTで、不要な分を1回のDELETEで更新する。
+    残る達成記録はそのまま(達成状態を維持する)。
     """
     # スケジュールにカテゴリがなければ何もしない
     if not schedule.category_id:
@@ -62,45 +66,55 @@ def update_achievements_by_update_schedule(db: Session, schedule: ScheduleModel)
     if is_category_valid(db, schedule.category_id) is False:
         return  
 
-    # 既存の達成記録を取得
-    previous_achievements = db.query(AchievementModel).filter(
-        AchievementModel.schedule_id == schedule.schedule_id
-    ).all()
-    
-    # 既存のエコ活動を取得
-    # Noneは除外
-    previous_eco_actions: list[EcoAction] = [
-        achievement.eco_action for achievement in previous_achievements if achievement.eco_action is not None
-    ]
-
-    # カテゴリに紐づくエコ活動を取得
-    eco_actions: list[EcoAction] = get_eco_actions_by_category(db, schedule.category_id)
+    reconcile_achievements(db, schedule.category_id, [schedule.schedule_id])
 
-    # もし、エコ活動が存在しない場合、終了
-    if not (previous_eco_actions or eco_actions):
-        return
+def reconcile_achievements(db: Session, category_id, schedule_ids: list, sync_version: int | None = None) -> None:
+    """
+    カテゴリcategory_idのスケジュール(schedule_ids)の達成記録を、カテゴリのエコ活動に合わせる。
+    不足分を1回のINSERT ... SELECTで作成し、不要な分を1回のDELETEで削除する。残る達成記録はそのまま。
+    category_idがNoneの場合は、エコ活動の達成記録を全て削除する。
+    sync_versionを渡した場合は、呼び出し元で持ち主の変更番号を上げてスケジュールに記録済みとみなし、
+    作成する達成記録にその値を入れるだけにする。
+    """
+    # カテゴリに属さなくなったエコ活動の達成記録を削除
+    # (エコ活動が存在しない達成記録は対象外)
+    deleted_schedule_ids = db.scalars(
+        delete(AchievementModel).where(
+            AchievementModel.schedule_id.in_(schedule_ids),
+            AchievementModel.eco_action_id.in_(
+                select(EcoAction.eco_action_id).where(EcoAction.category_id.is_distinct_from(category_id))
+            ),
+        ).returning(AchievementModel.schedule_id)
+    ).all()
 
-    # 既存のエコ活動と新しいエコ活動を比較して削除と追加を決定
-    for eco_action in eco_actions:
-        if eco_action not in previous_eco_actions:
-            print(f"Adding new eco action: {eco_action}")
-            # 新しいエコ活動に対する達成記録を作成
-            create_achievement(
-                db=db,
-                achievement=AchievementCreate(
-                    schedule_id=schedule.schedule_id,
-                    eco_action_id=eco_action.eco_action_id
-                )
+    # カテゴリのエコ活動のうち、達成記録がないものの達成記録を作成(初期状態は未達成)
+    existing = select(AchievementModel.achievement_id).where(
+        AchievementModel.schedule_id == ScheduleModel.schedule_id,
+        AchievementModel.eco_action_id == EcoAction.eco_action_id,
+    )
+    inserted = db.execute(
+        insert(AchievementModel).from_select(
+            ["achievement_id", "schedule_id", "eco_action_id", "is_completed", "sync_version"],
+            select(
+                new_uuid(), ScheduleModel.schedule_id, EcoAction.eco_action_id, false(),
+                literal(sync_version or 0, AchievementModel.sync_version.type),
             )
+            .select_from(ScheduleModel)
+            .join(EcoAction, EcoAction.category_id == literal(category_id, EcoAction.category_id.type))
+            .where(ScheduleModel.schedule_id.in_(schedule_ids), ~existing.exists()),
+        ).returning(AchievementModel.achievement_id, AchievementModel.schedule_id)
+    ).all()
 
-    for previous_eco_action in previous_eco_actions:
-        if previous_eco_action not in eco_actions:
-            # 削除されたエコ活動に対する達成記録を削除
-            print(f"Removing old eco action: {previous_eco_action}")
-            delete_achievement(
-                db=db,
-                achievement=AchievementDelete(
-                    schedule_id=schedule.schedule_id,
-                    eco_action_id=previous_eco_action.eco_action_id
-                )
-            )
\ No newline at end of file
+    # 達成記録が変わったスケジュールの持ち主の変更番号を上げ(一覧のETagが変わる)、変更した行に記録する(差分同期)
+    changed_schedule_ids = set(deleted_schedule_ids) | {schedule_id for _, schedule_id in inserted}
+    if not changed_schedule_ids or sync_version is not None:
+        return
+    touch_user_data(db, schedule_ids=changed_schedule_ids)
+    if inserted:
+        db.execute(
+            update(AchievementModel)
+            .where(AchievementModel.achievement_id.in_([achievement_id for achievement_id, _ in inserted]))
+            .values(sync_version=achievement_owner_data_version())
+            .execution_options(synchronize_session=False)
+        )
+    stamp_schedules(db, changed_schedule_ids)
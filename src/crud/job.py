@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.job import Job
+
+ACTIVE_STATUSES = ("pending", "running")
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: dict | None = None,
+    run_at: datetime | None = None,
+    max_attempts: int = 5,
+    unique_key: str | None = None,
+) -> Job | None:
+    """
+    ジョブを登録する。コミットは呼び出し側で行う(同じトランザクションの変更と一緒に登録される)。
+    unique_keyが同じ実行待ち・実行中のジョブがある場合は登録せずNoneを返す。
+    """
+    if unique_key is not None:
+        existing = db.scalar(
+            select(Job.id).where(Job.unique_key == unique_key, Job.status.in_(ACTIVE_STATUSES))
+        )
+        if existing is not None:
+            return None
+
+    db_job = Job(
+        kind=kind,
+        payload=payload or {},
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=run_at or datetime.utcnow(),
+        unique_key=unique_key,
+        created_at=datetime.utcnow(),
+    )
+    if unique_key is None:
+        db.add(db_job)
+        db.flush()
+        return db_job
+
+    # 他のワーカーが同時に同じキーで登録した場合は、ユニークインデックスで弾かれる
+    try:
+        with db.begin_nested():
+            db.add(db_job)
+    except IntegrityError:
+        return None
+    return db_job
+
+def claim_job(db: Session, worker_id: str, lease_seconds: float) -> Job | None:
+    """
+    実行時刻になったジョブを1つ取得し、実行中にしてコミットする。
+    SKIP LOCKEDなので、他のワーカーが取得中のジョブは飛ばされる。
+    ロックの期限が切れた実行中のジョブ(ワーカーが落ちた場合)も再実行の対象にする。
+    """
+    now = datetime.utcnow()
+    db_job = db.scalars(
+        select(Job)
+        .where(or_(
+            (Job.status == "pending") & (Job.run_at <= now),
+            (Job.status == "running") & (Job.locked_until < now),
+        ))
+        .order_by(Job.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if db_job is None:
+        db.rollback()
+        return None
+
+    db_job.status = "running"
+    db_job.attempts += 1
+    db_job.locked_until = now + timedelta(seconds=lease_seconds)
+    db_job.locked_by = worker_id
+    db.commit()
+    return db_job
+
+def mark_job_succeeded(db: Session, db_job: Job, next_run_at: datetime | None = None) -> None:
+    """ジョブの成功を記録する。next_run_atを指定した場合(定期実行)は、同じ行を次回の実行待ちに戻す"""
+    db_job.locked_until = None
+    db_job.locked_by = None
+    db_job.last_error = None
+    if next_run_at is not None:
+        db_job.status = "pending"
+        db_job.attempts = 0
+        db_job.run_at = next_run_at
+    else:
+        db_job.status = "succeeded"
+        db_job.finished_at = datetime.utcnow()
+    db.add(db_job)
+
+def mark_job_failed(
+    db: Session, db_job: Job, error: str, backoff_seconds: float, next_run_at: datetime | None = None
+) -> None:
+    """
+    ジョブの失敗を記録し、指数バックオフで再実行の時刻を決める。
+    上限回数に達した場合はfailedにする。定期実行のジョブ(next_run_atを指定)は、次回の実行待ちに戻す。
+    """
+    db_job.last_error = error[:1000]
+    db_job.locked_until = None
+    db_job.locked_by = None
+
+    if db_job.attempts < db_job.max_attempts:
+        db_job.status = "pending"
+        db_job.run_at = datetime.utcnow() + timedelta(seconds=backoff_seconds * (2 ** (db_job.attempts - 1)))
+    elif next_run_at is not None:
+        db_job.status = "pending"
+        db_job.attempts = 0
+        db_job.run_at = next_run_at
+    else:
+        db_job.status = "failed"
+        db_job.finished_at = datetime.utcnow()
+    db.add(db_job)
+
+def count_jobs_by_status(db: Session) -> dict[str, int]:
+    return dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+def get_jobs(db: Session, status: str | None = None, kind: str | None = None, limit: int = 50) -> list[Job]:
+    query = select(Job)
+    if status is not None:
+        query = query.where(Job.status == status)
+    if kind is not None:
+        query = query.where(Job.kind == kind)
+    return list(db.scalars(query.order_by(Job.run_at.desc()).limit(limit)))
+
+def delete_finished_jobs(db: Session, older_than: datetime, batch_size: int = 1000) -> int:
+    """older_thanより前に終了したジョブをbatch_size件ずつ削除し、削除件数を返す"""
+    deleted = 0
+    while True:
+        ids = list(db.scalars(
+            select(Job.id)
+            .where(Job.status.in_(("succeeded", "failed")), Job.finished_at < older_than)
+            .limit(batch_size)
+        ))
+        if not ids:
+            return deleted
+        db.execute(delete(Job).where(Job.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
@@ -1,86 +1,256 @@
+import uuid
+from sqlalchemy import or_, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 
+from config import settings
 from core.token import REFRESH_TOKEN_EXPIRE_DAYS, create_refresh_token
-from core.security import verify_refresh_token, get_refresh_token_hash
-from crud.user import get_user_by_email
+from core.security import REFRESH_TOKEN_HASH_PREFIX, verify_refresh_token, get_refresh_token_hash
 import models.user
 import schemas.user
 
+def _utcnow() -> datetime:
+    # DBのDateTimeカラムはタイムゾーンなしで保存しているので、UTCのnaiveな値に揃える
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def get_refresh_token_by_hash(db: Session, refresh_token: str) -> models.user.RefreshToken | None:
+    # hashed_tokenのユニークインデックスを使って、トークンを1回の検索で取得する
+    hashed_token = get_refresh_token_hash(refresh_token)
+    return db.query(models.user.RefreshToken).filter(models.user.RefreshToken.hashed_token == hashed_token).first()
+
+def select_legacy_refresh_token_candidates(email: str):
+    """
+    bcryptで照合する移行前のトークンのクエリ。
+    HMACダイジェストでないもののうち、失効・期限切れでないものを新しい順にLEGACY_REFRESH_TOKEN_MAX_CANDIDATES件まで。
+    """
+    return (
+        select(models.user.RefreshToken)
+        .join(models.user.User, models.user.User.id == models.user.RefreshToken.user_id)
+        .where(
+            models.user.User.email == email,
+            ~models.user.RefreshToken.hashed_token.startswith(REFRESH_TOKEN_HASH_PREFIX, autoescape=True),
+            models.user.RefreshToken.is_revoked == False,  # noqa: E712
+            models.user.RefreshToken.expires_at > _utcnow(),
+        )
+        .order_by(models.user.RefreshToken.created_at.desc())
+        .limit(settings.LEGACY_REFRESH_TOKEN_MAX_CANDIDATES)
+    )
+
+def rehash_legacy_refresh_token(db: Session, email: str, refresh_token: str) -> models.user.RefreshToken | None:
+    """
+    bcryptで保存されている移行前のトークンを検証し、成功したらHMACダイジェストに置き換える。
+    初回利用時にだけbcryptの検証が走り、以降はインデックス検索で済むようになる。
+    照合の候補はSQLで絞り込み、該当するトークンがなければbcryptは実行しない。
+    """
+    for db_token in db.scalars(select_legacy_refresh_token_candidates(email)):
+        if not verify_refresh_token(plain_token=refresh_token, hashed_token=db_token.hashed_token):
+            continue
+
+        db_token.hashed_token = get_refresh_token_hash(refresh_token)
+        db.add(db_token)
+        db.commit()
+        db.refresh(db_token)
+
+        return db_token
+
+    return None
+
+def _find_refresh_token(db: Session, email: str, refresh_token: str) -> models.user.RefreshToken | None:
+    # トークンを検索し、指定されたメールアドレスのユーザーのものであれば返す
+    db_token = get_refresh_token_by_hash(db, refresh_token)
+
+    if not db_token:
+        db_token = rehash_legacy_refresh_token(db, email=email, refresh_token=refresh_token)
+
+    if not db_token or not db_token.user or db_token.user.email != email:
+        return None
+
+    return db_token
+
+def _is_expired(db_token: models.user.RefreshToken) -> bool:
+    expires_at_aware = db_token.expires_at.replace(tzinfo=timezone.utc)
+    return expires_at_aware < datetime.now(timezone.utc)
+
 def get_user_by_refresh_token(db: Session, email: str, refresh_token: str):
     # get user by refresh token with SQLAlchemy ORM
-    user = get_user_by_email(db, email=email)
+    db_token = _find_refresh_token(db, email=email, refresh_token=refresh_token)
 
-    if not user or not user.refresh_token:
+    if not db_token:
         return None
-    
-    expires_at_aware = user.refresh_token.expires_at.replace(tzinfo=timezone.utc)
 
-    hashed_token = user.refresh_token.hashed_token
-    if user.refresh_token.is_revoked:
+    if db_token.is_revoked:
         return None
-    
-    if expires_at_aware < datetime.now(timezone.utc):
+
+    if _is_expired(db_token):
         return None
-    
-    if verify_refresh_token(plain_token=refresh_token, hashed_token=hashed_token):
-        return user
 
-    return None
-    
+    return db_token.user
 
-def insert_refresh_token(db: Session, user_id: str, refresh_token: str) -> schemas.user.TokenResponse:
-    # create a new refresh token and store it in the database
-    user = db.query(models.user.User).filter(models.user.User.id == user_id).first()
+def rotate_refresh_token(db: Session, email: str, refresh_token: str) -> tuple[models.user.User, str] | None:
+    """
+    リフレッシュトークンを検証し、同じ端末の新しいトークンに交換する。
+    成功した場合は(ユーザー, 新しい平文トークン)を返す。
 
-    if not user:
-        None
-    
-    if not user.is_active:
-        None
+    ローテーション済みの古いトークンが再度使われた場合は、トークンが漏洩したとみなして
+    その端末のセッションをすべて失効させる(再利用検知)。
+    """
+    db_token = _find_refresh_token(db, email=email, refresh_token=refresh_token)
 
-    hashed_token = get_refresh_token_hash(refresh_token)
+    if not db_token:
+        return None
 
-    if user.refresh_token:
-        print("Updating existing refresh token")
-        user.refresh_token.hashed_token = hashed_token
-        user.refresh_token.created_at = datetime.now(timezone.utc)
-        user.refresh_token.expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        
-        db.add(user.refresh_token)
-        db.commit()
-        db.refresh(user.refresh_token)
+    return rotate_found_refresh_token(db, db_token)
 
-        return user.refresh_token
+def rotate_found_refresh_token(db: Session, db_token: models.user.RefreshToken) -> tuple[models.user.User, str] | None:
+    """
+    検索・照合済みのトークンを、同じ端末の新しいトークンに交換する(rotate_refresh_tokenの後半)。
+    非同期版(crud.aio.refresh_token)は、トークンの照合を非同期で行ってからこの関数を呼ぶ。
+    """
+    if db_token.is_revoked:
+        if db_token.replaced_by_id is not None:
+            print(f"Refresh token reuse detected: user_id={db_token.user_id}, device_id={db_token.device_id}")
+            revoke_refresh_token(db, user_id=db_token.user_id, device_id=db_token.device_id)
+        return None
+
+    if _is_expired(db_token):
+        return None
 
-    else: 
-        print("Creating new refresh token")
-        new_refresh_token = models.user.RefreshToken(
-            user_id=user.id,
-            hashed_token=hashed_token,
-            created_at=datetime.now(timezone.utc),
-            expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    user_id, device_id = db_token.user_id, db_token.device_id
+    now = _utcnow()
+    new_plain_token = create_refresh_token()
+    new_token = models.user.RefreshToken(
+        id=uuid.uuid4(),
+        user_id=db_token.user_id,
+        device_id=db_token.device_id,
+        hashed_token=get_refresh_token_hash(new_plain_token),
+        created_at=now,
+        last_used_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(new_token)
+    # replaced_by_idの参照先を先に作成しておく
+    db.flush()
+
+    # 同じトークンで同時にリフレッシュされた場合に1つだけが成功するよう、未失効の場合だけ失効させる
+    # (上のis_revokedの確認はロックなしで読んだ値なので、ここで改めて確定させる)
+    claimed = db.execute(
+        update(models.user.RefreshToken)
+        .where(
+            models.user.RefreshToken.id == db_token.id,
+            models.user.RefreshToken.is_revoked == False,  # noqa: E712
         )
+        .values(is_revoked=True, revoked_at=now, last_used_at=now, replaced_by_id=new_token.id)
+    ).rowcount
+    if not claimed:
+        # 他のリクエストが先にローテーションした場合は、再利用とみなしてその端末のセッションを失効させる
+        db.rollback()
+        print(f"Refresh token reuse detected: user_id={user_id}, device_id={device_id}")
+        revoke_refresh_token(db, user_id=user_id, device_id=device_id)
+        return None
 
-        db.add(new_refresh_token)
-        db.commit()
-        db.refresh(new_refresh_token)
+    db.commit()
 
-        return new_refresh_token
+    return db_token.user, new_plain_token
 
-def revoke_refresh_token(db: Session, user_id: str):
-    # Revoke the existing refresh token for the user
+def insert_refresh_token(db: Session, user_id: str, refresh_token: str, device_id: str | None = None) -> models.user.RefreshToken:
+    """
+    ログイン時に、端末のセッションとして新しいリフレッシュトークンを保存する。
+    同じ端末の既存のセッションは失効させる。他の端末のセッションには影響しない。
+    device_idが指定されない場合は、新しい端末として扱う。
+    """
     user = db.query(models.user.User).filter(models.user.User.id == user_id).first()
 
     if not user:
         return None
-    
-    if not user.refresh_token:
-        return None
 
-    user.refresh_token.is_revoked = True
-    db.add(user.refresh_token)
+    now = _utcnow()
+    if device_id:
+        _revoke_active_tokens(db, user_id=user.id, device_id=device_id, now=now)
+
+    new_refresh_token = models.user.RefreshToken(
+        user_id=user.id,
+        device_id=device_id or uuid.uuid4().hex,
+        hashed_token=get_refresh_token_hash(refresh_token),
+        created_at=now,
+        last_used_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+
+    db.add(new_refresh_token)
+    db.commit()
+    db.refresh(new_refresh_token)
+
+    return new_refresh_token
+
+def get_active_refresh_tokens(db: Session, user_id) -> list[models.user.RefreshToken]:
+    # ユーザーの有効なセッション(端末ごとの最新トークン)を取得する
+    return (
+        db.query(models.user.RefreshToken)
+        .filter(
+            models.user.RefreshToken.user_id == user_id,
+            models.user.RefreshToken.is_revoked == False,  # noqa: E712
+            models.user.RefreshToken.expires_at > _utcnow(),
+        )
+        .order_by(models.user.RefreshToken.created_at.desc())
+        .all()
+    )
+
+def revoke_refresh_token(db: Session, user_id, device_id: str | None = None) -> int:
+    """
+    ユーザーのリフレッシュトークンを失効させる。
+    device_idを指定した場合はその端末のみ、指定しない場合は全端末を失効させる。
+    失効させた件数を返す。
+    """
+    revoked_count = _revoke_active_tokens(db, user_id=user_id, device_id=device_id, now=_utcnow())
     db.commit()
-    db.refresh(user.refresh_token)
 
-    return user.refresh_token
\ No newline at end of file
+    return revoked_count
+
+def _revoke_active_tokens(db: Session, user_id, device_id: str | None, now: datetime) -> int:
+    query = db.query(models.user.RefreshToken).filter(
+        models.user.RefreshToken.user_id == user_id,
+        models.user.RefreshToken.is_revoked == False,  # noqa: E712
+    )
+    if device_id is not None:
+        query = query.filter(models.user.RefreshToken.device_id == device_id)
+
+    db_tokens = query.all()
+    for db_token in db_tokens:
+        db_token.is_revoked = True
+        db_token.revoked_at = now
+        db.add(db_token)
+
+    return len(db_tokens)
+
+def delete_stale_refresh_tokens(db: Session, batch_size: int = 1000) -> int:
+    """
+    期限切れのトークンと、失効してから保持期間を過ぎたトークンをバッチごとに削除する。
+    失効済みトークンは再利用検知のためにしばらく残しておく。
+    削除した件数を返す。
+    """
+    now = _utcnow()
+    revoked_before = now - timedelta(days=settings.REFRESH_TOKEN_REVOKED_RETENTION_DAYS)
+    stale_condition = or_(
+        models.user.RefreshToken.expires_at < now,
+        models.user.RefreshToken.revoked_at < revoked_before,
+    )
+
+    deleted_count = 0
+    while True:
+        stale_ids = [
+            row.id for row in
+            db.query(models.user.RefreshToken.id).filter(stale_condition).limit(batch_size).all()
+        ]
+        if not stale_ids:
+            break
+
+        db.query(models.user.RefreshToken).filter(
+            models.user.RefreshToken.id.in_(stale_ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        deleted_count += len(stale_ids)
+        if len(stale_ids) < batch_size:
+            break
+
+    return deleted_count
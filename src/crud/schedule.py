@@ -1,18 +1,91 @@
 import uuid
-from sqlalchemy.orm import Session
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, delete, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 from fastapi import HTTPException, status
 
 from models.schedule import Schedule as ScheduleModel
+from models.eco_action_achievement import EcoActionAchievement as AchievementModel
 
-from crud.helper.schedule_helper import create_achievements_for_schedule, update_achievements_by_update_schedule, is_category_valid
+from core.master_data import master_data_cache
+from crud.sync import record_deleted_schedules, touch_user_data
+from crud.helper.schedule_helper import create_achievements_for_schedule, reconcile_achievements, is_category_valid
 
-from schemas.schedule import ScheduleCreate, ScheduleUpdate
+from schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleBulkError
+
+# ScheduleResponseで返すrelationshipを一緒に読み込むためのローダーオプション
+# 遅延ロードのままだと、レスポンスの変換時にスケジュールごとにSELECTが発行される
+# categoryは多対1なのでJOINで、達成記録は1対多なので行が増えないように別のSELECT(IN句)で読み込む
+SCHEDULE_RESPONSE_OPTIONS = (
+    joinedload(ScheduleModel.category),
+    selectinload(ScheduleModel.eco_action_achievements),
+)
 
 def get_schedule(db: Session, schedule_id: uuid.UUID):
-    return db.query(ScheduleModel).filter(ScheduleModel.schedule_id == schedule_id).first()
+    return db.query(ScheduleModel).options(*SCHEDULE_RESPONSE_OPTIONS).filter(ScheduleModel.schedule_id == schedule_id).first()
+
+def select_schedules_by_user(
+    user_id: uuid.UUID, limit: int, skip: int = 0, after: tuple[datetime, uuid.UUID] | None = None
+):
+    """
+    ユーザーのスケジュール一覧のクエリ。(start_schedule, schedule_id)の順に並べ、
+    ix_schedules_user_id_start_schedule_schedule_idのインデックスの順にそのまま読み出す。
+    afterを指定した場合は、その(start_schedule, schedule_id)より後の行から返す(キーセットページネーション)。
+    """
+    query = select(ScheduleModel).options(*SCHEDULE_RESPONSE_OPTIONS).where(ScheduleModel.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(ScheduleModel.start_schedule, ScheduleModel.schedule_id) > tuple(after))
+    return query.order_by(ScheduleModel.start_schedule, ScheduleModel.schedule_id).offset(skip).limit(limit)
 
 def get_schedules_by_user(db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100):
-        return db.query(ScheduleModel).filter(ScheduleModel.user_id == user_id).offset(skip).limit(limit).all()
+        return db.execute(select_schedules_by_user(user_id, limit=limit, skip=skip)).scalars().all()
+
+def schedule_period(schedule: ScheduleModel) -> tuple[datetime, datetime]:
+    """
+    スケジュールが占める期間[開始, 終了)を返す。
+    終日のスケジュールは、開始日の0時から終了日の翌日0時までとする(終了日を含む)。
+    """
+    if not schedule.all_day:
+        return schedule.start_schedule, schedule.end_schedule
+    start = datetime.combine(schedule.start_schedule.date(), time.min)
+    end = datetime.combine(schedule.end_schedule.date(), time.min) + timedelta(days=1)
+    return start, end
+
+def overlaps_range(schedule: ScheduleModel, range_from: datetime, range_to: datetime) -> bool:
+    start, end = schedule_period(schedule)
+    # 開始と終了が同じ時刻のスケジュールは、その時刻が範囲内にあれば重なるとみなす
+    return start < range_to and (end > range_from or start >= range_from)
+
+def select_schedules_in_range(user_id: uuid.UUID, range_from: datetime, range_to: datetime):
+    """
+    [range_from, range_to)と重なる可能性のあるスケジュールのクエリ。開始日時順に並べる。
+    終日のスケジュールは日単位に広げて判定するため前後1日分を余分に取得するので、
+    結果はoverlaps_rangeで絞り込むこと。
+    start_scheduleの上限はix_schedules_user_id_start_schedule_schedule_idで、
+    end_scheduleの下限はix_schedules_user_id_end_scheduleで絞り込める。
+    """
+    one_day = timedelta(days=1)
+    return (
+        select(ScheduleModel)
+        .options(*SCHEDULE_RESPONSE_OPTIONS)
+        .where(
+            ScheduleModel.user_id == user_id,
+            ScheduleModel.start_schedule < range_to + one_day,
+            ScheduleModel.end_schedule >= range_from - one_day,
+            or_(
+                ScheduleModel.all_day.is_(True),
+                and_(
+                    ScheduleModel.start_schedule < range_to,
+                    or_(ScheduleModel.end_schedule > range_from, ScheduleModel.start_schedule >= range_from),
+                ),
+            ),
+        )
+        .order_by(ScheduleModel.start_schedule, ScheduleModel.schedule_id)
+    )
+
+def get_schedules_in_range(db: Session, user_id: uuid.UUID, range_from: datetime, range_to: datetime):
+    schedules = db.execute(select_schedules_in_range(user_id, range_from, range_to)).scalars().all()
+    return [schedule for schedule in schedules if overlaps_range(schedule, range_from, range_to)]
 
 def create_schedule(db: Session, schedule: ScheduleCreate, user_id: uuid.UUID):
     db_schedule = ScheduleModel(**schedule.model_dump(), user_id=user_id) # 辞書型で展開
@@ -35,28 +108,147 @@ def create_schedule(db: Session, schedule: ScheduleCreate, user_id: uuid.UUID):
     db.refresh(db_schedule)
     return db_schedule
 
-def update_schedule(db: Session, schedule_id: uuid.UUID, schedule_update: ScheduleUpdate):
-    db_schedule = get_schedule(db, schedule_id)
+def create_schedules(
+    db: Session, schedules: list[ScheduleCreate], user_id: uuid.UUID, all_or_nothing: bool = False
+) -> tuple[list[uuid.UUID], list[ScheduleBulkError]]:
+    """
+    スケジュールと達成記録をまとめて作成する。
+    カテゴリの確認とエコ活動の取得はマスターデータのキャッシュで行い、スケジュールと達成記録はそれぞれ複数行のINSERTで1つのトランザクションで作成する。
+    作成したスケジュールのID(リクエストの順)と、作成できなかったスケジュールのエラーを返す。
+    all_or_nothingがTrueの場合、1件でもエラーがあれば何も作成しない。
+    """
+    # カテゴリの確認とエコ活動の取得はマスターデータのキャッシュ(core.master_data)で行う
+    master_data = master_data_cache.get(db)
 
-    if not db_schedule:
-        return None
-    
-    update_achievements_by_update_schedule(db, db_schedule)  # スケジュールに基づいて達成記録を更新
-    
+    errors: list[ScheduleBulkError] = []
+    valid_schedules: list[ScheduleCreate] = []
+    for index, schedule in enumerate(schedules):
+        if schedule.start_schedule is None or schedule.end_schedule is None:
+            errors.append(ScheduleBulkError(index=index, detail="start_schedule and end_schedule are required"))
+        elif schedule.category_id and not master_data.is_category_valid(schedule.category_id):
+            errors.append(ScheduleBulkError(index=index, detail="Invalid category_id"))
+        else:
+            valid_schedules.append(schedule)
+
+    if not valid_schedules or (errors and all_or_nothing):
+        return [], errors
+
+    # 一括INSERTはflushを経由しないので、先にユーザーの変更番号を上げて各行のsync_versionに入れる
+    sync_version = touch_user_data(db, user_ids=[user_id]).get(user_id, 0)
+
+    schedule_rows = []
+    achievement_rows = []
+    for schedule in valid_schedules:
+        schedule_id = uuid.uuid4()
+        schedule_rows.append({
+            **schedule.model_dump(), "schedule_id": schedule_id, "user_id": user_id, "sync_version": sync_version,
+        })
+        achievement_rows.extend(
+            {
+                "achievement_id": uuid.uuid4(), "schedule_id": schedule_id, "eco_action_id": eco_action_id,
+                "is_completed": False, "sync_version": sync_version,
+            }
+            for eco_action_id in master_data.eco_action_ids(schedule.category_id)
+        )
+
+    db.execute(insert(ScheduleModel), schedule_rows)
+    if achievement_rows:
+        db.execute(insert(AchievementModel), achievement_rows)
+    db.commit()
+    return [row["schedule_id"] for row in schedule_rows], errors
+
+def apply_schedule_update(db: Session, schedule_id: uuid.UUID, schedule_update: ScheduleUpdate) -> bool:
+    """
+    リクエストに含まれるフィールドだけをスケジュールに反映してコミットする。スケジュールが存在しない場合はFalseを返す。
+    スケジュールは読み込まずに1回のUPDATEで更新する(持ち主の変更番号も上げる)。
+    達成記録はカテゴリが実際に変わった場合だけ、新しいカテゴリに合わせて作り直す(残るエコ活動の達成状態は維持する)。
+    """
     # exclude_unset=Trueで、リクエストに含まれるフィールドのみを更新対象にする
     update_data = schedule_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_schedule, key, value)
-        
-    db.add(db_schedule)
+
+    category_changed = False
+    if "category_id" in update_data:
+        current = db.execute(
+            select(ScheduleModel.category_id).where(ScheduleModel.schedule_id == schedule_id)
+        ).first()
+        if current is None:
+            return False
+        if update_data["category_id"] == current.category_id:
+            del update_data["category_id"]
+        elif update_data["category_id"] and is_category_valid(db, update_data["category_id"]) is False:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category_id"
+            )
+        else:
+            category_changed = True
+        if not update_data:
+            return True
+
+    if not update_data:
+        # 変更するフィールドがなければ、存在の確認だけ行う
+        return db.scalar(select(ScheduleModel.schedule_id).where(ScheduleModel.schedule_id == schedule_id)) is not None
+
+    # 一括UPDATEはflushを経由しないので、先に持ち主の変更番号を上げてスケジュールのsync_versionに入れる
+    versions = touch_user_data(db, schedule_ids=[schedule_id])
+    if not versions:
+        return False
+    sync_version = next(iter(versions.values()))
+    db.execute(
+        update(ScheduleModel)
+        .where(ScheduleModel.schedule_id == schedule_id)
+        .values(**update_data, sync_version=sync_version)
+    )
+
+    if category_changed:
+        reconcile_achievements(db, update_data["category_id"], [schedule_id], sync_version=sync_version)
+
     db.commit()
-    db.refresh(db_schedule)
-    return db_schedule
+    return True
 
-def delete_schedule(db: Session, schedule_id: uuid.UUID):
-    db_schedule = get_schedule(db, schedule_id)
-    if not db_schedule:
+def update_schedule(db: Session, schedule_id: uuid.UUID, schedule_update: ScheduleUpdate):
+    if not apply_schedule_update(db, schedule_id, schedule_update):
         return None
-    db.delete(db_schedule)
+    return get_schedule(db, schedule_id)
+
+def _delete_schedules(db: Session, user_id: uuid.UUID, sync_version: int, *conditions) -> list[uuid.UUID]:
+    """
+    ユーザーのスケジュールのうちconditionsに当てはまるものを1回のDELETEで削除し、削除したIDを返す(コミットはしない)。
+    スケジュールも達成記録も読み込まない。達成記録はデータベースの外部キー(ON DELETE CASCADE)で一緒に削除される。
+    一括DELETEはflushを経由しないので、先にtouch_user_dataで上げた変更番号(sync_version)を削除記録に入れる。
+    """
+    deleted_ids = db.scalars(
+        delete(ScheduleModel)
+        .where(ScheduleModel.user_id == user_id, *conditions)
+        .returning(ScheduleModel.schedule_id)
+    ).all()
+    record_deleted_schedules(db, user_id, sync_version, deleted_ids)
+    return deleted_ids
+
+def delete_schedule(db: Session, schedule_id: uuid.UUID) -> uuid.UUID | None:
+    """スケジュールを削除し、そのIDを返す。存在しない場合はNoneを返す"""
+    versions = touch_user_data(db, schedule_ids=[schedule_id])
+    if not versions:
+        return None
+    user_id, sync_version = next(iter(versions.items()))
+    _delete_schedules(db, user_id, sync_version, ScheduleModel.schedule_id == schedule_id)
+    db.commit()
+    return schedule_id
+
+def delete_schedules_in_range(db: Session, user_id: uuid.UUID, range_from: datetime, range_to: datetime) -> list[uuid.UUID]:
+    """
+    開始日時が[range_from, range_to)のユーザーのスケジュールをまとめて削除し、削除したIDを返す。
+    ix_schedules_user_id_start_schedule_schedule_idで絞り込み、1回のDELETEで削除する。
+    期間の前から続いているスケジュールは削除しない。
+    """
+    sync_version = touch_user_data(db, user_ids=[user_id]).get(user_id)
+    if sync_version is None:
+        return []
+    deleted_ids = _delete_schedules(
+        db, user_id, sync_version, ScheduleModel.start_schedule >= range_from, ScheduleModel.start_schedule < range_to
+    )
+    if not deleted_ids:
+        # 削除するものがなければ、変更番号も上げない
+        db.rollback()
+        return []
     db.commit()
-    return db_schedule
\ No newline at end of file
+    return deleted_ids
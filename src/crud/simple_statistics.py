@@ -1,3 +1,4 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import uuid
 
@@ -5,6 +6,8 @@ import uuid
 from models.user import User as UserModel
 from models.user_statistics import UserStatistics as UserStatisticsModel
 from models.overall_statistics import OverallStats as OverallStatisticsModel
+from models.eco_action import EcoAction as EcoActionModel
+from models.eco_action_achievement import EcoActionAchievement as EcoActionAchievementModel
 
 """
 READ
@@ -82,6 +85,29 @@ def update_user_statistics(db: Session, user_id: uuid.UUID, money_saved: float,
 
     return user_statistics
 
+def calculate_overall_statistics(db: Session):
+    """
+    達成済みの記録から全ユーザーの統計情報を集計し、新しい統計レコードとして保存する
+    """
+    stats = (
+        db.query(
+            func.sum(EcoActionModel.money_saved).label("total_money_saved"),
+            func.sum(EcoActionModel.co2_reduction).label("total_co2_reduction")
+        )
+        .join(EcoActionAchievementModel, EcoActionModel.eco_action_id == EcoActionAchievementModel.eco_action_id)
+        .filter(EcoActionAchievementModel.is_completed == True)
+        .one()
+    )
+
+    new_stats_record = OverallStatisticsModel(
+        total_money_saved=stats.total_money_saved or 0.0,
+        total_co2_reduction=stats.total_co2_reduction or 0.0,
+    )
+    db.add(new_stats_record)
+    db.commit()
+
+    return new_stats_record
+
 def update_overall_statistics(db: Session, money_saved: float, co2_reduction: float):
     """
     全ユーザーの統計情報を更新する
@@ -0,0 +1,162 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from core.push import publish
+from models.eco_action_achievement import EcoActionAchievement
+from models.schedule import Schedule
+from models.sync_tombstone import SyncTombstone
+from models.user import User
+
+# 変更番号(users.data_version)による変更の記録
+#
+# スケジュール・達成記録を変更するトランザクションでは、先に持ち主のdata_versionを1つ上げてから(行ロックを取る)、
+# 変更した行のsync_versionにその値を入れる。同じユーザーの変更はロックで順番に実行されるので、
+# sync_versionはコミットの順に増え、端末は「受け取った変更番号より後の変更」を取りこぼさずに取得できる。
+# ORMでの変更はcore.eventsのbefore_flushで、一括更新(insert()/update()等)はそれぞれの処理で記録する。
+
+
+def touch_user_data(db: Session, user_ids=(), schedule_ids=()) -> dict[uuid.UUID, int]:
+    """
+    ユーザーのスケジュール・達成記録が変わったことを記録する(users.data_versionを1つ上げる)。
+    schedule_idsを渡した場合は、そのスケジュールを持つユーザーが対象。
+    上げた後のdata_versionをユーザーごとに返す。対象のユーザーの接続には、コミット時にuser_dataイベントを通知する(core.push)。
+    """
+    conditions = []
+    if user_ids:
+        conditions.append(User.id.in_(list(user_ids)))
+    if schedule_ids:
+        conditions.append(User.id.in_(select(Schedule.user_id).where(Schedule.schedule_id.in_(list(schedule_ids)))))
+    if not conditions:
+        return {}
+    result = db.execute(
+        update(User)
+        .where(or_(*conditions))
+        .values(data_version=User.data_version + 1)
+        .returning(User.id, User.data_version)
+        .execution_options(synchronize_session=False)
+    )
+    versions = dict(result.all())
+    for user_id, data_version in versions.items():
+        publish(db, {"type": "user_data", "user_id": str(user_id), "data_version": data_version})
+    return versions
+
+
+def schedule_owner_data_version():
+    """スケジュールの持ち主の現在のdata_version(UPDATE schedulesのSET句で使う相関サブクエリ)"""
+    return select(User.data_version).where(User.id == Schedule.user_id).scalar_subquery()
+
+
+def achievement_owner_data_version():
+    """達成記録のスケジュールの持ち主の現在のdata_version(UPDATE eco_action_achievementsのSET句で使う相関サブクエリ)"""
+    return (
+        select(User.data_version)
+        .join(Schedule, Schedule.user_id == User.id)
+        .where(Schedule.schedule_id == EcoActionAchievement.schedule_id)
+        .scalar_subquery()
+    )
+
+
+def stamp_schedules(db: Session, schedule_ids) -> None:
+    """
+    スケジュールのsync_versionを持ち主の現在のdata_versionにする。
+    達成記録だけを一括で変更した場合に、スケジュールが差分同期の対象になるようにする(touch_user_dataの後に呼ぶこと)。
+    """
+    db.execute(
+        update(Schedule)
+        .where(Schedule.schedule_id.in_(list(schedule_ids)))
+        .values(sync_version=schedule_owner_data_version())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_deleted_schedules(db: Session, user_id: uuid.UUID, sync_version: int, schedule_ids) -> None:
+    """
+    一括で削除したスケジュールの削除記録を残す(touch_user_dataで上げた変更番号を渡すこと)。
+    ORMで削除した場合はcore.eventsのbefore_flushで記録する。
+    """
+    if not schedule_ids:
+        return
+    db.execute(insert(SyncTombstone), [
+        {"id": uuid.uuid4(), "user_id": user_id, "entity_type": "schedule", "entity_id": schedule_id, "sync_version": sync_version}
+        for schedule_id in schedule_ids
+    ])
+
+
+def delete_expired_tombstones(db: Session, older_than: datetime, batch_size: int = 1000) -> int:
+    """
+    older_thanより前に削除したスケジュールの削除記録を、バッチごとに削除する。
+    削除した記録の最大の変更番号をusers.sync_pruned_versionに残し、それより前のカーソルでの差分同期は全件の取り直しにする。
+    削除した件数を返す。
+    """
+    deleted_count = 0
+    while True:
+        rows = db.execute(
+            select(SyncTombstone.id, SyncTombstone.user_id, SyncTombstone.sync_version)
+            .where(SyncTombstone.deleted_at < older_than)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        pruned_versions: dict[uuid.UUID, int] = {}
+        for _, user_id, sync_version in rows:
+            pruned_versions[user_id] = max(sync_version, pruned_versions.get(user_id, 0))
+        # data_versionは変えない(スケジュール自体は変わっていない)
+        for user_id, sync_version in pruned_versions.items():
+            db.execute(
+                update(User)
+                .where(User.id == user_id, User.sync_pruned_version < sync_version)
+                .values(sync_pruned_version=sync_version)
+                .execution_options(synchronize_session=False)
+            )
+        db.execute(
+            delete(SyncTombstone)
+            .where(SyncTombstone.id.in_([row_id for row_id, _, _ in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        deleted_count += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    return deleted_count
+
+
+def _after(version_column, id_column, after: tuple[int, uuid.UUID | None]):
+    sync_version, last_id = after
+    if last_id is None:
+        return version_column > sync_version
+    return tuple_(version_column, id_column) > tuple_(sync_version, last_id)
+
+
+def select_changed_schedules(user_id: uuid.UUID, after: tuple[int, uuid.UUID | None], upto: int, limit: int):
+    """(sync_version, schedule_id)がafterより後で、upto以下のスケジュールを変更番号の順に取得するクエリ"""
+    return (
+        select(Schedule)
+        .where(
+            Schedule.user_id == user_id,
+            _after(Schedule.sync_version, Schedule.schedule_id, after),
+            Schedule.sync_version <= upto,
+        )
+        .order_by(Schedule.sync_version, Schedule.schedule_id)
+        .limit(limit)
+    )
+
+
+def select_deleted_schedules(user_id: uuid.UUID, after: tuple[int, uuid.UUID | None], upto: int, limit: int):
+    """削除されたスケジュールの(sync_version, schedule_id)を変更番号の順に取得するクエリ"""
+    return (
+        select(SyncTombstone.sync_version, SyncTombstone.entity_id)
+        .where(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.entity_type == "schedule",
+            _after(SyncTombstone.sync_version, SyncTombstone.entity_id, after),
+            SyncTombstone.sync_version <= upto,
+        )
+        .order_by(SyncTombstone.sync_version, SyncTombstone.entity_id)
+        .limit(limit)
+    )
@@ -17,8 +17,11 @@ def get_user_by_google_id(db: Session, google_id: str) -> models.user.User | Non
     # get user by google_id with SQLAlchemy ORM
     return db.query(models.user.User).join(models.user.UserCredential).filter(models.user.UserCredential.google_id == google_id).first()
 
-def create_user(db: Session, email: str, password: str = None, google_id: str = None) -> schemas.user.UserResponse:
-    """新規ユーザーを作成する"""
+def create_user(db: Session, email: str, password: str = None, google_id: str = None, hashed_password: str = None) -> schemas.user.UserResponse:
+    """
+    新規ユーザーを作成する
+    hashed_passwordを渡した場合は、ハッシュ化済みのパスワードとしてそのまま保存する
+    """
     # ユーザーが既に存在するかチェック
     db_user = get_user_by_email(db, email=email)
     if db_user:
@@ -28,8 +31,10 @@ def create_user(db: Session, email: str, password: str = None, google_id: str =
     new_user = models.user.User(email=email)
     
     # パスワード認証の場合
-    if password:
+    if password and not hashed_password:
         hashed_password = get_password_hash(password)
+
+    if hashed_password:
         # 新しいUserCredentialオブジェクトを作成し、Userに紐付ける
         new_credential = models.user.UserCredential(
             hashed_password=hashed_password,
@@ -43,7 +48,7 @@ def create_user(db: Session, email: str, password: str = None, google_id: str =
             user=new_user
         )
 
-    if not password and not google_id:
+    if not hashed_password and not google_id:
         return None
 
     db.add(new_user)
@@ -65,4 +70,4 @@ def authenticate_user(db: Session, email: str, password: str):
     if not verify_password(password, user.credential.hashed_password):
         return None
     
-    return user
\ No newline at end of file
+    return user
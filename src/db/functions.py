@@ -0,0 +1,22 @@
+from sqlalchemy import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class new_uuid(FunctionElement):
+    """
+    DB側でUUIDを採番するSQL関数。INSERT ... SELECTのように、行ごとにPython側で主キーを作れない場合に使う。
+    """
+    type = UUID(as_uuid=True)
+    inherit_cache = True
+
+
+@compiles(new_uuid, "postgresql")
+def _new_uuid_postgresql(element, compiler, **kw):
+    return "gen_random_uuid()"
+
+
+@compiles(new_uuid, "sqlite")
+def _new_uuid_sqlite(element, compiler, **kw):
+    # SQLiteではUUIDを32文字の16進数の文字列で保存している
+    return "lower(hex(randomblob(16)))"
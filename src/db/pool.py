@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from config import settings
+
+
+class PoolMetrics:
+    """
+    コネクションプールの計測値。
+    プールのconnect()(=チェックアウト)にかかった時間と、待っているリクエストの数を記録する。
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def start_checkout(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def finish_checkout(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+
+    def record_connect(self, *args) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidate(self, *args) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "checkout_seconds_avg": self.checkout_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "checkout_seconds_max": self.checkout_seconds_max,
+            }
+
+
+def timed_pool_class(base_class, metrics: PoolMetrics):
+    """
+    チェックアウトにかかった時間を計測するプールクラスを作る。
+    engine.dispose()でプールが作り直されても同じ計測値を使い続けるよう、クラス属性として持たせる。
+    """
+
+    class TimedPool(base_class):
+        pool_metrics = metrics
+
+        def connect(self):
+            metrics.start_checkout()
+            started_at = time.perf_counter()
+            timed_out = False
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                metrics.finish_checkout(time.perf_counter() - started_at, timed_out)
+
+    TimedPool.__name__ = f"Timed{base_class.__name__}"
+    return TimedPool
+
+
+def engine_options(url: str, metrics: PoolMetrics, is_async: bool = False) -> dict:
+    """
+    設定に従ってcreate_engine / create_async_engineに渡すプール関連の引数を作る。
+
+    DB_POOL_MODE:
+    - "queue": ワーカー内でコネクションを保持して使い回す(デフォルト)
+    - "null": コネクションを保持しない。PgBouncerなどトランザクション単位でコネクションを
+      振り分けるプロキシの後ろで使う。asyncpgのプリペアドステートメントのキャッシュも無効にする
+    """
+    url = make_url(url)
+    options = {}
+
+    # SQLite(テスト・ローカル)はSQLAlchemyのデフォルトのプールを使う
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    if settings.DB_POOL_MODE == "null":
+        options["poolclass"] = timed_pool_class(NullPool, metrics)
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {
+                "prepared_statement_cache_size": 0,
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": _unique_statement_name,
+            }
+    else:
+        options["poolclass"] = timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics)
+        options["pool_size"] = settings.DB_POOL_SIZE
+        options["max_overflow"] = settings.DB_MAX_OVERFLOW
+        options["pool_timeout"] = settings.DB_POOL_TIMEOUT_SECONDS
+
+    # Postgresの再起動などで切れたコネクションを、使う前に検知して張り直す
+    options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+    options["pool_recycle"] = settings.DB_POOL_RECYCLE_SECONDS
+
+    return options
+
+
+def _unique_statement_name() -> str:
+    # プロキシ経由で別のサーバー接続に振り分けられても名前が衝突しないようにする
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def watch_pool(engine, metrics: PoolMetrics) -> None:
+    """新規接続と、無効になったコネクションの数を記録する"""
+    event.listen(engine, "connect", metrics.record_connect)
+    event.listen(engine, "invalidate", metrics.record_invalidate)
+
+
+def pool_stats(engine, metrics: PoolMetrics) -> dict:
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__, **metrics.stats()}
+
+    # QueuePoolの場合のみ、保持しているコネクションの内訳を返す
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout_seconds": pool.timeout(),
+        })
+    return stats
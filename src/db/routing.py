@@ -0,0 +1,145 @@
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from config import settings
+
+# リクエストを処理している認証済みユーザーのID(core.auth.get_current_userで設定する)
+current_principal_id: ContextVar = ContextVar("current_principal_id", default=None)
+
+# レプリカの遅延(秒)。プライマリとの差分がない場合は0
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class RecentWrites:
+    """
+    直近に書き込みを行ったユーザーを記録する。
+    書き込みから一定時間は、そのユーザーの読み込みもプライマリで行い、自分の書き込みが見えない状態を避ける。
+    別のワーカーでの書き込みは、core.pushの通知(user_data・principal等)を受け取った時点で記録する。
+    通知が届くまでの間や、通知のない書き込みはレプリカの遅延の上限(REPLICA_MAX_LAG_SECONDS)で抑える。
+    """
+
+    def __init__(self, window_seconds: float, max_size: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._written_at: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id) -> None:
+        if user_id is None or self.window_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # 通知で受け取った文字列のIDとUUIDを同じユーザーとして扱う
+            self._written_at[str(user_id)] = now
+            if len(self._written_at) > self.max_size:
+                # 期限切れの記録を捨てる
+                self._written_at = {
+                    uid: written_at for uid, written_at in self._written_at.items()
+                    if now - written_at < self.window_seconds
+                }
+
+    def has_recent_write(self, user_id) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            written_at = self._written_at.get(str(user_id))
+        return written_at is not None and time.monotonic() - written_at < self.window_seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._written_at.clear()
+
+
+recent_writes = RecentWrites(window_seconds=settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+# レプリカごとの遅延の計測値(replica_key -> 秒)
+replica_lags: dict[str, float] = {}
+
+
+def replica_key(engine) -> str:
+    # 同期・非同期のエンジンで同じレプリカを指すようにドライバを除いたキーにする
+    url = engine.url
+    return f"{url.host}:{url.port}/{url.database}"
+
+
+def is_replica_usable(engine) -> bool:
+    if settings.REPLICA_MAX_LAG_SECONDS <= 0:
+        return True
+    # 遅延を計測できていないレプリカは使わない
+    lag = replica_lags.get(replica_key(engine))
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+class RoutingSession(Session):
+    """
+    読み込み専用のセッションのクエリをレプリカに振り分けるセッション。
+
+    session.info["read_only"]がTrueの場合のみレプリカを使う。次の場合はプライマリを使う。
+    - flush中(書き込み)、またはこのセッションで既に書き込みを行った後
+    - リクエストのユーザーが直近に書き込みを行っている
+    - 遅延が許容範囲を超えているレプリカしかない
+    1つのセッションの中では同じレプリカを使い続ける。
+    """
+
+    def __init__(self, *args, replicas=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = list(replicas)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("read_only") and not self.info.get("has_writes") and not self._flushing:
+            replica = self._choose_replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+    def _choose_replica(self):
+        if "replica" not in self.info:
+            candidates = []
+            if not recent_writes.has_recent_write(current_principal_id.get()):
+                candidates = [replica for replica in self.replicas if is_replica_usable(replica)]
+            self.info["replica"] = random.choice(candidates) if candidates else None
+        return self.info["replica"]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_session_has_writes(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info["has_writes"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def mark_session_has_writes_on_execute(orm_execute_state):
+    # session.execute(insert(...))等の一括更新はflushを経由しないので、実行時に書き込みとして記録する
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def record_recent_write(session):
+    if session.info.get("has_writes"):
+        recent_writes.record(current_principal_id.get())
+
+
+async def run_replica_lag_monitor(async_replicas, interval_seconds: float = settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS):
+    """レプリカの遅延を定期的に計測するバックグラウンドタスク"""
+    while True:
+        for async_replica in async_replicas:
+            key = replica_key(async_replica)
+            try:
+                async with async_replica.connect() as conn:
+                    lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+                replica_lags[key] = float(lag or 0)
+            except Exception as e:
+                # 計測できないレプリカは使わないようにする
+                print(f"Failed to check replica lag ({key}): {e}")
+                replica_lags.pop(key, None)
+        await asyncio.sleep(interval_seconds)
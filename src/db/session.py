@@ -1,15 +1,96 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
+
+from config import settings
+from db.pool import PoolMetrics, engine_options, watch_pool
+from db.routing import RoutingSession
 
 # 環境変数からデータベースのURLを取得
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 読み込み専用のレプリカのURL(カンマ区切りで複数指定可能)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# 非同期ドライバ(asyncpg / aiosqlite)に対応するURL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """同期ドライバのURLを、同じデータベースを指す非同期ドライバのURLに変換する"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+# 未設定の場合はDATABASE_URLから作る
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# コネクションプールの計測値(内部APIで公開する)
+engine_pool_metrics = PoolMetrics()
+async_engine_pool_metrics = PoolMetrics()
 
 # データベースエンジンを作成
-engine = create_engine(DATABASE_URL)
+# プールの大きさなどはconfig.settingsのDB_POOL_*で設定する
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, engine_pool_metrics))
+# 非同期ルート用のエンジン。イベントループ上でスレッドプールを使わずにクエリを実行する
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, async_engine_pool_metrics, is_async=True)
+)
+watch_pool(engine, engine_pool_metrics)
+watch_pool(async_engine.sync_engine, async_engine_pool_metrics)
+
+# レプリカのエンジン。読み込み専用のセッション(get_read_db / get_async_read_db)でのみ使う
+replica_engines = []
+async_replica_engines = []
+replica_pool_metrics = []
+for replica_url in DATABASE_REPLICA_URLS:
+    replica_metrics = PoolMetrics()
+    async_replica_metrics = PoolMetrics()
+    replica_engine = create_engine(replica_url, **engine_options(replica_url, replica_metrics))
+    async_replica_url = to_async_url(replica_url)
+    async_replica_engine = create_async_engine(
+        async_replica_url, **engine_options(async_replica_url, async_replica_metrics, is_async=True)
+    )
+    watch_pool(replica_engine, replica_metrics)
+    watch_pool(async_replica_engine.sync_engine, async_replica_metrics)
+    replica_engines.append(replica_engine)
+    async_replica_engines.append(async_replica_engine)
+    replica_pool_metrics.append((replica_metrics, async_replica_metrics))
+
+# 変更の通知(core.push)をLISTENするための接続のURL
+# LISTENは接続に紐づくので、PgBouncer(transactionモード)を経由すると通知が届かない。
+# DB_POOL_MODE="null"でPgBouncerの後ろで動かす場合は、Postgresに直接接続するURLを指定する
+PUSH_LISTEN_DATABASE_URL = os.getenv("PUSH_LISTEN_DATABASE_URL")
+
+def create_push_listen_engine(url: str | None):
+    """
+    LISTEN用のエンジンを返す。URLの指定がなければアプリのエンジンを使う。
+    DB_POOL_MODE="null"でURLの指定がない場合は、通知が届かないのでNoneを返す(リスナーを起動しない)
+    """
+    if url:
+        # LISTENする接続を1つ使い続けるだけなので、プールは使わない
+        return create_async_engine(to_async_url(url), poolclass=NullPool)
+    if settings.DB_POOL_MODE == "null":
+        return None
+    return async_engine
+
+push_listen_engine = create_push_listen_engine(PUSH_LISTEN_DATABASE_URL)
 
 # データベースセッションを作成するためのクラス
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine, replicas=replica_engines
+)
+# 非同期セッション。コミット後に属性を読み直すと暗黙のI/Oが発生するので、expire_on_commitは無効にする
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+    replicas=[replica.sync_engine for replica in async_replica_engines],
+)
 
 # ORMモデルのベースクラス
 Base = declarative_base()
@@ -20,4 +101,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """非同期のデータベースセッションを取得するための依存関係"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    """
+    読み込み専用のエンドポイント用のセッション。レプリカが設定されていればレプリカから読み込む
+    (書き込みや、直近に書き込んだユーザーの読み込みはプライマリで行う)
+    """
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    """読み込み専用のエンドポイント用の非同期セッション"""
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        yield db
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
@@ -10,6 +13,7 @@ import os
 templates = Jinja2Templates(directory="templates/html")
 
 from api.routers import auth, user
+from api.routers import internal
 # from api.routers.secure import statistics
 from api.routers.secure import simple_statistics
 from api.routers.secure import user as secure_user
@@ -17,22 +21,59 @@ from api.routers.secure import schedule
 from api.routers.secure import category
 from api.routers.secure import eco_action
 from api.routers.secure import eco_action_achievement
+from api.routers.secure import push
 
 import core.events  # 追加：イベントリスナーをインポートして登録
+from core.hashing import hashing_service, HashingQueueFullError
+from core.google_verifier import google_verifier
+from core.email_outbox import close_shared_transport
+from core.jobs import job_runner
+from core.push import run_push_listener
+import core.job_definitions  # ジョブの種類を登録する
+from core.rate_limit import RateLimitExceededError, retry_after_header
+from config import settings
+from db.routing import run_replica_lag_monitor
+from db.session import async_engine, async_replica_engines, push_listen_engine
 
 from db.admin import setup_admin, authentication_backend  # 追加したadmin.pyをimportしてFastAPIアプリに登録
 
 load_dotenv()  # .envファイルの内容を環境変数に読み込む
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # バックグラウンドタスクを起動
+    background_tasks = []
+    if settings.GOOGLE_CERTS_REFRESH_ENABLED:
+        background_tasks.append(asyncio.create_task(google_verifier.run_refresher()))
+    # メールの送信・リフレッシュトークンの掃除・達成記録の再計算などはジョブとして実行する(core.job_definitions)
+    if settings.JOB_WORKER_CONCURRENCY > 0:
+        background_tasks.append(asyncio.create_task(job_runner.run()))
+    # 変更の通知を他のワーカーから受け取る(Postgresの場合のみ)
+    if push_listen_engine is not None:
+        background_tasks.append(asyncio.create_task(run_push_listener(push_listen_engine)))
+    elif async_engine.dialect.name == "postgresql":
+        print("Push listener is disabled: set PUSH_LISTEN_DATABASE_URL to a direct database connection when DB_POOL_MODE=null")
+    if async_replica_engines and settings.REPLICA_MAX_LAG_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_replica_lag_monitor(async_replica_engines)))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    # メール送信の接続を閉じる
+    close_shared_transport()
+    # パスワードハッシュ用のプロセスプールを停止
+    hashing_service.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # "static"ディレクトリを "/static" パスでマウント
 app.mount("/static", StaticFiles(directory="templates"), name="static")
 
 # Nginxのようなリバースプロキシを信頼し、
 # X-Forwarded-Protoヘッダーなどを解釈するように設定します。
-# trusted_hosts="*"は、どのプロキシからでもヘッダーを信頼することを意味します。
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+# ヘッダーを信頼するのはFORWARDED_ALLOW_IPSに含まれるプロキシからの接続だけです。
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.FORWARDED_ALLOW_IPS)
 
 # app.add_middleware(
 #     SessionMiddleware,
@@ -51,10 +92,32 @@ app.include_router(schedule.router)
 app.include_router(category.router)
 app.include_router(eco_action.router)
 app.include_router(eco_action_achievement.router)
+app.include_router(push.router)
+app.include_router(internal.router)
 
 setup_admin(app)
 
 
+@app.exception_handler(HashingQueueFullError)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFullError):
+    # ログインが殺到してハッシュ計算の待ち行列が溢れた場合は、少し待って再試行してもらう
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "サーバーが混み合っています。しばらくしてから再度お試しください。"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(RateLimitExceededError)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceededError):
+    # 短時間に認証系のリクエストを繰り返すクライアントには、待つべき秒数を返す
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "リクエストが多すぎます。しばらくしてから再度お試しください。"},
+        headers={"Retry-After": retry_after_header(exc)},
+    )
+
+
 @app.get("/")
 def read_root():
     return {"message": "Hello, Docker World!"}
\ No newline at end of file
@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, UUID, Index
+
+from db.session import Base # declarative_base()インスタンス
+
+class AchievementReconciliation(Base):
+    """
+    達成記録の再計算が必要なカテゴリのキュー
+    エコ活動の追加・削除・カテゴリ変更時に登録し、core.achievement_reconcilerのワーカーがそのカテゴリのスケジュールだけを再計算する
+    """
+    __tablename__ = 'achievement_reconciliations'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # カテゴリが削除されても再計算できるよう、外部キーにはしない
+    category_id = Column(UUID(as_uuid=True), nullable=False)
+    requested_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # ワーカーが処理中の場合、この時刻まで他のワーカーは取得しない
+    locked_until = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_achievement_reconciliations_category_id", "category_id"),
+    )
@@ -18,7 +18,7 @@ class EcoAction(Base):
     co2_reduction = Column(Float) # 単位はkg-CO2
 
     # 外部キー制約
-    category_id = Column(UUID(as_uuid=True), ForeignKey('categories.category_id'))
+    category_id = Column(UUID(as_uuid=True), ForeignKey('categories.category_id'), index=True)
     
     # 多対1のリレーションシップ (EcoAction -> Category)
     category = relationship("Category", back_populates="eco_actions")
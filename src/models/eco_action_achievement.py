@@ -1,7 +1,7 @@
 # models.py
 
 import uuid
-from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey, UUID
+from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey, UUID, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db.session import Base # declarative_base()インスタンス
@@ -15,10 +15,19 @@ class EcoActionAchievement(Base):
     achievement_id = Column("achievement_id", UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     achieved_at = Column(DateTime, nullable=True)
     is_completed = Column(Boolean, default=True)
+    # 最後に変更された時点のスケジュールの持ち主のdata_version
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # 外部キー制約
-    schedule_id = Column(UUID(as_uuid=True), ForeignKey('schedules.schedule_id'))
-    eco_action_id = Column(UUID(as_uuid=True), ForeignKey('eco_actions.eco_action_id'))
+    # スケジュールを削除すると、達成記録はデータベース側で一緒に削除される(ON DELETE CASCADE)
+    schedule_id = Column(UUID(as_uuid=True), ForeignKey('schedules.schedule_id', ondelete="CASCADE"))
+    eco_action_id = Column(UUID(as_uuid=True), ForeignKey('eco_actions.eco_action_id'), index=True)
+
+    __table_args__ = (
+        # 1つのスケジュールに同じエコ活動の達成記録は1件だけ
+        # (schedule_idでの検索もこの制約のインデックスを使う)
+        UniqueConstraint("schedule_id", "eco_action_id", name="uq_eco_action_achievements_schedule_id_eco_action_id"),
+    )
     
     # 多対1のリレーションシップ
     schedule = relationship("Schedule", back_populates="eco_action_achievements")
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, UUID, Index
+
+from db.session import Base # declarative_base()インスタンス
+
+class EmailOutbox(Base):
+    """
+    送信待ちメールのキュー(アウトボックス)
+    APIはここに登録するだけで、実際の送信はジョブemails.dispatch(core.job_definitions)が行う
+    """
+    __tablename__ = 'email_outbox'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False) # メールの種類(重複送信の抑制に使う)
+    to_address = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False) # HTML本文
+
+    # pending: 送信待ち, sent: 送信済み, failed: 再試行の上限に達した
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # 送信待ちのメールを古い順に取り出すためのインデックス
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        # 同じ宛先への重複送信を確認するためのインデックス
+        Index("ix_email_outbox_to_address_kind_created_at", "to_address", "kind", "created_at"),
+    )
@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, UUID, JSON, Index, text
+
+from db.session import Base # declarative_base()インスタンス
+
+class Job(Base):
+    """
+    バックグラウンドジョブのキュー
+    リクエストの処理中に行うには重い処理を登録し、core.jobsのワーカーが実行する
+    """
+    __tablename__ = 'jobs'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False) # core.jobsに登録されたジョブの種類
+    payload = Column(JSON, nullable=False, default=dict)
+
+    # pending: 実行待ち, running: 実行中, succeeded: 成功, failed: 再試行の上限に達した
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow) # この時刻以降に実行する
+    # 実行中のワーカーが落ちた場合、この時刻を過ぎたら他のワーカーが再実行する
+    locked_until = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    # 同じキーの実行待ち・実行中のジョブは1つだけ(定期実行のジョブや、重複登録の抑制に使う)
+    unique_key = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # 実行待ちのジョブを実行時刻順に取り出すためのインデックス
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index(
+            "uq_jobs_unique_key_active", "unique_key", unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+            sqlite_where=text("status IN ('pending', 'running')"),
+        ),
+    )
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UUID, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UUID, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 
 from models.category import Category # noqa: F401
@@ -19,12 +19,26 @@ class Schedule(Base):
 
     # 外部キー制約
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
-    category_id = Column(UUID(as_uuid=True), ForeignKey('categories.category_id'), nullable=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey('categories.category_id'), nullable=True, index=True)
+    # 最後に変更された時点のユーザーのdata_version(スケジュールか達成記録が変わると更新する。差分同期に使う)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # ユーザーのスケジュール一覧を(開始日時, ID)順に取得するためのインデックス(キーセットページネーション用)
+        Index("ix_schedules_user_id_start_schedule_schedule_id", "user_id", "start_schedule", "schedule_id"),
+        # カレンダーの期間指定の取得で、終了日時の下限で絞り込むためのインデックス
+        Index("ix_schedules_user_id_end_schedule", "user_id", "end_schedule"),
+        # 差分同期で、変更番号の順に取得するためのインデックス
+        Index("ix_schedules_user_id_sync_version_schedule_id", "user_id", "sync_version", "schedule_id"),
+    )
     
     # ScheduleからUserとCategoryへの多対1の関係を定義
     owner = relationship("User", back_populates="schedules")
     category = relationship("Category", back_populates="schedules")
-    eco_action_achievements = relationship("EcoActionAchievement", back_populates="schedule")
+    # 達成記録の削除はデータベースの外部キー(ON DELETE CASCADE)に任せ、削除時に読み込まない
+    eco_action_achievements = relationship(
+        "EcoActionAchievement", back_populates="schedule", cascade="all", passive_deletes=True
+    )
 
     def __str__(self):
         # ドロップダウンに表示したいカラムを返す
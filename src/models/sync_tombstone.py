@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UUID, Index
+
+from db.session import Base # declarative_base()インスタンス
+
+class SyncTombstone(Base):
+    """
+    削除されたスケジュールの記録(差分同期で、端末に削除を伝えるために使う)
+    sync_versionは削除した時点のユーザーのdata_version
+    SYNC_TOMBSTONE_RETENTION_DAYSを過ぎたものはジョブsync_tombstones.cleanupで削除する
+    """
+    __tablename__ = 'sync_tombstones'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    entity_type = Column(String, nullable=False, default="schedule")
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    sync_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # ユーザーの変更番号の順に取得するためのインデックス
+        Index("ix_sync_tombstones_user_id_sync_version_entity_id", "user_id", "sync_version", "entity_id"),
+        # 保持期間を過ぎた記録を削除するためのインデックス(crud.sync.delete_expired_tombstones)
+        Index("ix_sync_tombstones_deleted_at", "deleted_at"),
+    )
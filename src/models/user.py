@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UUID, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UUID, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -14,10 +14,15 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # スケジュール・達成記録が変わるたびに1つ上がる番号(一覧取得のETagと差分同期に使う。crud.sync.touch_user_data)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # 保持期間を過ぎて削除した削除記録(SyncTombstone)のうち、最大の変更番号(これより前のカーソルでは差分同期できない)
+    sync_pruned_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # UserとUserCredentialを1対1で関連付ける
     credential = relationship("UserCredential", back_populates="user", uselist=False)
-    refresh_token = relationship("RefreshToken", back_populates="user", uselist=False)
+    # 端末ごとにリフレッシュトークン(セッション)を持てるように1対多で関連付ける
+    refresh_tokens = relationship("RefreshToken", back_populates="user")
     schedules = relationship("Schedule", back_populates="owner")
     statistics = relationship("UserStatistics", back_populates="user", uselist=False)
 
@@ -44,14 +49,28 @@ class UserCredential(Base):
     user = relationship("User", back_populates="credential")
 
 class RefreshToken(Base):
-    """リフレッシュトークンモデル"""
+    """
+    リフレッシュトークンモデル
+    1行が1端末のセッションの、ある時点のトークンを表す。
+    /auth/refresh/でトークンをローテーションすると、古い行は失効させてreplaced_by_idで新しい行を指す。
+    """
     __tablename__ = "refresh_tokens"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    device_id = Column(String, nullable=False, default=lambda: uuid.uuid4().hex)
     hashed_token = Column(String, unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
     is_revoked = Column(Boolean, default=False)
+    revoked_at = Column(DateTime, nullable=True)
 
-    user = relationship("User", back_populates="refresh_token")
\ No newline at end of file
+    # ローテーション後のトークン。失効済みトークンの再利用を検知するために使う
+    replaced_by_id = Column(UUID(as_uuid=True), ForeignKey("refresh_tokens.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_device_id", "user_id", "device_id"),
+    )
+
+    user = relationship("User", back_populates="refresh_tokens")
\ No newline at end of file
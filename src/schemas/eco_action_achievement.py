@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 import uuid
 
@@ -24,6 +24,13 @@ class AchievementStatusUpdate(AchievementBase):
     
     is_completed: bool # 更新後の状態をクライアントから受け取る
 
+# 1回のリクエストで更新できる達成記録の最大件数
+ACHIEVEMENT_BULK_MAX_ITEMS = 500
+
+class AchievementStatusBulkUpdate(BaseModel):
+    # 同じスケジュール・エコ活動の更新が複数ある場合は、後のものが優先される(オフライン時の操作の再送など)
+    updates: list[AchievementStatusUpdate] = Field(min_length=1, max_length=ACHIEVEMENT_BULK_MAX_ITEMS)
+
 class AchievementDelete(AchievementBase):
     model_config = ConfigDict(from_attributes=True)
     pass
\ No newline at end of file
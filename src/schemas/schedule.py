@@ -31,6 +31,8 @@ class ScheduleResponse(ScheduleBase):
     schedule_id: uuid.UUID
     category: CategoryResponse | None = None
     eco_action_achievements: list[AchievementResponse] | None = None
+    # 最後に変更された時点の変更番号(差分同期で使う)
+    sync_version: int = 0
 
     # start_scheduleから自動的に計算されるフィールド
     @computed_field
@@ -47,4 +49,37 @@ class ScheduleResponse(ScheduleBase):
     @property
     def startHour(self) -> int | None:
         return self.start_schedule.hour if self.start_schedule else None
-    
\ No newline at end of file
+    
+
+# --- 一括作成 ---
+# 1回のリクエストで作成できるスケジュールの最大件数
+SCHEDULE_BULK_MAX_ITEMS = 500
+
+class ScheduleBulkCreate(BaseModel):
+    schedules: list[ScheduleCreate] = Field(min_length=1, max_length=SCHEDULE_BULK_MAX_ITEMS)
+    all_or_nothing: bool = Field(default=False, description="Trueの場合、1件でもエラーがあれば1件も作成しません。")
+
+class ScheduleBulkError(BaseModel):
+    index: int = Field(description="リクエストのschedulesの何番目(0始まり)のエラーかを表します。")
+    detail: str
+
+class ScheduleBulkCreateResponse(BaseModel):
+    created: list[ScheduleResponse]
+    errors: list[ScheduleBulkError]
+
+class ScheduleBulkDeleteResponse(BaseModel):
+    deleted_schedule_ids: list[uuid.UUID] = Field(description="削除したスケジュールのIDです。")
+
+# --- 差分同期 ---
+# 1回のリクエストで返す変更の最大件数
+SCHEDULE_CHANGES_MAX_LIMIT = 500
+
+class ScheduleChangesResponse(BaseModel):
+    schedules: list[ScheduleResponse] = Field(description="前回の同期以降に作成・変更されたスケジュール(達成記録を含む)です。")
+    deleted_schedule_ids: list[uuid.UUID] = Field(description="前回の同期以降に削除されたスケジュールのIDです。")
+    cursor: str = Field(description="次回の同期で指定するカーソルです。has_moreがTrueの場合は、すぐに続きを取得してください。")
+    has_more: bool
+    reset: bool = Field(
+        default=False,
+        description="Trueの場合、カーソルが古く差分を返せないため全てのスケジュールを返しています。手元のスケジュールを置き換えてください(続きはhas_moreに従って取得します)。",
+    )
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import string
 import uuid
+from datetime import datetime
 from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 
 # Token
@@ -13,6 +14,7 @@ class TokenResponse(BaseModel):
   access_token: str
   expires_in: int
   refresh_token: str
+  device_id: str | None = None
   token_type: str = "bearer"
 
 class GoogleAuthResponse(BaseModel):
@@ -23,10 +25,20 @@ class GoogleAuthResponse(BaseModel):
   name: str | None = None
   access_token: str
   refresh_token: str
+  device_id: str | None = None
   token_type: str = "bearer"
   expires_in: int
   message: str
 
+# 端末ごとのログインセッション
+class RefreshSessionResponse(BaseModel):
+  model_config = ConfigDict(from_attributes=True)
+
+  device_id: str
+  created_at: datetime | None = None
+  last_used_at: datetime | None = None
+  expires_at: datetime
+
 # user
 class UserCreate(BaseModel):
   email: EmailStr
@@ -0,0 +1,78 @@
+"""
+リフレッシュトークン検証のスループットを、bcrypt(変更前)とHMAC(変更後)で比較するベンチマーク
+
+実行例:
+    docker-compose exec app python -m scripts.benchmark_refresh_token
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.session import Base
+import models.user
+import models.schedule  # noqa: F401
+import models.eco_action  # noqa: F401
+import models.user_statistics  # noqa: F401
+from core.security import pwd_context, get_refresh_token_hash
+from core.token import create_refresh_token
+from crud.user import get_user_by_email
+from crud.refresh_token import get_user_by_refresh_token
+
+NUM_USERS = 20
+ROUNDS = 2
+
+def create_users(db, hash_token) -> list[tuple[str, str]]:
+    """ユーザーとリフレッシュトークンを作成し、(email, 平文トークン)のリストを返す"""
+    pairs = []
+    for i in range(NUM_USERS):
+        email = f"bench{i}@example.com"
+        plain_token = create_refresh_token()
+        user = models.user.User(email=email, is_active=True)
+        user.refresh_tokens = [models.user.RefreshToken(
+            hashed_token=hash_token(plain_token),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=30),
+        )]
+        db.add(user)
+        pairs.append((email, plain_token))
+    db.commit()
+    return pairs
+
+def legacy_refresh(db, email: str, refresh_token: str):
+    """変更前の処理: メールアドレスでユーザーを取得し、bcryptで検証する"""
+    user = get_user_by_email(db, email=email)
+    if user and pwd_context.verify(refresh_token, user.refresh_tokens[0].hashed_token):
+        return user
+    return None
+
+def measure(label: str, refresh, pairs, db) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for email, plain_token in pairs:
+            assert refresh(db, email, plain_token) is not None
+    elapsed = time.perf_counter() - start
+    throughput = ROUNDS * len(pairs) / elapsed
+    print(f"{label:<8} {throughput:10.1f} refresh/sec ({elapsed:.2f} sec)")
+    return throughput
+
+def run_benchmark():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = SessionLocal()
+    try:
+        before = measure("bcrypt", legacy_refresh, create_users(db, pwd_context.hash), db)
+
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        after = measure("hmac", lambda db, email, token: get_user_by_refresh_token(db, email, token), create_users(db, get_refresh_token_hash), db)
+        print(f"speedup  {after / before:10.1f}x")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,108 @@
+"""
+カレンダーの1か月分のスケジュール取得を、全件のページング(変更前)と期間指定のクエリ(変更後)で比較するベンチマーク
+
+数万件のスケジュールを持つユーザーを作成し、1か月分を取得する時間を計測する。
+変更前はクライアントが全件をページングで取得し、month等の計算フィールドで絞り込んでいた。
+
+実行例:
+    docker-compose exec app python -m scripts.benchmark_schedule_range
+"""
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.session import Base
+import models.user
+import models.schedule
+import models.eco_action  # noqa: F401
+import models.eco_action_achievement  # noqa: F401
+import models.user_statistics  # noqa: F401
+from crud.schedule import get_schedules_by_user, get_schedules_in_range, select_schedules_in_range
+from schemas.schedule import ScheduleResponse
+
+NUM_SCHEDULES = 30000
+PAGE_SIZE = 100
+ROUNDS = 5
+# 約4年分に散らばるようにする
+SPAN_DAYS = 4 * 365
+RANGE_FROM = datetime(2024, 11, 1)
+RANGE_TO = datetime(2024, 12, 1)
+
+def create_schedules(db) -> uuid.UUID:
+    user = models.user.User(email="bench@example.com", is_active=True)
+    db.add(user)
+    db.flush()
+
+    base = datetime(2022, 1, 1)
+    rows = []
+    for _ in range(NUM_SCHEDULES):
+        start = base + timedelta(minutes=random.randint(0, SPAN_DAYS * 24 * 60))
+        all_day = random.random() < 0.1
+        duration = timedelta(days=random.randint(0, 3)) if all_day else timedelta(hours=1)
+        rows.append({
+            "schedule_id": uuid.uuid4(), "user_id": user.id, "title": "bench",
+            "all_day": all_day, "start_schedule": start, "end_schedule": start + duration,
+        })
+    db.execute(insert(models.schedule.Schedule), rows)
+    db.commit()
+    db.execute(text("ANALYZE"))
+    return user.id
+
+def legacy_month(db, user_id) -> list[ScheduleResponse]:
+    """変更前の処理: 全件をページングで取得し、開始日時の年月で絞り込む"""
+    found = []
+    skip = 0
+    while True:
+        page = get_schedules_by_user(db, user_id=user_id, skip=skip, limit=PAGE_SIZE)
+        found.extend(
+            schedule for schedule in map(ScheduleResponse.model_validate, page)
+            if (schedule.start_schedule.year, schedule.month) == (RANGE_FROM.year, RANGE_FROM.month)
+        )
+        if len(page) < PAGE_SIZE:
+            return found
+        skip += PAGE_SIZE
+
+def range_month(db, user_id) -> list[ScheduleResponse]:
+    """変更後の処理: 期間指定のクエリで取得する"""
+    return [ScheduleResponse.model_validate(schedule) for schedule in get_schedules_in_range(db, user_id, RANGE_FROM, RANGE_TO)]
+
+def measure(label: str, fetch, db, user_id) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        count = len(fetch(db, user_id))
+        db.expire_all()
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    print(f"{label:<8} {elapsed * 1000:10.1f} ms/month ({count} schedules)")
+    return elapsed
+
+def run_benchmark():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = SessionLocal()
+    try:
+        user_id = create_schedules(db)
+        print(f"--- {NUM_SCHEDULES}件のスケジュールから{RANGE_FROM:%Y-%m}の分を取得 ---")
+
+        before = measure("paging", legacy_month, db, user_id)
+        after = measure("range", range_month, db, user_id)
+        print(f"speedup  {before / after:10.1f}x")
+
+        # 期間指定のクエリがインデックスを使っていることを確認する
+        statement = select_schedules_in_range(user_id, RANGE_FROM, RANGE_TO).compile(
+            engine, compile_kwargs={"literal_binds": True}
+        )
+        print("--- 実行計画 ---")
+        for row in db.execute(text(f"EXPLAIN QUERY PLAN {statement}")):
+            print(f"    {row[-1]}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_benchmark()
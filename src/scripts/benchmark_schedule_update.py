@@ -0,0 +1,120 @@
+"""
+スケジュールの更新で発行されるSQLの件数を、変更前(毎回達成記録を再計算)と変更後(変更したフィールドに応じて更新)で比較するベンチマーク
+
+タイトル・説明・日時・カテゴリ(同じ値/別の値)の変更ごとに、更新処理で発行されたSQLの件数と時間を計測する。
+変更前は更新のたびにスケジュールを読み込み、変更前のカテゴリで達成記録を再計算してから各フィールドを反映していた。
+
+実行例:
+    docker-compose exec app python -m scripts.benchmark_schedule_update
+"""
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.session import Base
+import core.events  # noqa: F401
+import models.user
+import models.category
+import models.eco_action
+import models.eco_action_achievement  # noqa: F401
+import models.schedule
+import models.sync_tombstone  # noqa: F401
+import models.user_statistics  # noqa: F401
+import models.achievement_reconciliation  # noqa: F401
+from core.master_data import master_data_cache
+from crud.helper.schedule_helper import create_achievements_for_schedule, update_achievements_by_update_schedule
+from crud.schedule import apply_schedule_update, get_schedule
+from schemas.schedule import ScheduleUpdate
+
+ROUNDS = 50
+ECO_ACTIONS_PER_CATEGORY = 5
+
+def create_schedule(db) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    user = models.user.User(email="bench@example.com", is_active=True)
+    categories = [models.category.Category(category_id=uuid.uuid4(), category_name=name) for name in ("通勤・通学", "買い物")]
+    db.add(user)
+    db.add_all(categories)
+    db.flush()
+    db.add_all(
+        models.eco_action.EcoAction(category_id=category.category_id, content=f"{category.category_name}のエコ活動{i}")
+        for category in categories for i in range(ECO_ACTIONS_PER_CATEGORY)
+    )
+    schedule = models.schedule.Schedule(
+        title="bench", user_id=user.id, category_id=categories[0].category_id,
+        start_schedule=datetime(2025, 11, 1, 10), end_schedule=datetime(2025, 11, 1, 11),
+    )
+    db.add(schedule)
+    db.flush()
+    create_achievements_for_schedule(db, schedule)
+    db.commit()
+    return schedule.schedule_id, [category.category_id for category in categories]
+
+def legacy_update(db, schedule_id, schedule_update: ScheduleUpdate):
+    """変更前の処理: スケジュールを読み込み、変更前のカテゴリで達成記録を再計算してから各フィールドを反映する"""
+    db_schedule = get_schedule(db, schedule_id)
+    update_achievements_by_update_schedule(db, db_schedule)
+    for key, value in schedule_update.model_dump(exclude_unset=True).items():
+        setattr(db_schedule, key, value)
+    # 変更前はここでdb.add(db_schedule)していたが、古いカテゴリでの再計算で削除した達成記録が
+    # relationshipに残っていると失敗するので、計測では省く(永続化済みのインスタンスなので結果は変わらない)
+    db.commit()
+    db.refresh(db_schedule)
+
+def field_aware_update(db, schedule_id, schedule_update: ScheduleUpdate):
+    """変更後の処理: 変更したフィールドだけを1回のUPDATEで反映し、カテゴリが変わった場合だけ再計算する"""
+    apply_schedule_update(db, schedule_id, schedule_update)
+
+def edits(category_ids: list[uuid.UUID]) -> dict[str, list[ScheduleUpdate]]:
+    # 同じ種類の変更を繰り返せるように、2つの値を交互に使う
+    return {
+        "title": [ScheduleUpdate(title="A"), ScheduleUpdate(title="B")],
+        "description": [ScheduleUpdate(description="A"), ScheduleUpdate(description="B")],
+        "time": [
+            ScheduleUpdate(start_schedule=datetime(2025, 11, 2, 10), end_schedule=datetime(2025, 11, 2, 11)),
+            ScheduleUpdate(start_schedule=datetime(2025, 11, 1, 10), end_schedule=datetime(2025, 11, 1, 11)),
+        ],
+        "same_category": [ScheduleUpdate(category_id=category_ids[0])],
+        "category": [ScheduleUpdate(category_id=category_ids[1]), ScheduleUpdate(category_id=category_ids[0])],
+    }
+
+def measure(update, engine, db, schedule_id, updates: list[ScheduleUpdate]) -> tuple[float, float]:
+    """1回の更新あたりの(SQLの件数, 時間)を返す"""
+    statements = []
+    record = lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            update(db, schedule_id, updates[i % len(updates)])
+            db.expire_all()
+        elapsed = (time.perf_counter() - start) / ROUNDS
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements) / ROUNDS, elapsed
+
+def run_benchmark():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = SessionLocal()
+    try:
+        schedule_id, category_ids = create_schedule(db)
+        master_data_cache.get(db)
+        print(f"{'edit':<14} {'legacy':>18} {'field-aware':>18}")
+        for kind, updates in edits(category_ids).items():
+            before_queries, before = measure(legacy_update, engine, db, schedule_id, updates)
+            after_queries, after = measure(field_aware_update, engine, db, schedule_id, updates)
+            print(
+                f"{kind:<14} {before_queries:5.1f} q {before * 1000:7.2f} ms"
+                f"  {after_queries:5.1f} q {after * 1000:7.2f} ms"
+            )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_benchmark()
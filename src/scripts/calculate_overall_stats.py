@@ -1,35 +1,29 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+"""
+全ユーザーの統計情報を集計し直すスクリプト
 
-from db.session import SessionLocal
-from models.eco_action import EcoAction as EcoActionModel
-from models.eco_action_achievement import EcoActionAchievement as EcoActionAchievementModel
-from models.overall_statistics import OverallStats
+集計はジョブ(statistics.overall)として実行する。ここでは登録だけ行い、実際の集計はジョブのワーカーが行う。
+--nowを指定した場合は、ジョブを登録せずにこのプロセスで集計する。
 
-def calculate_and_save_overall_stats(db: Session):
-    print("Calculating overall statistics...")
-    
-    # 全ユーザーの統計情報を集計
-    stats = (
-        db.query(
-            func.sum(EcoActionModel.money_saved).label("total_money_saved"),
-            func.sum(EcoActionModel.co2_reduction).label("total_co2_reduction")
-        )
-        .join(EcoActionAchievementModel, EcoActionModel.eco_action_id == EcoActionAchievementModel.eco_action_id)
-        .filter(EcoActionAchievementModel.is_completed == True)
-        .one()
-    )
+実行例:
+    docker-compose exec app python -m scripts.calculate_overall_stats
+"""
+import sys
 
-    # 新しい統計レコードを作成して保存
-    new_stats_record = OverallStats(
-        total_money_saved=stats.total_money_saved or 0.0,
-        total_co2_reduction=stats.total_co2_reduction or 0.0,
-    )
-    db.add(new_stats_record)
-    db.commit()
-    print("Successfully saved new overall statistics.")
+from db.session import SessionLocal
+import core.job_definitions  # noqa: F401 ジョブの種類を登録する
+from core.jobs import enqueue
+from crud.simple_statistics import calculate_overall_statistics
 
 if __name__ == "__main__":
     db = SessionLocal()
-    calculate_and_save_overall_stats(db)
-    db.close()
\ No newline at end of file
+    try:
+        if "--now" in sys.argv:
+            print("Calculating overall statistics...")
+            calculate_overall_statistics(db)
+            print("Successfully saved new overall statistics.")
+        else:
+            enqueue(db, "statistics.overall", unique_key="statistics.overall")
+            db.commit()
+            print("Enqueued statistics.overall job.")
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+"""
+CRUDが発行するクエリの実行計画を確認するスクリプト
+
+各CRUD関数を実行して発行されたSQLを記録し、そのSQLをEXPLAIN ANALYZEで実行する。
+データ量が少ないとPostgresはインデックスを使わないので、--seedで件数の多いデータを投入してから確認する。
+大きいテーブルでSeq Scanになっているクエリがあれば警告し、終了コード1で終了する。
+
+実行例(ローカルのPostgresに対して実行すること):
+    docker-compose exec app python -m scripts.explain_queries --seed
+    docker-compose exec app python -m scripts.explain_queries
+"""
+import argparse
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, text
+from sqlalchemy.orm import Session
+
+from db.session import SessionLocal, engine
+from models.category import Category
+from models.eco_action import EcoAction
+from models.eco_action_achievement import EcoActionAchievement
+from models.schedule import Schedule
+from models.user import User, UserCredential, RefreshToken
+from core.security import get_refresh_token_hash
+
+import crud.eco_action
+import crud.eco_action_achievement
+import crud.refresh_token
+import crud.schedule
+import crud.user
+from crud.helper.schedule_helper import update_achievements_by_update_schedule
+
+NUM_USERS = 2000
+SCHEDULES_PER_USER = 50
+ECO_ACTIONS_PER_CATEGORY = 3
+
+# Seq Scanになってはいけないテーブル(件数がユーザー数に比例して増えるもの)
+HOT_TABLES = ("schedules", "eco_action_achievements", "users", "user_credentials", "refresh_tokens")
+
+def seed(db: Session):
+    """ユーザー・スケジュール・達成記録をまとめて投入する"""
+    categories = db.query(Category).all()
+    if not categories:
+        categories = [Category(category_id=uuid.uuid4(), category_name=name) for name in ("ゴミ出し", "通勤・通学", "外出", "買い物")]
+        db.add_all(categories)
+        db.flush()
+
+    eco_actions_by_category = {}
+    for category in categories:
+        eco_actions = crud.eco_action.get_eco_actions_by_category(db, category.category_id)
+        if not eco_actions:
+            eco_actions = [
+                EcoAction(category_id=category.category_id, content=f"{category.category_name}のエコ活動{i}", money_saved=10, co2_reduction=0.1)
+                for i in range(ECO_ACTIONS_PER_CATEGORY)
+            ]
+            db.add_all(eco_actions)
+            db.flush()
+        eco_actions_by_category[category.category_id] = [eco_action.eco_action_id for eco_action in eco_actions]
+
+    print(f"--- {NUM_USERS}人 x {SCHEDULES_PER_USER}件のスケジュールを投入します ---")
+    now = datetime.utcnow()
+    for start in range(0, NUM_USERS, 100):
+        users, credentials, tokens, schedules, achievements = [], [], [], [], []
+        for i in range(start, min(start + 100, NUM_USERS)):
+            user_id = uuid.uuid4()
+            users.append({"id": user_id, "email": f"explain{i}-{user_id.hex[:8]}@example.com", "is_active": True, "created_at": now})
+            credentials.append({"id": uuid.uuid4(), "user_id": user_id, "hashed_password": "x"})
+            tokens.append({
+                "id": uuid.uuid4(), "user_id": user_id, "device_id": "default",
+                "hashed_token": get_refresh_token_hash(uuid.uuid4().hex), "created_at": now,
+                "expires_at": now + timedelta(days=30), "is_revoked": False,
+            })
+            for _ in range(SCHEDULES_PER_USER):
+                schedule_id = uuid.uuid4()
+                category_id = random.choice(categories).category_id
+                start_schedule = now + timedelta(hours=random.randint(-24 * 180, 24 * 180))
+                schedules.append({
+                    "schedule_id": schedule_id, "user_id": user_id, "category_id": category_id, "title": "explain",
+                    "all_day": False, "start_schedule": start_schedule, "end_schedule": start_schedule + timedelta(hours=1),
+                })
+                achievements.extend(
+                    {"achievement_id": uuid.uuid4(), "schedule_id": schedule_id, "eco_action_id": eco_action_id, "is_completed": False}
+                    for eco_action_id in eco_actions_by_category[category_id]
+                )
+        db.execute(insert(User), users)
+        db.execute(insert(UserCredential), credentials)
+        db.execute(insert(RefreshToken), tokens)
+        db.execute(insert(Schedule), schedules)
+        db.execute(insert(EcoActionAchievement), achievements)
+        db.commit()
+
+    # 統計情報を更新して、実行計画が件数を反映するようにする
+    for table in ("users", "user_credentials", "refresh_tokens", "schedules", "eco_action_achievements", "eco_actions"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+    print("--- 投入が完了しました ---")
+
+def capture_queries(db: Session, fn) -> list[tuple[str, object]]:
+    """fn(db)を実行し、発行されたSELECT文とパラメータを返す。変更はロールバックする"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.rollback()
+    return statements
+
+def explain(db: Session, statement: str, parameters) -> list[str]:
+    connection = db.connection()
+    rows = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+    db.rollback()
+    return [row[0] for row in rows]
+
+def build_checks(db: Session) -> list[tuple[str, object]]:
+    # 実在するデータからランダムに1件選び、それを引数にCRUD関数を呼び出す
+    schedule = db.query(Schedule).filter(Schedule.category_id.isnot(None)).order_by(func.random()).first()
+    achievement = db.query(EcoActionAchievement).filter(EcoActionAchievement.schedule_id == schedule.schedule_id).first()
+    user = db.query(User).filter(User.id == schedule.user_id).one()
+    db.rollback()
+
+    return [
+        ("crud.user.get_user_by_email", lambda db: crud.user.get_user_by_email(db, email=user.email)),
+        ("crud.refresh_token.get_refresh_token_by_hash", lambda db: crud.refresh_token.get_refresh_token_by_hash(db, "not-a-token")),
+        ("crud.schedule.get_schedules_by_user", lambda db: crud.schedule.get_schedules_by_user(db, user_id=user.id)),
+        ("crud.schedule.get_schedule", lambda db: crud.schedule.get_schedule(db, schedule_id=schedule.schedule_id)),
+        ("crud.eco_action.get_eco_actions_by_category", lambda db: crud.eco_action.get_eco_actions_by_category(db, schedule.category_id)),
+        ("crud.eco_action_achievement.get_achievements_by_schedule",
+         lambda db: crud.eco_action_achievement.get_achievements_by_schedule(db, schedule_id=schedule.schedule_id)),
+        ("crud.eco_action_achievement.get_achievement_by_schedule_and_action",
+         lambda db: crud.eco_action_achievement.get_achievement_by_schedule_and_action(
+             db, schedule_id=schedule.schedule_id, eco_action_id=achievement.eco_action_id)),
+        ("crud.helper.schedule_helper.update_achievements_by_update_schedule",
+         lambda db: update_achievements_by_update_schedule(db, crud.schedule.get_schedule(db, schedule.schedule_id))),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="実行前に件数の多いデータを投入する")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("このスクリプトはPostgresに対してのみ実行できます。")
+        sys.exit(2)
+
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db)
+
+        problems = []
+        for name, fn in build_checks(db):
+            print(f"=== {name} ===")
+            for statement, parameters in capture_queries(db, fn):
+                plan = explain(db, statement, parameters)
+                print(statement.strip())
+                print("\n".join(f"    {line}" for line in plan))
+                for line in plan:
+                    if "Seq Scan" in line and any(f" on {table} " in f"{line} " for table in HOT_TABLES):
+                        problems.append(f"{name}: {line.strip()}")
+            print()
+
+        if problems:
+            print("⚠️ 大きいテーブルでSeq Scanになっているクエリがあります:")
+            print("\n".join(f"  {problem}" for problem in problems))
+            sys.exit(1)
+        print("✅ すべてのクエリでインデックスが使われています。")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
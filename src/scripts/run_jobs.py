@@ -0,0 +1,25 @@
+"""
+バックグラウンドジョブのワーカーを、APIサーバーとは別のプロセスとして起動するスクリプト
+
+APIサーバー側ではJOB_WORKER_CONCURRENCY=0にして、ジョブをこのプロセスだけで実行することもできる。
+
+実行例:
+    docker-compose exec app python -m scripts.run_jobs --concurrency 4
+"""
+import argparse
+import asyncio
+
+from config import settings
+import main  # noqa: F401 モデル・イベントリスナー・ジョブの種類を登録する
+from core.jobs import job_runner
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=max(settings.JOB_WORKER_CONCURRENCY, 1))
+    args = parser.parse_args()
+
+    print(f"Starting {args.concurrency} job workers...")
+    try:
+        asyncio.run(job_runner.run(concurrency=args.concurrency))
+    except KeyboardInterrupt:
+        pass
@@ -74,10 +74,10 @@ def test_google_auth_link_to_existing_email(client, mocker, db_session: Session)
 
 def test_google_auth_invalid_token(client, mocker, db_session: Session):
     """異常系: 無効なトークンが送られてきたケース"""
-    # モックの設定: verify_oauth2_token が ValueError を発生させるようにする
+    # モックの設定: google_verifier.verify_async が ValueError を発生させるようにする
     error_message = "Token is expired or invalid"
     mocker.patch(
-        "google.oauth2.id_token.verify_oauth2_token",
+        "core.google_verifier.GoogleIdTokenVerifier.verify_async",
         side_effect=ValueError(error_message)
     )
 
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from core.google_verifier import GoogleIdTokenVerifier
+
+CLIENT_ID = "test-client-id.apps.googleusercontent.com"
+KEY_ID = "test-key-id"
+MAX_AGE = 120
+
+def create_signing_key() -> tuple[str, str]:
+    """RSA鍵と自己署名証明書を作成し、(秘密鍵PEM, 証明書PEM)を返す"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return private_pem, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return create_signing_key()
+
+@pytest.fixture()
+def certs_server(signing_key):
+    """Googleの証明書エンドポイントの代わりになるローカルサーバー"""
+    _, certificate_pem = signing_key
+    requests_log = []
+
+    class CertsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_log.append(self.path)
+            body = json.dumps({KEY_ID: certificate_pem}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", f"public, max-age={MAX_AGE}, must-revalidate, no-transform")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), CertsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/oauth2/v1/certs", requests_log
+
+    server.shutdown()
+    server.server_close()
+
+def create_id_token(private_pem: str, **overrides) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "google-user-1",
+        "email": "google.user@example.com",
+        "iat": now,
+        "exp": now + 3600,
+        **overrides,
+    }
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    return google_jwt.encode(signer, payload).decode()
+
+def test_verify_uses_cached_certificates(signing_key, certs_server):
+    """証明書は同時に検証しても一度だけ取得され、以降の検証はネットワークI/Oなしで行われることを確認"""
+    private_pem, _ = signing_key
+    certs_url, requests_log = certs_server
+    verifier = GoogleIdTokenVerifier(certs_url=certs_url)
+
+    async def verify_concurrently():
+        return await asyncio.gather(*(
+            verifier.verify_async(create_id_token(private_pem, sub=f"google-user-{i}"), CLIENT_ID)
+            for i in range(5)
+        ))
+
+    results = asyncio.run(verify_concurrently())
+    later = verifier.verify(create_id_token(private_pem, sub="google-user-9"), CLIENT_ID)
+
+    assert [idinfo["sub"] for idinfo in results] == [f"google-user-{i}" for i in range(5)]
+    assert results[0]["email"] == "google.user@example.com"
+    assert later["sub"] == "google-user-9"
+    assert len(requests_log) == 1
+
+def test_verify_without_certificates_does_not_fetch(signing_key, certs_server):
+    """同期のverifyはリクエストの処理中に証明書を取得せず、ValueErrorにすることを確認"""
+    private_pem, _ = signing_key
+    certs_url, requests_log = certs_server
+    verifier = GoogleIdTokenVerifier(certs_url=certs_url)
+
+    with pytest.raises(ValueError):
+        verifier.verify(create_id_token(private_pem), CLIENT_ID)
+    assert requests_log == []
+
+def test_refresh_follows_cache_headers(certs_server):
+    """Cache-Controlのmax-ageに従って証明書の有効期限が決まることを確認"""
+    certs_url, _ = certs_server
+    verifier = GoogleIdTokenVerifier(certs_url=certs_url)
+
+    before = time.time()
+    verifier.refresh_certs()
+
+    assert before + MAX_AGE - 1 <= verifier.expires_at <= time.time() + MAX_AGE
+
+def test_verify_rejects_invalid_tokens(signing_key, certs_server):
+    """aud・iss・有効期限が不正なトークンはValueErrorになることを確認"""
+    private_pem, _ = signing_key
+    certs_url, _ = certs_server
+    verifier = GoogleIdTokenVerifier(certs_url=certs_url)
+    verifier.refresh_certs()
+
+    with pytest.raises(ValueError):
+        verifier.verify(create_id_token(private_pem, aud="another-client"), CLIENT_ID)
+
+    with pytest.raises(ValueError):
+        verifier.verify(create_id_token(private_pem, iss="https://evil.example.com"), CLIENT_ID)
+
+    with pytest.raises(ValueError):
+        verifier.verify(create_id_token(private_pem, iat=0, exp=1), CLIENT_ID)
+
+    # 別の鍵で署名されたトークン
+    another_private_pem, _ = create_signing_key()
+    with pytest.raises(ValueError):
+        verifier.verify(create_id_token(another_private_pem), CLIENT_ID)
@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+
+from core.hashing import PasswordHashingService, HashingQueueFullError
+from core.security import get_password_hash, verify_password
+
+PASSWORD = "password123"
+
+def test_hash_and_verify_in_process_pool():
+    """プロセスプールでハッシュ化・検証ができ、待ち時間と計算時間が記録されることを確認"""
+    service = PasswordHashingService(max_workers=1, max_queue_depth=4)
+
+    async def scenario():
+        hashed = await service.run(get_password_hash, PASSWORD)
+        return hashed, await service.run(verify_password, PASSWORD, hashed)
+
+    try:
+        hashed, verified = asyncio.run(scenario())
+    finally:
+        service.shutdown()
+
+    assert hashed != PASSWORD
+    assert verified is True
+
+    stats = service.stats()
+    assert stats["completed"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["hash_seconds_total"] > 0
+    assert stats["queue_wait_seconds_max"] >= 0
+
+def test_rejects_when_queue_is_full():
+    """待ち行列が上限に達している場合はHashingQueueFullErrorになることを確認"""
+    service = PasswordHashingService(max_workers=0, max_queue_depth=1)
+
+    async def scenario():
+        first = asyncio.create_task(service.run(get_password_hash, PASSWORD))
+        await asyncio.sleep(0)  # 1件目を待ち行列に入れる
+        with pytest.raises(HashingQueueFullError):
+            await service.run(get_password_hash, PASSWORD)
+        return await first
+
+    assert asyncio.run(scenario()) != PASSWORD
+    assert service.stats()["rejected"] == 1
@@ -1,10 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 from datetime import datetime, timedelta, timezone
 
 from models.user import User, RefreshToken
+import crud.refresh_token
 import crud.user
 import schemas.user
 import core.security, core.token
@@ -155,4 +156,241 @@ def test_refresh_with_revoked_token(client: TestClient, db_session: Session, cre
 
     # 3. アサーション
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
-    assert "Invalid refresh token" in response.json()["detail"]
\ No newline at end of file
+    assert "Invalid refresh token" in response.json()["detail"]
+def test_refresh_rehashes_legacy_bcrypt_token(client: TestClient, db_session: Session, created_user: User):
+    """
+    移行: bcryptで保存された既存トークンは初回利用時にHMACダイジェストへ置き換えられることを確認
+    """
+    # 1. 移行前の形式(bcrypt)でトークンをDBに直接作成
+    plain_token = core.token.create_refresh_token()
+    legacy_hashed_token = core.security.pwd_context.hash(plain_token)
+
+    db_token = RefreshToken(
+        user_id=created_user.id,
+        hashed_token=legacy_hashed_token,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=30)
+    )
+    db_session.add(db_token)
+    db_session.commit()
+
+    # 2. 移行前のトークンでリフレッシュできること
+    response = client.post(
+        "/auth/refresh",
+        json={"refresh_token": plain_token, "email": created_user.email}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # 3. DB上のハッシュがHMACダイジェストに置き換わり、インデックスで検索できること
+    db_session.refresh(db_token)
+    assert db_token.hashed_token == core.security.get_refresh_token_hash(plain_token)
+    assert not core.security.refresh_token_needs_rehash(db_token.hashed_token)
+
+    # 4. 移行後は通常のトークンと同じく、発行された新しいトークンでリフレッシュできること
+    response = client.post(
+        "/auth/refresh",
+        json={"refresh_token": response.json()["refresh_token"], "email": created_user.email}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+def test_legacy_rehash_checks_only_active_legacy_tokens(db_session: Session, created_user: User, monkeypatch):
+    """
+    bcryptで照合するのは、失効・期限切れでない移行前のトークンの新しい方から上限件数までであることを確認
+    """
+    import crud.refresh_token
+    monkeypatch.setattr(core.security.settings, "LEGACY_REFRESH_TOKEN_MAX_CANDIDATES", 2)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # bcryptの照合は差し替えるので、ハッシュは移行前の形式(HMACダイジェストでない)であればよい
+    legacy_hashed_token = lambda name: f"$2b$12${name}"
+    db_session.add_all([
+        RefreshToken(user_id=created_user.id, hashed_token=legacy_hashed_token(f"active{i}"), created_at=now - timedelta(minutes=i), expires_at=now + timedelta(days=30))
+        for i in range(3)
+    ] + [
+        RefreshToken(user_id=created_user.id, hashed_token=legacy_hashed_token("revoked"), expires_at=now + timedelta(days=30), is_revoked=True),
+        RefreshToken(user_id=created_user.id, hashed_token=legacy_hashed_token("expired"), expires_at=now - timedelta(days=1)),
+        RefreshToken(user_id=created_user.id, hashed_token=core.security.get_refresh_token_hash("other"), expires_at=now + timedelta(days=30)),
+    ])
+    db_session.commit()
+
+    verified = []
+    monkeypatch.setattr(crud.refresh_token, "verify_refresh_token", lambda plain_token, hashed_token: verified.append(hashed_token) or False)
+
+    assert crud.refresh_token.rehash_legacy_refresh_token(db_session, created_user.email, "wrong-token") is None
+    assert verified == [legacy_hashed_token("active0"), legacy_hashed_token("active1")]
+    # 別のメールアドレスでは照合しない
+    assert crud.refresh_token.rehash_legacy_refresh_token(db_session, "unknown@example.com", "wrong-token") is None
+    assert len(verified) == 2
+
+def test_refresh_verifies_legacy_tokens_off_the_event_loop(client: TestClient, db_session: Session, created_user: User, monkeypatch):
+    """
+    /auth/refreshでの移行前のトークンの照合は、同期版の処理(run_syncの中)ではなくハッシュ計算用のプールで行うことを確認
+    """
+    import crud.refresh_token
+    from core.hashing import hashing_service
+
+    plain_token = core.token.create_refresh_token()
+    db_session.add(RefreshToken(
+        user_id=created_user.id,
+        hashed_token=core.security.pwd_context.hash(plain_token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=30),
+    ))
+    db_session.commit()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("bcrypt must not run inside run_sync")
+    monkeypatch.setattr(crud.refresh_token, "verify_refresh_token", fail)
+    calls = []
+    original_run = hashing_service.run
+    async def run(fn, *args):
+        calls.append(fn.__name__)
+        return await original_run(fn, *args)
+    monkeypatch.setattr(hashing_service, "run", run)
+
+    response = client.post("/auth/refresh", json={"refresh_token": plain_token, "email": created_user.email})
+    assert response.status_code == status.HTTP_200_OK
+    assert calls == ["verify_refresh_token"]
+
+    # HMACダイジェストで見つかる場合はbcryptを使わない
+    response = client.post("/auth/refresh", json={"refresh_token": response.json()["refresh_token"], "email": created_user.email})
+    assert response.status_code == status.HTTP_200_OK
+    assert calls == ["verify_refresh_token"]
+
+def login_with_device(client: TestClient, email: str, device_id: str) -> dict:
+    login_data = {"username": email, "password": TEST_USER_PASSWORD, "device_id": device_id}
+    response = client.post("/auth/login", data=login_data)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+def test_sessions_are_kept_per_device(client: TestClient, db_session: Session, created_user: User):
+    """
+    正常系: 別の端末でログインしても、先にログインした端末のリフレッシュトークンが使えることを確認
+    """
+    phone_tokens = login_with_device(client, created_user.email, "phone")
+    tablet_tokens = login_with_device(client, created_user.email, "tablet")
+    assert phone_tokens["device_id"] == "phone"
+
+    for tokens in (phone_tokens, tablet_tokens):
+        response = client.post(
+            "/auth/refresh",
+            json={"email": created_user.email, "refresh_token": tokens["refresh_token"]}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    headers = {"Authorization": f"Bearer {tablet_tokens['access_token']}"}
+    sessions = client.get("/users/me/sessions", headers=headers).json()
+    assert {session["device_id"] for session in sessions} == {"phone", "tablet"}
+
+def test_refresh_rotates_token_and_detects_reuse(client: TestClient, db_session: Session, created_user: User):
+    """
+    異常系: ローテーション済みのトークンが再利用されると、その端末のセッションが失効することを確認
+    """
+    tokens = login_with_device(client, created_user.email, "phone")
+
+    # 1. リフレッシュすると新しいトークンが発行される
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    rotated_refresh_token = response.json()["refresh_token"]
+    assert rotated_refresh_token != tokens["refresh_token"]
+
+    # 2. 古いトークンの再利用は失敗する
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # 3. 再利用を検知したので、新しいトークンも失効している
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": rotated_refresh_token}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_concurrent_refresh_with_same_token_is_treated_as_reuse(client: TestClient, db_session: Session, created_user: User):
+    """
+    異常系: 同じトークンで同時にリフレッシュされた場合、後から確定した方は再利用として扱われることを確認
+    """
+    tokens = login_with_device(client, created_user.email, "phone")
+
+    # 2つのリクエストが、どちらもまだ失効していない状態のトークンを読み込んだ
+    make_session = sessionmaker(bind=db_session.get_bind())
+    first_session, second_session = make_session(), make_session()
+    try:
+        first = crud.refresh_token._find_refresh_token(first_session, created_user.email, tokens["refresh_token"])
+        second = crud.refresh_token._find_refresh_token(second_session, created_user.email, tokens["refresh_token"])
+        assert not first.is_revoked and not second.is_revoked
+
+        rotated = crud.refresh_token.rotate_found_refresh_token(first_session, first)
+        assert rotated is not None
+        assert crud.refresh_token.rotate_found_refresh_token(second_session, second) is None
+    finally:
+        first_session.close()
+        second_session.close()
+
+    # 先に発行された新しいトークンも失効し、端末に有効なトークンは残らない
+    db_session.expire_all()
+    assert crud.refresh_token.get_active_refresh_tokens(db_session, user_id=created_user.id) == []
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": rotated[1]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_revoke_single_device_and_all_devices(client: TestClient, db_session: Session, created_user: User):
+    """
+    正常系: 端末単位・全端末のセッション失効ができることを確認
+    """
+    phone_tokens = login_with_device(client, created_user.email, "phone")
+    tablet_tokens = login_with_device(client, created_user.email, "tablet")
+    headers = {"Authorization": f"Bearer {phone_tokens['access_token']}"}
+
+    # 1. タブレットのみ失効させる
+    response = client.delete("/users/me/sessions/tablet", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": tablet_tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # 2. 全端末を失効させる
+    response = client.delete("/users/me/sessions", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.post(
+        "/auth/refresh",
+        json={"email": created_user.email, "refresh_token": phone_tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_sweeper_deletes_expired_and_revoked_tokens(db_session: Session, created_user: User):
+    """
+    正常系: 期限切れ・保持期間を過ぎた失効済みトークンがバッチで削除され、有効なトークンは残ることを確認
+    """
+    from crud.refresh_token import delete_stale_refresh_tokens
+
+    now = datetime.utcnow()
+    active_token = RefreshToken(user_id=created_user.id, hashed_token="active", expires_at=now + timedelta(days=30))
+    recently_revoked_token = RefreshToken(
+        user_id=created_user.id, hashed_token="recently-revoked", expires_at=now + timedelta(days=30),
+        is_revoked=True, revoked_at=now
+    )
+    stale_tokens = [
+        RefreshToken(user_id=created_user.id, hashed_token=f"expired-{i}", expires_at=now - timedelta(days=1))
+        for i in range(3)
+    ] + [
+        RefreshToken(
+            user_id=created_user.id, hashed_token="revoked", expires_at=now + timedelta(days=30),
+            is_revoked=True, revoked_at=now - timedelta(days=30)
+        )
+    ]
+    db_session.add_all([active_token, recently_revoked_token, *stale_tokens])
+    db_session.commit()
+
+    assert delete_stale_refresh_tokens(db_session, batch_size=2) == 4
+
+    remaining = {token.hashed_token for token in db_session.query(RefreshToken).all()}
+    assert remaining == {"active", "recently-revoked"}
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from fastapi import status
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from core.auth import get_current_user
+from core.principal_cache import PrincipalCache, principal_cache
+from core.token import create_access_token
+from db.session import to_async_url
+from models.user import User as UserModel, UserCredential
+
+def test_current_user_is_served_from_cache(client, db_session: Session, test_user: UserModel, authorization_header: dict):
+    """2回目以降の認証はキャッシュから返されることを確認"""
+    principal_cache.clear()
+    hits_before = principal_cache.hits
+    misses_before = principal_cache.misses
+
+    first = client.get("/users/me", headers=authorization_header)
+    second = client.get("/users/me", headers=authorization_header)
+
+    assert first.status_code == status.HTTP_200_OK
+    assert second.status_code == status.HTTP_200_OK
+    assert second.json() == first.json()
+    # 認証情報もキャッシュから復元されていること
+    assert second.json()["credential"]["user_id"] == str(test_user.id)
+
+    assert principal_cache.misses - misses_before == 1
+    assert principal_cache.hits - hits_before == 1
+
+def test_cache_is_invalidated_when_user_changes(client, db_session: Session, test_user: UserModel, authorization_header: dict):
+    """is_activeが変更されるとキャッシュが破棄されることを確認"""
+    client.get("/users/me", headers=authorization_header)
+    assert principal_cache.stats()["size"] == 1
+
+    user = db_session.query(UserModel).filter(UserModel.id == test_user.id).first()
+    user.is_active = False
+    db_session.commit()
+
+    assert principal_cache.stats()["size"] == 0
+    response = client.get("/users/me", headers=authorization_header)
+    assert response.json()["is_active"] is False
+
+def test_cache_evicts_least_recently_used_and_expired_entries(db_session: Session, test_user: UserModel, another_user: UserModel):
+    """件数上限ではLRUで、TTL経過では期限切れで破棄されることを確認"""
+    cache = PrincipalCache(ttl_seconds=60, max_size=1)
+    cache.set(test_user)
+    cache.set(another_user)
+
+    assert cache.get(db_session, test_user.email) is None
+    assert cache.get(db_session, another_user.email).id == another_user.id
+    assert cache.stats()["evictions"] == 1
+
+    expired_cache = PrincipalCache(ttl_seconds=0.01, max_size=10)
+    expired_cache.set(test_user)
+    time.sleep(0.02)
+    assert expired_cache.get(db_session, test_user.email) is None
+
+def test_cached_principal_columns_are_readable_in_async_session(db_session: Session, test_user: UserModel):
+    """キャッシュから返したユーザーの全カラムを、非同期セッションで遅延ロードなしに読めることを確認"""
+    principal_cache.clear()
+    token = create_access_token(data={"sub": test_user.email})
+    async_engine = create_async_engine(to_async_url(db_session.bind.url.render_as_string()), poolclass=NullPool)
+
+    async def read_all_columns():
+        values = []
+        for _ in range(2):  # 1回目はDBから読み込んでキャッシュし、2回目はキャッシュから返す
+            async with async_sessionmaker(bind=async_engine, expire_on_commit=False)() as db:
+                user = await get_current_user(token=token, db=db)
+                values.append((
+                    {attr.key: getattr(user, attr.key) for attr in inspect(UserModel).column_attrs},
+                    {attr.key: getattr(user.credential, attr.key) for attr in inspect(UserCredential).column_attrs},
+                ))
+        return values
+
+    from_db, from_cache = asyncio.run(read_all_columns())
+    asyncio.run(async_engine.dispose())
+
+    assert principal_cache.hits >= 1
+    assert from_cache == from_db
+    assert "data_version" in from_cache[0]
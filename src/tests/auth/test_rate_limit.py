@@ -0,0 +1,117 @@
+import asyncio
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import crud.user
+from core.rate_limit import MemoryRateLimitBackend, RateLimit, rate_limiter
+from main import app
+
+TEST_USER_PASSWORD = "password123"
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time():
+    # バケットの容量まで許可し、時間の経過に応じてトークンが回復することを確認
+    clock = _FakeClock()
+    backend = MemoryRateLimitBackend(max_keys=100, clock=clock)
+    limit = RateLimit(capacity=3, refill_per_second=0.5)
+
+    async def consume():
+        return await backend.consume("login:ip:1.2.3.4", limit)
+
+    assert [asyncio.run(consume()) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 容量を使い切ると、1トークン回復するまでの秒数が返る
+    assert asyncio.run(consume()) == 2.0
+
+    clock.now += 2
+    assert asyncio.run(consume()) == 0.0
+    assert asyncio.run(consume()) > 0
+
+
+def test_memory_backend_evicts_least_recently_used_keys():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    limit = RateLimit(capacity=1, refill_per_second=0.001)
+
+    asyncio.run(backend.consume("a", limit))
+    asyncio.run(backend.consume("b", limit))
+    asyncio.run(backend.consume("c", limit))
+
+    assert list(backend._buckets) == ["b", "c"]
+
+
+def test_login_is_throttled_per_email(client, db_session: Session, monkeypatch):
+    # 同じメールアドレスへのログイン試行が上限を超えると429とRetry-Afterが返ることを確認
+    monkeypatch.setattr(rate_limiter, "email_limit", RateLimit(capacity=3, refill_per_second=0.1))
+
+    login_data = {"username": "victim@example.com", "password": "wrongpassword"}
+    for _ in range(3):
+        response = client.post("/auth/login", data=login_data)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post("/auth/login", data=login_data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # 別のメールアドレスは制限されない
+    response = client.post("/auth/login", data={"username": "other@example.com", "password": "wrongpassword"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_signup_is_throttled_per_ip(client, db_session: Session, monkeypatch):
+    # メールアドレスを変えても、同じIPアドレスからの登録は上限で止まることを確認
+    monkeypatch.setattr(rate_limiter, "ip_limit", RateLimit(capacity=2, refill_per_second=0.01))
+
+    for i in range(2):
+        response = client.post("/users/create", json={"email": f"user{i}@example.com", "password": TEST_USER_PASSWORD})
+        assert response.status_code == status.HTTP_201_CREATED
+
+    response = client.post("/users/create", json={"email": "user2@example.com", "password": TEST_USER_PASSWORD})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) == 100
+
+    # 制限されたリクエストではユーザーを作成しない
+    assert crud.user.get_user_by_email(db_session, email="user2@example.com") is None
+
+    # エンドポイントごとにバケットは別なので、リフレッシュは制限されない
+    response = client.post("/auth/refresh", json={"refresh_token": "dummy", "email": "user2@example.com"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_spoofed_forwarded_for_does_not_bypass_ip_limit(client, db_session: Session, monkeypatch):
+    # 信頼するプロキシ以外からのX-Forwarded-Forは無視され、接続元のアドレスで制限されることを確認
+    monkeypatch.setattr(rate_limiter, "ip_limit", RateLimit(capacity=2, refill_per_second=0.01))
+
+    login_data = {"username": "victim@example.com", "password": "wrongpassword"}
+    for i in range(2):
+        response = client.post("/auth/login", data=login_data, headers={"X-Forwarded-For": f"10.0.0.{i}"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post("/auth/login", data=login_data, headers={"X-Forwarded-For": "10.0.0.99"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def test_trusted_proxy_forwarded_for_selects_ip_bucket(db_session: Session, monkeypatch):
+    # 信頼するプロキシ(FORWARDED_ALLOW_IPSの既定値127.0.0.1)経由の場合は、X-Forwarded-Forのアドレスごとに制限されることを確認
+    monkeypatch.setattr(rate_limiter, "ip_limit", RateLimit(capacity=2, refill_per_second=0.01))
+    proxy = TestClient(app, client=("127.0.0.1", 50000))
+
+    login_data = {"username": "victim@example.com", "password": "wrongpassword"}
+    for _ in range(2):
+        response = proxy.post("/auth/login", data=login_data, headers={"X-Forwarded-For": "203.0.113.1"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = proxy.post("/auth/login", data=login_data, headers={"X-Forwarded-For": "203.0.113.1"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    # 別のクライアントは同じプロキシ経由でも別のバケットになる
+    response = proxy.post("/auth/login", data=login_data, headers={"X-Forwarded-For": "203.0.113.2"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
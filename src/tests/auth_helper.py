@@ -55,14 +55,14 @@ class mock_user_info(TypeError):
     name: str
 
 def setup_mock(mocker, email="new.user@example.com", name="New User") -> mock_user_info:
-    # モックの設定: id_token.verify_oauth2_token が返す値を定義
+    # モックの設定: google_verifier.verify_async が返す値を定義
     mock_user_info = {
         "sub": "test_google_id_123",
         "email": email,
         "name": name
     }
     mocker.patch(
-        "google.oauth2.id_token.verify_oauth2_token",
+        "core.google_verifier.GoogleIdTokenVerifier.verify_async",
         return_value=mock_user_info
     )
 
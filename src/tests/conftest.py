@@ -1,29 +1,58 @@
+import os
+import tempfile
 import uuid
+from contextlib import contextmanager
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from main import app
-from db.session import Base, get_db
+from db.session import Base, get_db, get_async_db, get_read_db, get_async_read_db
 from models.category import Category
 from models.eco_action import EcoAction as EcoActionModel
 from models.overall_statistics import OverallStats as OverallStatsModel
 from tests.auth_helper import user_create_and_get_user
 from models.user import User as UserModel
+from core.principal_cache import principal_cache
+from core.master_data import master_data_cache
+from core.rate_limit import rate_limiter
+from db.routing import recent_writes
+from config import settings
+
+# テスト中はバックグラウンドでジョブ(メールの送信等)を実行しない(core.jobs.run_next_job等をテストから呼び出す)
+settings.JOB_WORKER_CONCURRENCY = 0
+# Googleの証明書も取得しない(検証はモックするか、テスト用の証明書サーバーを使う)
+settings.GOOGLE_CERTS_REFRESH_ENABLED = False
 
 # テスト用のデータベース設定
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:" # インメモリのSQLiteを使用
+# 同期と非同期のエンジンで同じデータベースを使うため、一時ファイルのSQLiteを使用
+SQLALCHEMY_DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLALCHEMY_DATABASE_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{SQLALCHEMY_DATABASE_PATH}"
 
 engine = create_engine(
   SQLALCHEMY_DATABASE_URL,
   connect_args={"check_same_thread": False}, # SQLiteで必要
-  poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同期エンジンの接続はイベントループをまたいで使えないので、プールせずに毎回接続する
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+# SQLiteは接続ごとに外部キー制約を有効にする必要がある(ON DELETE CASCADEをPostgresと同じように動かすため)
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+  cursor = dbapi_connection.cursor()
+  cursor.execute("PRAGMA foreign_keys=ON")
+  cursor.close()
+
+for target in (engine, async_engine.sync_engine):
+  event.listen(target, "connect", enable_sqlite_foreign_keys)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # --- テスト用のDBセッションでDIをオーバーライド ---
 def override_get_db():
   """テスト用のDBセッションを提供する"""
@@ -33,16 +62,58 @@ def override_get_db():
   finally:
     db.close()
         
+async def override_get_async_db():
+  """テスト用の非同期DBセッションを提供する"""
+  async with TestingAsyncSessionLocal() as db:
+    yield db
+
 # get_db依存関係をテスト用の物に置き換える
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
 
 @pytest.fixture(scope="function")
 def db_session():
   # テストケースごとにテーブルを初期化し、セッションを提供するfixture
   Base.metadata.create_all(bind=engine) # テーブル作成
+  principal_cache.clear() # テーブルを作り直すので、前のテストのユーザーキャッシュを捨てる
+  master_data_cache.clear()
+  rate_limiter.reset() # 前のテストのリクエストをレート制限に数えない
+  recent_writes.clear()
   yield TestingSessionLocal() # セッションを提供
   Base.metadata.drop_all(bind=engine) # テーブル削除
     
+class QueryCounter:
+  """テスト用のDBに発行されたSQLを記録する"""
+
+  def __init__(self):
+    self.statements: list[str] = []
+
+  def record(self, conn, cursor, statement, parameters, context, executemany):
+    self.statements.append(statement)
+
+  @contextmanager
+  def limit(self, max_queries: int):
+    """ブロック内で発行されたSQLがmax_queries件以下であることを確認する"""
+    start = len(self.statements)
+    yield
+    issued = self.statements[start:]
+    assert len(issued) <= max_queries, (
+      f"{len(issued)} queries were issued (max {max_queries}):\n" + "\n".join(issued)
+    )
+
+@pytest.fixture(scope="function")
+def query_counter(db_session):
+  """同期・非同期のエンジンで発行されたSQLを数えるfixture"""
+  counter = QueryCounter()
+  engines = (engine, async_engine.sync_engine)
+  for target in engines:
+    event.listen(target, "before_cursor_execute", counter.record)
+  yield counter
+  for target in engines:
+    event.remove(target, "before_cursor_execute", counter.record)
+
 @pytest.fixture(scope="module")
 def client():
   # テスト用のAPIクライアントを提供するfixture
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+import crud.aio.schedule
+from db.session import get_db, get_read_db, to_async_url
+from main import app
+from models.schedule import Schedule
+
+
+def test_to_async_url_switches_driver():
+    # 同期ドライバのURLから、同じデータベースを指す非同期ドライバのURLを作ることを確認
+    assert to_async_url("postgresql://user:pass@db:5432/app") == "postgresql+asyncpg://user:pass@db:5432/app"
+    assert to_async_url("postgresql+psycopg2://user:pass@db/app") == "postgresql+asyncpg://user:pass@db/app"
+    assert to_async_url("sqlite:////tmp/app.db") == "sqlite+aiosqlite:////tmp/app.db"
+
+
+def _dependency_calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from _dependency_calls(dependency)
+
+
+def test_async_endpoints_do_not_use_sync_sessions():
+    # async defのエンドポイントで同期セッションを使うと、クエリの間イベントループが止まるので使わない
+    # (同期セッションが必要な場合はdefのエンドポイントにしてスレッドプールで実行する)
+    blocking = [
+        route.path for route in app.routes
+        if isinstance(route, APIRoute) and asyncio.iscoroutinefunction(route.endpoint)
+        and {get_db, get_read_db} & set(_dependency_calls(route.dependant))
+    ]
+    assert blocking == []
+
+
+def test_async_schedule_query_loads_response_relationships(db_session: Session, test_user, seed_eco_actions):
+    # 非同期セッションを閉じた後でも、レスポンスに必要なrelationshipを参照できることを確認
+    category_id = seed_eco_actions[0].category_id
+    start = datetime(2025, 1, 1, 9, 0)
+    db_session.add(Schedule(
+        title="ゴミ出し", start_schedule=start, end_schedule=start + timedelta(hours=1),
+        user_id=test_user.id, category_id=category_id,
+    ))
+    db_session.commit()
+
+    # テスト用DBと同じファイルを非同期ドライバで開く
+    async_engine = create_async_engine(to_async_url(db_session.bind.url.render_as_string()), poolclass=NullPool)
+
+    async def load():
+        async with async_sessionmaker(bind=async_engine, expire_on_commit=False)() as db:
+            return await crud.aio.schedule.get_schedules_by_user(db, user_id=test_user.id)
+
+    schedules = asyncio.run(load())
+
+    assert len(schedules) == 1
+    assert schedules[0].category.category_id == category_id
+    assert schedules[0].eco_action_achievements == []
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.push import push_hub
+from db.routing import RoutingSession, current_principal_id, recent_writes, replica_key, replica_lags
+from db.session import Base
+from models.category import Category
+
+
+@pytest.fixture
+def routed_sessionmaker(monkeypatch):
+    # 遅延の確認は個別のテストで有効にする
+    monkeypatch.setattr("config.settings.REPLICA_MAX_LAG_SECONDS", 0.0)
+    # プライマリとレプリカに見立てた2つのデータベースを用意し、
+    # どちらから読んだか分かるように別々のカテゴリを入れておく
+    directory = tempfile.mkdtemp()
+    primary = create_engine(f"sqlite:///{os.path.join(directory, 'primary.db')}")
+    replica = create_engine(f"sqlite:///{os.path.join(directory, 'replica.db')}")
+    for engine, name in ((primary, "primary"), (replica, "replica")):
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add(Category(category_id=uuid.uuid4(), category_name=name))
+            db.commit()
+
+    recent_writes.clear()
+    yield sessionmaker(class_=RoutingSession, bind=primary, replicas=[replica]), replica
+
+    recent_writes.clear()
+    replica_lags.clear()
+    primary.dispose()
+    replica.dispose()
+
+
+def _category_names(db) -> list[str]:
+    return sorted(category.category_name for category in db.query(Category).all())
+
+
+def test_read_only_session_reads_from_replica(routed_sessionmaker):
+    make_session, _ = routed_sessionmaker
+
+    with make_session(info={"read_only": True}) as db:
+        assert _category_names(db) == ["replica"]
+
+    # 通常のセッションはプライマリを使う
+    with make_session() as db:
+        assert _category_names(db) == ["primary"]
+
+
+def test_writes_stay_on_primary(routed_sessionmaker):
+    make_session, _ = routed_sessionmaker
+    token = current_principal_id.set("user-1")
+    try:
+        with make_session(info={"read_only": True}) as db:
+            db.add(Category(category_id=uuid.uuid4(), category_name="new"))
+            db.commit()
+            # 書き込んだ後は、同じセッションの読み込みもプライマリで行う
+            assert _category_names(db) == ["new", "primary"]
+
+        # 直近に書き込んだユーザーの読み込みは、別のセッションでもプライマリで行う
+        with make_session(info={"read_only": True}) as db:
+            assert _category_names(db) == ["new", "primary"]
+    finally:
+        current_principal_id.reset(token)
+
+    # 他のユーザーはレプリカから読み込む
+    token = current_principal_id.set("user-2")
+    try:
+        with make_session(info={"read_only": True}) as db:
+            assert _category_names(db) == ["replica"]
+    finally:
+        current_principal_id.reset(token)
+
+
+def test_lagging_replica_falls_back_to_primary(routed_sessionmaker, monkeypatch):
+    make_session, replica = routed_sessionmaker
+    monkeypatch.setattr("config.settings.REPLICA_MAX_LAG_SECONDS", 1.0)
+
+    # 遅延を計測できていないレプリカは使わない
+    with make_session(info={"read_only": True}) as db:
+        assert _category_names(db) == ["primary"]
+
+    replica_lags[replica_key(replica)] = 3.0
+    with make_session(info={"read_only": True}) as db:
+        assert _category_names(db) == ["primary"]
+
+    replica_lags[replica_key(replica)] = 0.2
+    with make_session(info={"read_only": True}) as db:
+        assert _category_names(db) == ["replica"]
+
+
+def test_write_on_another_worker_keeps_reads_on_primary(routed_sessionmaker):
+    make_session, _ = routed_sessionmaker
+    user_id = uuid.uuid4()
+
+    # 別のワーカーでの書き込みの通知を受け取ったら、そのユーザーの読み込みはプライマリで行う
+    push_hub.receive(json.dumps([{"type": "user_data", "user_id": str(user_id), "data_version": 1}]))
+
+    token = current_principal_id.set(user_id)
+    try:
+        with make_session(info={"read_only": True}) as db:
+            assert _category_names(db) == ["primary"]
+    finally:
+        current_principal_id.reset(token)
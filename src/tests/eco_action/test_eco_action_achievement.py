@@ -122,4 +122,78 @@ def test_update_achievement_status_forbidden(
     # Assert
     # -------------------------------------------
     assert response.status_code == 403
-    assert response.json()["detail"] == "Not authorized for this schedule"
\ No newline at end of file
+    assert response.json()["detail"] == "Not authorized for this schedule"
+
+def _create_schedule_with_achievements(db_session: Session, user_id, category, eco_actions) -> ScheduleModel:
+    schedule = ScheduleModel(
+        title="Bulk Schedule",
+        user_id=user_id,
+        category_id=category.category_id,
+        start_schedule=datetime.fromisoformat("2025-10-01T10:00:00"),
+        end_schedule=datetime.fromisoformat("2025-10-01T11:00:00")
+    )
+    db_session.add(schedule)
+    db_session.flush()
+    db_session.add_all(
+        EcoActionAchievement(schedule_id=schedule.schedule_id, eco_action_id=eco_action.eco_action_id, is_completed=False)
+        for eco_action in eco_actions if eco_action.category_id == category.category_id
+    )
+    db_session.commit()
+    return schedule
+
+def test_bulk_update_achievement_status(
+    client, db_session: Session, test_user: UserModel, authorization_header: dict,
+    seed_categories: list, seed_eco_actions: list, query_counter
+):
+    """正常系: 複数の達成記録の状態を1回のリクエストでまとめて更新できることを確認"""
+    idou_category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    idou_actions = [a for a in seed_eco_actions if a.category_id == idou_category.category_id]
+    schedules = [_create_schedule_with_achievements(db_session, test_user.id, idou_category, seed_eco_actions) for _ in range(3)]
+    updates = [
+        {"schedule_id": str(schedule.schedule_id), "eco_action_id": str(action.eco_action_id), "is_completed": True}
+        for schedule in schedules for action in idou_actions
+    ]
+    # 同じ達成記録への更新は後のものが優先される
+    updates.append({**updates[0], "is_completed": False})
+
+    # 認証(2) + 所有者の確認 + ユーザーの変更番号の更新 + 一括UPDATE + スケジュールの変更番号の記録
+    with query_counter.limit(6):
+        response = client.patch("/achievements/status/bulk", json={"updates": updates}, headers=authorization_header)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 6
+    assert [achievement["is_completed"] for achievement in data] == [False] + [True] * 5
+
+    db_session.expire_all()
+    achievements = db_session.query(EcoActionAchievement).all()
+    assert sum(achievement.is_completed for achievement in achievements) == 5
+    assert all((achievement.achieved_at is not None) == achievement.is_completed for achievement in achievements)
+
+def test_bulk_update_achievement_status_rejects_other_users_schedule(
+    client, db_session: Session, test_user: UserModel, another_user: UserModel, authorization_header: dict,
+    seed_categories: list, seed_eco_actions: list
+):
+    """異常系: 他のユーザーのスケジュールや存在しない達成記録が含まれる場合は、何も更新しないことを確認"""
+    idou_category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    action = next(a for a in seed_eco_actions if a.category_id == idou_category.category_id)
+    own = _create_schedule_with_achievements(db_session, test_user.id, idou_category, seed_eco_actions)
+    others = _create_schedule_with_achievements(db_session, another_user.id, idou_category, seed_eco_actions)
+    own_update = {"schedule_id": str(own.schedule_id), "eco_action_id": str(action.eco_action_id), "is_completed": True}
+
+    response = client.patch(
+        "/achievements/status/bulk",
+        json={"updates": [own_update, {**own_update, "schedule_id": str(others.schedule_id)}]},
+        headers=authorization_header,
+    )
+    assert response.status_code == 403
+
+    response = client.patch(
+        "/achievements/status/bulk",
+        json={"updates": [own_update, {**own_update, "eco_action_id": str(uuid.uuid4())}]},
+        headers=authorization_header,
+    )
+    assert response.status_code == 404
+
+    db_session.expire_all()
+    assert not any(achievement.is_completed for achievement in db_session.query(EcoActionAchievement).all())
@@ -0,0 +1,62 @@
+from sqlalchemy.orm import Session
+
+from core.master_data import master_data_cache
+from models.category import Category
+from models.eco_action import EcoAction
+
+
+def test_master_data_endpoints(client, authorization_header, seed_categories: list, seed_eco_actions: list):
+    """/categoriesと/eco_actionsがDBの内容を返すことを確認"""
+    response = client.get("/categories", headers=authorization_header)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert sorted(category["category_name"] for category in response.json()) == sorted(
+        category.category_name for category in seed_categories
+    )
+
+    response = client.get("/eco_actions", headers=authorization_header)
+    assert response.status_code == 200
+    eco_actions = {eco_action["eco_action_id"]: eco_action for eco_action in response.json()}
+    assert len(eco_actions) == len(seed_eco_actions)
+    for seed in seed_eco_actions:
+        eco_action = eco_actions[str(seed.eco_action_id)]
+        assert eco_action["content"] == seed.content
+        assert eco_action["category"]["category_id"] == str(seed.category_id)
+
+
+def test_master_data_is_served_from_cache(client, authorization_header, seed_categories: list, query_counter):
+    """2回目以降はDBを読まずにキャッシュから返すことを確認"""
+    client.get("/categories", headers=authorization_header)
+    start = len(query_counter.statements)
+
+    with query_counter.limit(2):
+        # 認証済みユーザーのキャッシュもあるので、マスターデータのためのSELECTは発行されない
+        for _ in range(3):
+            assert client.get("/categories", headers=authorization_header).status_code == 200
+    assert not any("FROM categories" in statement for statement in query_counter.statements[start:])
+
+
+def test_master_data_cache_is_invalidated_on_change(
+    client, authorization_header, db_session: Session, seed_categories: list, seed_eco_actions: list
+):
+    """カテゴリ・エコ活動を変更したら、キャッシュが破棄されて新しい内容が返ることを確認"""
+    version = master_data_cache.stats()["version"]
+    client.get("/eco_actions", headers=authorization_header)
+    assert master_data_cache.stats()["cached"] is True
+
+    category = seed_categories[0]
+    db_session.add(EcoAction(category_id=category.category_id, content="新しいエコ活動", money_saved=1, co2_reduction=0.1))
+    db_session.commit()
+
+    assert master_data_cache.stats()["version"] > version
+    contents = [eco_action["content"] for eco_action in client.get("/eco_actions", headers=authorization_header).json()]
+    assert "新しいエコ活動" in contents
+
+    # ロールバックした変更はキャッシュに残らない
+    db_session.add(Category(category_name="取り消されるカテゴリ"))
+    db_session.flush()
+    # flush中のセッションにはコミット前の内容を返すが、キャッシュには保存しない
+    assert "取り消されるカテゴリ" in [category.category_name for category in master_data_cache.get(db_session).categories]
+    db_session.rollback()
+    names = [category["category_name"] for category in client.get("/categories", headers=authorization_header).json()]
+    assert "取り消されるカテゴリ" not in names
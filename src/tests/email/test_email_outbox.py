@@ -0,0 +1,168 @@
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from fastapi import status
+from sqlalchemy.orm import Session
+
+import core.email_verification
+from core.email_outbox import SmtpTransport, dispatch_pending_emails
+from core.jobs import ensure_recurring_jobs, run_next_job
+from crud.email_outbox import enqueue_email
+from models.email_outbox import EmailOutbox
+
+TEST_USER_EMAIL = "outbox@example.com"
+TEST_USER_PASSWORD = "password123"
+
+
+class _SmtpServer:
+    """テスト用の最小限のSMTPサーバー。受け取ったメールと接続数を記録する"""
+
+    def __init__(self):
+        self.messages: list[str] = []
+        self.connections = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile("rb")
+        conn.sendall(b"220 localhost ESMTP\r\n")
+        while True:
+            line = reader.readline()
+            if not line:
+                break
+            command = line.decode().strip().upper()
+            if command.startswith("EHLO"):
+                conn.sendall(b"250 localhost\r\n")
+            elif command == "DATA":
+                conn.sendall(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                data = []
+                while (data_line := reader.readline()) != b".\r\n":
+                    data.append(data_line.decode())
+                self.messages.append("".join(data))
+                conn.sendall(b"250 OK\r\n")
+            elif command == "QUIT":
+                conn.sendall(b"221 Bye\r\n")
+                break
+            else:
+                conn.sendall(b"250 OK\r\n")
+        conn.close()
+
+
+class _RecordingTransport:
+    def __init__(self):
+        self.sent: list[str] = []
+
+    def send(self, email):
+        self.sent.append(email.to_address)
+
+    def close(self):
+        pass
+
+
+class _FailingTransport:
+    def send(self, email):
+        raise RuntimeError("temporary failure")
+
+
+def test_signup_only_enqueues_verification_email(client, db_session: Session, monkeypatch):
+    # ユーザー作成のリクエスト中にはメールを送らず、送信キューに登録するだけであることを確認
+    def fail_if_called():
+        raise AssertionError("リクエスト中にGmail APIが呼ばれました")
+    monkeypatch.setattr(core.email_verification, "get_gmail_service", fail_if_called)
+
+    response = client.post("/users/create", json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+    assert response.status_code == status.HTTP_201_CREATED
+
+    emails = db_session.query(EmailOutbox).all()
+    assert len(emails) == 1
+    assert emails[0].to_address == TEST_USER_EMAIL
+    assert emails[0].kind == core.email_verification.VERIFICATION_EMAIL_KIND
+    assert emails[0].status == "pending"
+
+    # 有効化前に再登録しても、直近の確認メールがあれば重複して登録しない
+    response = client.post("/users/create", json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert db_session.query(EmailOutbox).count() == 1
+
+
+def test_dispatch_sends_batch_over_one_smtp_connection(db_session: Session):
+    # 1回のバッチで複数のメールを送信し、SMTP接続を使い回すことを確認
+    server = _SmtpServer()
+    transport = SmtpTransport(host="127.0.0.1", port=server.port)
+    try:
+        for i in range(3):
+            enqueue_email(db_session, kind="test", to_address=f"user{i}@example.com", subject="件名", body="<p>本文</p>")
+
+        result = dispatch_pending_emails(db_session, transport, batch_size=10)
+        assert result == {"sent": 3, "failed": 0}
+
+        # 次のバッチでも同じ接続を使う
+        enqueue_email(db_session, kind="test", to_address="user3@example.com", subject="件名", body="<p>本文</p>")
+        result = dispatch_pending_emails(db_session, transport, batch_size=10)
+        assert result == {"sent": 1, "failed": 0}
+    finally:
+        transport.close()
+        server.close()
+
+    assert len(server.messages) == 4
+    assert server.connections == 1
+
+    emails = db_session.query(EmailOutbox).all()
+    assert all(email.status == "sent" and email.sent_at is not None for email in emails)
+
+
+def test_dispatch_failure_is_retried_with_backoff(db_session: Session, monkeypatch):
+    # 送信に失敗したメールは指数バックオフで再試行され、上限回数でfailedになることを確認
+    monkeypatch.setattr("config.settings.EMAIL_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr("config.settings.EMAIL_RETRY_BACKOFF_SECONDS", 10)
+
+    db_email = enqueue_email(db_session, kind="test", to_address="retry@example.com", subject="件名", body="本文")
+
+    before = datetime.utcnow()
+    assert dispatch_pending_emails(db_session, _FailingTransport()) == {"sent": 0, "failed": 1}
+    db_session.refresh(db_email)
+    assert db_email.status == "pending"
+    assert db_email.attempts == 1
+    assert db_email.last_error == "temporary failure"
+    assert db_email.next_attempt_at >= before + timedelta(seconds=10)
+
+    # 次の送信時刻になるまではバッチに含まれない
+    assert dispatch_pending_emails(db_session, _FailingTransport()) == {"sent": 0, "failed": 0}
+
+    for expected_attempts, expected_status in ((2, "pending"), (3, "failed")):
+        db_email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        dispatch_pending_emails(db_session, _FailingTransport())
+        db_session.refresh(db_email)
+        assert db_email.attempts == expected_attempts
+        assert db_email.status == expected_status
+
+
+def test_emails_are_dispatched_by_recurring_job(db_session: Session, monkeypatch):
+    # 送信キューのメールは定期実行のジョブemails.dispatchで送信されることを確認
+    transport = _RecordingTransport()
+    monkeypatch.setattr("core.job_definitions.get_shared_transport", lambda: transport)
+    enqueue_email(db_session, kind="test", to_address="job@example.com", subject="件名", body="本文")
+
+    ensure_recurring_jobs(db_session)
+    while run_next_job(db_session, worker_id="test"):
+        pass
+
+    assert transport.sent == ["job@example.com"]
+    assert db_session.query(EmailOutbox).one().status == "sent"
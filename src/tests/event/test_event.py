@@ -6,15 +6,17 @@ from models.category import Category as CategoryModel
 from models.eco_action import EcoAction as EcoActionModel
 from models.schedule import Schedule as ScheduleModel
 from models.eco_action_achievement import EcoActionAchievement
+from models.achievement_reconciliation import AchievementReconciliation
 from crud.schedule import create_schedule
 from schemas.schedule import ScheduleCreate
+from core.achievement_reconciler import process_pending_reconciliations
 
 def test_eco_action_update_triggers_achievement_reconciliation(
     db_session: Session, test_user: UserModel, seed_categories: list
 ):
     """
-    EcoActionを更新すると、SQLAlchemyイベントが発火し、
-    全スケジュールのEcoActionAchievementが再計算されることをテストする
+    EcoActionを更新すると、SQLAlchemyイベントで再計算が必要なカテゴリが登録され、
+    ワーカーがそのカテゴリのスケジュールのEcoActionAchievementを再計算することをテストする
     """
     # ===================================================================
     # 1. Arrange: テストのための複雑な初期状態をセットアップ
@@ -72,8 +74,18 @@ def test_eco_action_update_triggers_achievement_reconciliation(
     # EcoAction 2A のカテゴリを A から B に変更する
     eco_action_2A.category_id = category_B.category_id
     db_session.add(eco_action_2A)
-    db_session.commit() # このコミットでafter_updateイベントが発火する
-    print(">>> Event triggered and processed.")
+    db_session.commit() # このコミットでbefore_flushイベントが発火し、再計算が登録される
+    print(">>> Event triggered.")
+
+    # 変更前と変更後のカテゴリが登録され、コミットの時点ではまだ再計算されていない
+    queued = {r.category_id for r in db_session.query(AchievementReconciliation).all()}
+    assert queued == {category_A.category_id, category_B.category_id}
+    assert db_session.query(EcoActionAchievement).filter(EcoActionAchievement.schedule_id == schedule_A.schedule_id).count() == 2
+
+    # バックグラウンドのワーカーの処理を実行する
+    assert process_pending_reconciliations(db_session) == 2
+    assert db_session.query(AchievementReconciliation).count() == 0
+    print(">>> Reconciliation processed.")
 
 
     # ===================================================================
@@ -94,4 +106,66 @@ def test_eco_action_update_triggers_achievement_reconciliation(
     # 含まれるeco_actionのIDをセットで比較
     action_ids_in_B = {ach.eco_action_id for ach in achievements_B_after}
     expected_action_ids_in_B = {eco_action_2A.eco_action_id, eco_action_3B.eco_action_id}
-    assert action_ids_in_B == expected_action_ids_in_B
\ No newline at end of file
+    assert action_ids_in_B == expected_action_ids_in_B
+
+def test_reconciliation_touches_only_affected_categories_in_chunks(
+    db_session: Session, test_user: UserModel, seed_categories: list, monkeypatch
+):
+    """
+    エコ活動の内容だけの変更では再計算を登録せず、
+    新しいエコ活動の追加では、そのカテゴリのスケジュールだけをチャンクに分けて再計算することをテストする
+    """
+    category_A = next(c for c in seed_categories if c.category_name == '外出')
+    category_B = next(c for c in seed_categories if c.category_name == '買い物')
+    eco_action_A = EcoActionModel(content="自転車で行く", category_id=category_A.category_id)
+    db_session.add(eco_action_A)
+    db_session.commit()
+    process_pending_reconciliations(db_session)
+
+    schedule_ids_A = [
+        create_schedule(
+            db_session,
+            ScheduleCreate(title=f"外出{i}", start_schedule="2025-11-01T10:00:00", end_schedule="2025-11-01T11:00:00", category_id=category_A.category_id),
+            user_id=test_user.id,
+        ).schedule_id
+        for i in range(5)
+    ]
+    schedule_B = create_schedule(
+        db_session,
+        ScheduleCreate(title="買い物", start_schedule="2025-11-01T10:00:00", end_schedule="2025-11-01T11:00:00", category_id=category_B.category_id),
+        user_id=test_user.id,
+    )
+    # 達成済みの記録は再計算後も維持される
+    completed = db_session.query(EcoActionAchievement).filter(EcoActionAchievement.schedule_id == schedule_ids_A[0]).one()
+    completed.is_completed = True
+    db_session.commit()
+
+    # 内容だけの変更では登録しない
+    eco_action_A.content = "歩いて行く"
+    db_session.commit()
+    assert db_session.query(AchievementReconciliation).count() == 0
+
+    # カテゴリAにエコ活動を追加する
+    db_session.add(EcoActionModel(content="水筒を持っていく", category_id=category_A.category_id))
+    db_session.commit()
+
+    import core.achievement_reconciler
+    chunks = []
+    original = core.achievement_reconciler.reconcile_achievements
+    monkeypatch.setattr(
+        core.achievement_reconciler, "reconcile_achievements",
+        lambda db, category_id, schedule_ids: chunks.append(list(schedule_ids)) or original(db, category_id, schedule_ids),
+    )
+    progress = core.achievement_reconciler.reconciliation_progress
+    completed_before = progress.completed_schedules
+
+    core.achievement_reconciler.reconcile_category(db_session, category_A.category_id, chunk_size=2)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert progress.completed_schedules - completed_before == 5
+
+    for schedule_id in schedule_ids_A:
+        achievements = db_session.query(EcoActionAchievement).filter(EcoActionAchievement.schedule_id == schedule_id).all()
+        assert len(achievements) == 2
+    assert db_session.query(EcoActionAchievement).filter(EcoActionAchievement.achievement_id == completed.achievement_id).one().is_completed
+    # カテゴリBのスケジュールは対象外
+    assert db_session.query(EcoActionAchievement).filter(EcoActionAchievement.schedule_id == schedule_B.schedule_id).count() == 0
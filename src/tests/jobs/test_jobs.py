@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from config import settings
+from core.jobs import JobRegistry, ensure_recurring_jobs, enqueue, run_next_job
+from models.job import Job
+
+@pytest.fixture
+def job_registry(monkeypatch):
+    """テスト用のジョブだけを登録したレジストリに差し替える"""
+    test_registry = JobRegistry()
+    monkeypatch.setattr("core.jobs.registry", test_registry)
+    return test_registry
+
+def test_run_job_success(db_session: Session, job_registry):
+    """登録したジョブが実行され、成功が記録されることを確認"""
+    received = []
+
+    @job_registry.register("test.echo")
+    def echo(db, payload):
+        received.append(payload)
+
+    db_job = enqueue(db_session, "test.echo", payload={"message": "hello"})
+    db_session.commit()
+
+    assert run_next_job(db_session, worker_id="test") is True
+    assert received == [{"message": "hello"}]
+
+    db_session.refresh(db_job)
+    assert db_job.status == "succeeded"
+    assert db_job.attempts == 1
+    assert db_job.finished_at is not None
+    # 実行するジョブがなければFalse
+    assert run_next_job(db_session, worker_id="test") is False
+
+def test_failed_job_is_retried_with_backoff(db_session: Session, job_registry, monkeypatch):
+    """失敗したジョブは変更がロールバックされ、上限回数まで再実行されることを確認"""
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_SECONDS", 60)
+
+    @job_registry.register("test.fail", max_attempts=2)
+    def fail(db, payload):
+        db.add(Job(kind="should-be-rolled-back", payload={}))
+        db.flush()
+        raise RuntimeError("boom")
+
+    db_job = enqueue(db_session, "test.fail")
+    db_session.commit()
+
+    assert run_next_job(db_session, worker_id="test") is True
+    db_session.refresh(db_job)
+    assert db_job.status == "pending"
+    assert db_job.last_error == "boom"
+    assert db_job.run_at > datetime.utcnow() + timedelta(seconds=50)
+    assert db_session.query(Job).filter(Job.kind == "should-be-rolled-back").count() == 0
+
+    # 再実行の時刻までは実行されない
+    assert run_next_job(db_session, worker_id="test") is False
+
+    db_job.run_at = datetime.utcnow()
+    db_session.commit()
+    assert run_next_job(db_session, worker_id="test") is True
+    db_session.refresh(db_job)
+    assert db_job.status == "failed"
+    assert db_job.attempts == 2
+
+def test_scheduled_and_unique_jobs(db_session: Session, job_registry):
+    """実行時刻を指定したジョブは時刻まで実行されず、同じunique_keyのジョブは重複して登録されないことを確認"""
+    @job_registry.register("test.noop")
+    def noop(db, payload):
+        pass
+
+    assert enqueue(db_session, "test.noop", run_at=datetime.utcnow() + timedelta(hours=1), unique_key="noop") is not None
+    assert enqueue(db_session, "test.noop", unique_key="noop") is None
+    db_session.commit()
+
+    assert run_next_job(db_session, worker_id="test") is False
+
+    with pytest.raises(ValueError):
+        enqueue(db_session, "test.unknown")
+
+def test_recurring_job_reschedules_same_row(db_session: Session, job_registry):
+    """定期実行のジョブは、実行後に同じ行が次回の実行待ちに戻ることを確認"""
+    runs = []
+
+    @job_registry.register("test.recurring", every=300)
+    def recurring(db, payload):
+        runs.append(payload)
+
+    # ワーカーごとに呼ばれても1つだけ登録される
+    ensure_recurring_jobs(db_session)
+    ensure_recurring_jobs(db_session)
+    assert db_session.query(Job).count() == 1
+
+    assert run_next_job(db_session, worker_id="test") is True
+    assert run_next_job(db_session, worker_id="test") is False
+    assert len(runs) == 1
+
+    db_job = db_session.query(Job).one()
+    assert db_job.status == "pending"
+    assert db_job.attempts == 0
+    assert db_job.run_at > datetime.utcnow() + timedelta(seconds=290)
+
+def test_stale_running_job_is_reclaimed(db_session: Session, job_registry):
+    """実行中のままロックの期限が切れたジョブ(ワーカーが落ちた場合)は、他のワーカーが再実行することを確認"""
+    runs = []
+
+    @job_registry.register("test.stale")
+    def stale(db, payload):
+        runs.append(payload)
+
+    db_job = enqueue(db_session, "test.stale")
+    db_job.status = "running"
+    db_job.attempts = 1
+    db_job.locked_by = "dead-worker"
+    db_job.locked_until = datetime.utcnow() + timedelta(minutes=5)
+    db_session.commit()
+
+    assert run_next_job(db_session, worker_id="test") is False
+
+    db_job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert run_next_job(db_session, worker_id="test") is True
+    assert len(runs) == 1
+    db_session.refresh(db_job)
+    assert db_job.status == "succeeded"
+    assert db_job.attempts == 2
+
+def test_internal_jobs_endpoint(client, db_session: Session, monkeypatch):
+    """内部APIでジョブの登録と状態の確認ができることを確認"""
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "secret")
+    headers = {"X-Internal-Token": "secret"}
+
+    response = client.post("/internal/jobs", json={"kind": "statistics.overall"}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()["status"] == "pending"
+
+    assert client.post("/internal/jobs", json={"kind": "unknown"}, headers=headers).status_code == 400
+
+    response = client.get("/internal/jobs", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["counts"] == {"pending": 1}
+    assert "refresh_tokens.sweep" in data["kinds"]
+    assert data["jobs"][0]["kind"] == "statistics.overall"
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from core.push import PushHub, _notify_payloads, push_hub
+from models.eco_action import EcoAction
+from models.schedule import Schedule
+
+
+async def _next_events(hub: PushHub, subscriber, count: int) -> list[dict]:
+    """ストリームから、コメント・retry以外のイベントをcount件読む"""
+    stream = hub.stream(subscriber)
+    events = []
+    try:
+        while len(events) < count:
+            message = await asyncio.wait_for(stream.__anext__(), timeout=1)
+            if message.startswith("event:"):
+                events.append(json.loads(message.split("data: ", 1)[1]))
+    finally:
+        await stream.aclose()
+    return events
+
+
+def test_hub_delivers_user_and_broadcast_events():
+    """ユーザーごとのイベントは該当ユーザーの接続にだけ、全体のイベントは全接続に届くことを確認"""
+    async def scenario():
+        hub = PushHub(max_pending=2, heartbeat_seconds=0.05, broadcast_interval_seconds=60)
+        alice, bob = hub.subscribe("alice"), hub.subscribe("bob")
+
+        hub.dispatch({"type": "user_data", "user_id": "alice", "data_version": 1})
+        hub.dispatch({"type": "overall_statistics"})
+        # 間隔内に続いた全体のイベントはまとめられる
+        hub.dispatch({"type": "overall_statistics"})
+        assert [e["type"] for e in await _next_events(hub, alice, 2)] == ["user_data", "overall_statistics"]
+        assert [e["type"] for e in await _next_events(hub, bob, 1)] == ["overall_statistics"]
+        assert not bob.pending
+
+        # 読まれないまま上限を超えたら、溜まったイベントを捨ててresyncを送る
+        for version in range(3):
+            hub.dispatch({"type": "user_data", "user_id": "bob", "data_version": version})
+        assert [e["type"] for e in await _next_events(hub, bob, 1)] == ["resync"]
+
+        hub.unsubscribe(alice)
+        hub.unsubscribe(bob)
+        assert hub.stats()["connections"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_committed_changes_are_pushed(db_session: Session, test_user, another_user, seed_eco_actions):
+    """コミットされたスケジュール・エコ活動の変更だけが通知されることを確認"""
+    category_id = seed_eco_actions[0].category_id
+    user_id = test_user.id
+
+    async def scenario():
+        mine, others = push_hub.subscribe(user_id), push_hub.subscribe(another_user.id)
+        try:
+            start = datetime(2025, 1, 1, 9, 0)
+            db_session.add(Schedule(title="取り消し", start_schedule=start, end_schedule=start, user_id=user_id))
+            db_session.flush()
+            db_session.rollback()
+            assert not mine.pending
+
+            db_session.add(Schedule(title="ゴミ出し", start_schedule=start, end_schedule=start + timedelta(hours=1), user_id=user_id))
+            db_session.commit()
+            events = await _next_events(push_hub, mine, 1)
+            assert events[0]["type"] == "user_data"
+            assert events[0]["user_id"] == str(user_id)
+            assert events[0]["data_version"] >= 1
+            assert not others.pending
+
+            db_session.add(EcoAction(category_id=category_id, content="新しいエコ活動"))
+            db_session.commit()
+            assert "master_data" in [event["type"] for event in await _next_events(push_hub, others, 1)]
+        finally:
+            push_hub.unsubscribe(mine)
+            push_hub.unsubscribe(others)
+
+    asyncio.run(scenario())
+
+
+def test_principal_changes_invalidate_other_workers(db_session: Session, test_user):
+    """アカウントの無効化が、他のワーカーの認証済みユーザーのキャッシュにも通知され、接続には送られないことを確認"""
+    from core.principal_cache import principal_cache
+    from core.push import PENDING_PUSH_EVENTS
+
+    user = db_session.get(type(test_user), test_user.id)
+    principal_cache.set(user)
+    user.is_active = False
+    db_session.flush()
+    events = [e for e in db_session.info[PENDING_PUSH_EVENTS] if e["type"] == "principal"]
+    assert events == [{"type": "principal", "user_ids": [str(test_user.id)]}]
+    db_session.rollback()
+
+    async def scenario():
+        # 別のワーカーからNOTIFYで届いた場合
+        subscriber = push_hub.subscribe(test_user.id)
+        try:
+            principal_cache.set(db_session.get(type(test_user), test_user.id))
+            assert principal_cache.get(db_session, test_user.email) is not None
+            push_hub.receive(json.dumps(events))
+            assert principal_cache.get(db_session, test_user.email) is None
+            assert not subscriber.pending
+        finally:
+            push_hub.unsubscribe(subscriber)
+
+    asyncio.run(scenario())
+
+
+def test_notify_payloads_are_split():
+    """NOTIFYのペイロードの上限を超えないように分けることを確認"""
+    push_events = [{"type": "user_data", "user_id": f"{i:036d}", "data_version": i} for i in range(500)]
+    payloads = _notify_payloads(push_events)
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= 7000 for payload in payloads)
+    assert [event for payload in payloads for event in json.loads(payload)] == push_events
+
+
+def test_push_stream_requires_authentication(client):
+    assert client.get("/push/stream").status_code == 401
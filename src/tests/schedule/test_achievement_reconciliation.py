@@ -0,0 +1,126 @@
+import random
+import uuid
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from models.category import Category
+from models.eco_action import EcoAction
+from models.eco_action_achievement import EcoActionAchievement as AchievementModel
+from models.schedule import Schedule as ScheduleModel
+from crud.helper.schedule_helper import update_achievements_by_update_schedule
+
+def legacy_update_achievements(db: Session, schedule: ScheduleModel) -> None:
+    """変更前の実装(達成記録を全件読み込み、Pythonで差分を取って1件ずつ追加・削除する)"""
+    if not schedule.category_id:
+        return
+    if db.query(Category).filter(Category.category_id == schedule.category_id).first() is None:
+        return
+
+    previous_achievements = db.query(AchievementModel).filter(AchievementModel.schedule_id == schedule.schedule_id).all()
+    previous_eco_actions = [achievement.eco_action for achievement in previous_achievements if achievement.eco_action is not None]
+    eco_actions = db.query(EcoAction).filter(EcoAction.category_id == schedule.category_id).all()
+    if not (previous_eco_actions or eco_actions):
+        return
+
+    for eco_action in eco_actions:
+        if eco_action not in previous_eco_actions:
+            db.add(AchievementModel(schedule_id=schedule.schedule_id, eco_action_id=eco_action.eco_action_id, is_completed=False))
+    for previous_eco_action in previous_eco_actions:
+        if previous_eco_action not in eco_actions:
+            db.delete(next(a for a in previous_achievements if a.eco_action_id == previous_eco_action.eco_action_id))
+
+def _snapshot(db: Session, schedule_id, original_ids: set) -> tuple[set, set]:
+    """(残った達成記録のID・状態, 新しく作成された達成記録のエコ活動ID)を返す"""
+    achievements = db.query(AchievementModel).filter(AchievementModel.schedule_id == schedule_id).all()
+    survivors = {
+        (a.achievement_id, a.eco_action_id, a.is_completed, a.achieved_at)
+        for a in achievements if a.achievement_id in original_ids
+    }
+    created = {(a.eco_action_id, a.is_completed, a.achieved_at) for a in achievements if a.achievement_id not in original_ids}
+    return survivors, created
+
+def _random_case(db: Session, rng: random.Random, user_id) -> ScheduleModel:
+    categories = [Category(category_id=uuid.uuid4(), category_name=f"カテゴリ{uuid.uuid4().hex[:8]}") for _ in range(3)]
+    db.add_all(categories)
+    db.flush()
+    eco_actions = [
+        EcoAction(category_id=rng.choice([category.category_id for category in categories] + [None]), content="エコ活動")
+        for _ in range(rng.randint(0, 8))
+    ]
+    db.add_all(eco_actions)
+    db.flush()
+
+    schedule = ScheduleModel(
+        title="ランダム",
+        user_id=user_id,
+        category_id=rng.choice(categories).category_id,
+        start_schedule=datetime(2025, 11, 1, 10),
+        end_schedule=datetime(2025, 11, 1, 11),
+    )
+    db.add(schedule)
+    db.flush()
+
+    # 既存の達成記録(他のカテゴリのエコ活動・達成済み・エコ活動のないものを混ぜる)
+    for eco_action in rng.sample(eco_actions, rng.randint(0, len(eco_actions))):
+        is_completed = rng.random() < 0.5
+        db.add(AchievementModel(
+            schedule_id=schedule.schedule_id,
+            eco_action_id=eco_action.eco_action_id,
+            is_completed=is_completed,
+            achieved_at=datetime(2025, 11, 1, 12) if is_completed else None,
+        ))
+    if rng.random() < 0.3:
+        db.add(AchievementModel(schedule_id=schedule.schedule_id, eco_action_id=None, is_completed=False))
+    db.commit()
+    return schedule
+
+def test_reconciliation_matches_legacy_implementation(db_session: Session, test_user):
+    """ランダムなデータで、変更前の実装と同じ結果になることを確認"""
+    rng = random.Random(20251101)
+    user_id = test_user.id
+
+    for _ in range(30):
+        schedule = _random_case(db_session, rng, user_id)
+        schedule_id = schedule.schedule_id
+        original_ids = {
+            a.achievement_id for a in db_session.query(AchievementModel).filter(AchievementModel.schedule_id == schedule_id)
+        }
+
+        legacy_update_achievements(db_session, db_session.get(ScheduleModel, schedule_id))
+        db_session.flush()
+        expected = _snapshot(db_session, schedule_id, original_ids)
+        db_session.rollback()
+
+        update_achievements_by_update_schedule(db_session, db_session.get(ScheduleModel, schedule_id))
+        db_session.flush()
+        actual = _snapshot(db_session, schedule_id, original_ids)
+        db_session.commit()
+
+        assert actual == expected
+
+def test_reconciliation_after_category_change(db_session: Session, test_user, seed_categories, seed_eco_actions):
+    """カテゴリを変更すると、古いカテゴリの達成記録が削除され、新しいカテゴリの達成記録が作成されることを確認"""
+    gomi = next(c for c in seed_categories if c.category_name == 'ゴミ出し')
+    idou = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    schedule = ScheduleModel(
+        title="カテゴリ変更",
+        user_id=test_user.id,
+        category_id=gomi.category_id,
+        start_schedule=datetime(2025, 11, 1, 10),
+        end_schedule=datetime(2025, 11, 1, 11),
+    )
+    db_session.add(schedule)
+    db_session.commit()
+    update_achievements_by_update_schedule(db_session, schedule)
+    db_session.commit()
+    assert {a.eco_action.category_id for a in schedule.eco_action_achievements} == {gomi.category_id}
+
+    schedule.category_id = idou.category_id
+    db_session.commit()
+    update_achievements_by_update_schedule(db_session, schedule)
+    db_session.commit()
+
+    achievements = schedule.eco_action_achievements
+    assert len(achievements) == 2
+    assert all(a.eco_action.category_id == idou.category_id and not a.is_completed for a in achievements)
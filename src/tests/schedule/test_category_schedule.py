@@ -124,9 +124,71 @@ def test_delete_schedule_with_achievements(
         EcoActionAchievementModel.schedule_id == schedule_id_to_delete
     ).count()
     assert achievements_after_delete == 0
+    # schedule_idがNULLになって残るのではなく、データベース側で削除されている(ON DELETE CASCADE)
+    assert db_session.query(EcoActionAchievementModel).filter(
+        EcoActionAchievementModel.achievement_id.in_([a.achievement_id for a in achievements_before_delete])
+    ).count() == 0
 
     # 念のため、スケジュール本体も削除されていることを確認
     deleted_schedule_from_db = db_session.query(ScheduleModel).filter(
         ScheduleModel.schedule_id == schedule_id_to_delete
     ).first()
-    assert deleted_schedule_from_db is None
\ No newline at end of file
+    assert deleted_schedule_from_db is None
+def test_update_schedule_category(
+        client,
+        db_session: Session,
+        test_user,
+        authorization_header,
+        seed_categories,
+        seed_eco_actions
+):
+    """
+    カテゴリを変更した場合だけ、新しいカテゴリに合わせて達成記録が作り直されることを確認
+    """
+    categories = {category.category_name: category.category_id for category in seed_categories}
+    created = client.post(
+        f"/users/{test_user.id}/schedules/",
+        headers=authorization_header,
+        json={
+            "title": "通学", "start_schedule": "2025-11-01T10:00:00", "end_schedule": "2025-11-01T11:00:00",
+            "category_id": str(categories['通勤・通学']),
+        },
+    ).json()
+    schedule_id = created["schedule_id"]
+    achievement = created["eco_action_achievements"][0]
+    client.patch(
+        "/achievements/status/bulk",
+        headers=authorization_header,
+        json={"updates": [{"schedule_id": schedule_id, "eco_action_id": achievement["eco_action_id"], "is_completed": True}]},
+    )
+
+    # タイトルや同じカテゴリの指定では、達成記録はそのまま
+    response = client.put(
+        f"/schedules/{schedule_id}", headers=authorization_header,
+        json={"title": "通学(変更)", "category_id": str(categories['通勤・通学'])},
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "通学(変更)"
+    assert {(a["achievement_id"], a["is_completed"]) for a in response.json()["eco_action_achievements"]} == {
+        (a["achievement_id"], a["achievement_id"] == achievement["achievement_id"]) for a in created["eco_action_achievements"]
+    }
+
+    # 新しいカテゴリのエコ活動の達成記録になる
+    response = client.put(f"/schedules/{schedule_id}", headers=authorization_header, json={"category_id": str(categories['ゴミ出し'])})
+    assert response.status_code == 200
+    assert response.json()["category"]["category_name"] == 'ゴミ出し'
+    eco_action_ids = {a["eco_action_id"] for a in response.json()["eco_action_achievements"]}
+    assert eco_action_ids == {
+        str(eco_action.eco_action_id) for eco_action in seed_eco_actions if eco_action.category_id == categories['ゴミ出し']
+    }
+
+    # カテゴリを外すと達成記録はなくなる
+    response = client.put(f"/schedules/{schedule_id}", headers=authorization_header, json={"category_id": None})
+    assert response.status_code == 200
+    assert response.json()["eco_action_achievements"] == []
+
+    # 存在しないカテゴリ・スケジュール
+    response = client.put(f"/schedules/{schedule_id}", headers=authorization_header, json={"category_id": str(uuid.uuid4())})
+    assert response.status_code == 400
+    response = client.put(f"/schedules/{uuid.uuid4()}", headers=authorization_header, json={"title": "なし"})
+    assert response.status_code == 404
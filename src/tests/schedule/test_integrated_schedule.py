@@ -80,7 +80,9 @@ def test_get_user_schedules(client, db_session: Session, test_user, authorizatio
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 3
-    assert data[0]["title"] == "タスク1"
+    # 開始日時が同じスケジュールはschedule_id順に並ぶ
+    expected = sorted([schedule1, schedule2, schedule3], key=lambda schedule: str(schedule.schedule_id))
+    assert [schedule["title"] for schedule in data] == [schedule.title for schedule in expected]
 
 def test_get_single_schedule(client, db_session: Session, test_user, authorization_header):
     """単一のスケジュールがIDで取得できることを確認"""
@@ -0,0 +1,75 @@
+import uuid
+
+from models.schedule import Schedule as ScheduleModel
+from models.eco_action_achievement import EcoActionAchievement as AchievementModel
+
+def _schedule(title: str, category_id=None, day: int = 1) -> dict:
+    schedule = {
+        "title": title,
+        "start_schedule": f"2025-11-{day:02d}T10:00:00",
+        "end_schedule": f"2025-11-{day:02d}T11:00:00",
+    }
+    if category_id:
+        schedule["category_id"] = str(category_id)
+    return schedule
+
+def test_bulk_create_schedules(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories, query_counter):
+    """スケジュールと達成記録がまとめて作成され、リクエストの順に返ることを確認"""
+    user_id = test_user.id
+    idou_category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    schedules = [_schedule(f"授業{i}", idou_category.category_id, day=i + 1) for i in range(20)]
+
+    # 件数に関係なく、決まった回数のSQLで作成できること
+    with query_counter.limit(11):
+        response = client.post(f"/users/{user_id}/schedules/bulk", json={"schedules": schedules}, headers=authorization_header)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["errors"] == []
+    assert [schedule["title"] for schedule in data["created"]] == [f"授業{i}" for i in range(20)]
+    # 通勤・通学のエコ活動は2件
+    assert all(len(schedule["eco_action_achievements"]) == 2 for schedule in data["created"])
+    assert all(schedule["category"]["category_name"] == '通勤・通学' for schedule in data["created"])
+    assert db_session.query(AchievementModel).count() == 40
+
+def test_bulk_create_reports_errors_per_item(client, db_session, test_user, authorization_header, seed_categories):
+    """不正なスケジュールだけがerrorsで返され、残りは作成されることを確認"""
+    user_id = test_user.id
+    schedules = [
+        _schedule("正常"),
+        _schedule("存在しないカテゴリ", uuid.uuid4()),
+        {"title": "日時なし"},
+    ]
+
+    response = client.post(f"/users/{user_id}/schedules/bulk", json={"schedules": schedules}, headers=authorization_header)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert [schedule["title"] for schedule in data["created"]] == ["正常"]
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert data["errors"][0]["detail"] == "Invalid category_id"
+    assert db_session.query(ScheduleModel).count() == 1
+
+def test_bulk_create_all_or_nothing(client, db_session, test_user, authorization_header, seed_categories):
+    """all_or_nothingの場合、1件でもエラーがあれば何も作成しないことを確認"""
+    user_id = test_user.id
+    schedules = [_schedule("正常"), _schedule("存在しないカテゴリ", uuid.uuid4())]
+
+    response = client.post(
+        f"/users/{user_id}/schedules/bulk",
+        json={"schedules": schedules, "all_or_nothing": True},
+        headers=authorization_header,
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == [{"index": 1, "detail": "Invalid category_id"}]
+    assert db_session.query(ScheduleModel).count() == 0
+
+def test_bulk_create_for_another_user_is_forbidden(client, db_session, test_user, another_user, authorization_header):
+    """ログインユーザー以外のスケジュールはまとめて作成できないことを確認"""
+    response = client.post(
+        f"/users/{another_user.id}/schedules/bulk", json={"schedules": [_schedule("他人の予定")]}, headers=authorization_header
+    )
+
+    assert response.status_code == 403
+    assert db_session.query(ScheduleModel).count() == 0
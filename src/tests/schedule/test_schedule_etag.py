@@ -0,0 +1,94 @@
+from core.achievement_reconciler import reconcile_category
+from models.category import Category
+from models.eco_action import EcoAction
+from models.user import User
+
+
+def _schedule(title: str, category_id=None) -> dict:
+    schedule = {"title": title, "start_schedule": "2025-11-01T10:00:00", "end_schedule": "2025-11-01T11:00:00"}
+    if category_id:
+        schedule["category_id"] = str(category_id)
+    return schedule
+
+
+def _get(client, url: str, headers: dict, etag: str | None = None):
+    if etag is not None:
+        headers = {**headers, "If-None-Match": etag}
+    return client.get(url, headers=headers)
+
+
+def test_schedule_list_etag(client, db_session, test_user, another_user, authorization_header, seed_eco_actions, seed_categories):
+    """変更がなければ304を返し、スケジュール・達成記録が変わればETagが変わることを確認"""
+    url = f"/users/{test_user.id}/schedules"
+    category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    created = client.post(url, json=_schedule("授業", category.category_id), headers=authorization_header).json()
+
+    response = _get(client, url, authorization_header)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = _get(client, url, authorization_header, etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    # 弱いETag・複数のETagの指定にも対応する
+    assert _get(client, url, authorization_header, f'"other", W/{etag}').status_code == 304
+
+    # クエリパラメータが違えば別のETag
+    assert _get(client, f"{url}?limit=1", authorization_header, etag).status_code == 200
+
+    # 他のユーザーの変更ではETagは変わらない
+    client.post(f"/users/{another_user.id}/schedules", json=_schedule("他人の予定"), headers=authorization_header)
+    assert _get(client, url, authorization_header, etag).status_code == 304
+
+    # 達成状態の一括更新(flushを経由しない更新)でETagが変わる
+    achievement = created["eco_action_achievements"][0]
+    client.patch(
+        "/achievements/status/bulk",
+        json={"updates": [{"schedule_id": achievement["schedule_id"], "eco_action_id": achievement["eco_action_id"], "is_completed": True}]},
+        headers=authorization_header,
+    )
+    response = _get(client, url, authorization_header, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+
+    # スケジュールの更新でETagが変わる
+    client.put(f"/schedules/{created['schedule_id']}", json={"title": "休講"}, headers=authorization_header)
+    response = _get(client, url, authorization_header, etag)
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "休講"
+
+
+def test_schedule_etag_changes_with_master_data(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories):
+    """レスポンスに含まれるカテゴリ名や、エコ活動の追加に伴う達成記録の変更でもETagが変わることを確認"""
+    url = "/users/me/schedules?from=2025-11-01T00:00:00&to=2025-12-01T00:00:00"
+    category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    client.post(f"/users/{test_user.id}/schedules", json=_schedule("授業", category.category_id), headers=authorization_header)
+    etag = _get(client, url, authorization_header).headers["ETag"]
+
+    db_session.get(Category, category.category_id).category_name = "通学"
+    db_session.commit()
+    response = _get(client, url, authorization_header, etag)
+    assert response.status_code == 200
+    assert response.json()[0]["category"]["category_name"] == "通学"
+    etag = response.headers["ETag"]
+
+    # バックグラウンドの達成記録の再計算でもETagが変わる
+    db_session.add(EcoAction(category_id=category.category_id, content="自転車で通学する", money_saved=100, co2_reduction=0.5))
+    db_session.commit()
+    version = db_session.query(User.data_version).filter(User.id == test_user.id).scalar()
+    reconcile_category(db_session, category.category_id)
+    assert db_session.query(User.data_version).filter(User.id == test_user.id).scalar() > version
+    assert _get(client, url, authorization_header, etag).status_code == 200
+
+
+def test_master_data_and_statistics_etag(client, authorization_header, seed_eco_actions, seed_overall_statistics):
+    """マスターデータと全体の統計も、変更がなければ304を返すことを確認"""
+    for url in ("/categories", "/eco_actions", "/overall_statistics"):
+        response = _get(client, url, authorization_header)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert _get(client, url, authorization_header, etag).status_code == 304
+        assert _get(client, url, authorization_header, '"stale"').status_code == 200
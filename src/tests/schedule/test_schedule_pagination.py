@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from models.schedule import Schedule as ScheduleModel
+
+def _create_schedules(db_session, user_id, count: int) -> list[ScheduleModel]:
+    # 開始日時が同じスケジュールも含め、schedule_idでの並び替えも確認できるようにする
+    start = datetime(2025, 11, 1, 10, 0)
+    schedules = [
+        ScheduleModel(
+            title=f"タスク{i}",
+            start_schedule=start + timedelta(days=i // 3),
+            end_schedule=start + timedelta(days=i // 3, hours=1),
+            user_id=user_id,
+        )
+        for i in range(count)
+    ]
+    db_session.add_all(schedules)
+    db_session.commit()
+    return sorted(schedules, key=lambda schedule: (schedule.start_schedule, str(schedule.schedule_id)))
+
+def test_cursor_pagination_returns_all_schedules_in_order(client, db_session, test_user, authorization_header):
+    """カーソルをたどると、全てのスケジュールが重複・欠落なく開始日時順に取得できることを確認"""
+    user_id = test_user.id
+    expected = [str(schedule.schedule_id) for schedule in _create_schedules(db_session, user_id, count=10)]
+
+    received = []
+    params = {"limit": 4}
+    while True:
+        response = client.get(f"/users/{user_id}/schedules", params=params, headers=authorization_header)
+        assert response.status_code == 200
+        received.extend(schedule["schedule_id"] for schedule in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 4, "cursor": cursor}
+
+    assert received == expected
+
+def test_last_page_has_no_cursor(client, db_session, test_user, authorization_header):
+    """ちょうど最後まで取得した場合は、次のカーソルを返さないことを確認"""
+    user_id = test_user.id
+    _create_schedules(db_session, user_id, count=3)
+
+    response = client.get(f"/users/{user_id}/schedules", params={"limit": 3}, headers=authorization_header)
+
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert "X-Next-Cursor" not in response.headers
+
+def test_legacy_skip_pagination(client, db_session, test_user, authorization_header):
+    """skipを指定した場合は、従来どおりOFFSETで取得できることを確認"""
+    user_id = test_user.id
+    expected = [str(schedule.schedule_id) for schedule in _create_schedules(db_session, user_id, count=5)]
+
+    response = client.get(f"/users/{user_id}/schedules", params={"skip": 2, "limit": 2}, headers=authorization_header)
+
+    assert response.status_code == 200
+    assert [schedule["schedule_id"] for schedule in response.json()] == expected[2:4]
+
+def test_invalid_cursor(client, test_user, authorization_header):
+    """不正なカーソルや、skipとカーソルの併用は400になることを確認"""
+    url = f"/users/{test_user.id}/schedules"
+
+    response = client.get(url, params={"cursor": "not-a-cursor"}, headers=authorization_header)
+    assert response.status_code == 400
+
+    response = client.get(url, params={"cursor": "not-a-cursor", "skip": 1}, headers=authorization_header)
+    assert response.status_code == 400
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.master_data import master_data_cache
+from models.schedule import Schedule as ScheduleModel
+from models.eco_action_achievement import EcoActionAchievement as AchievementModel
+
+# 1リクエストで発行してよいSQLの上限
+# スケジュールの件数に関係なく、認証(ユーザー・認証情報)、ETag用の変更番号、スケジュールとカテゴリ(JOIN)、達成記録の5件で収まること
+# (カテゴリ・エコ活動はワーカーのキャッシュから読むので数えない)
+MAX_QUERIES_LIST = 5
+MAX_QUERIES_DETAIL = 4
+
+def _create_schedules(db_session, user_id, categories, eco_actions, count: int) -> list[ScheduleModel]:
+    """カテゴリと達成記録を持つスケジュールをまとめて作成する"""
+    start = datetime(2025, 11, 1, 10, 0)
+    schedules = [
+        ScheduleModel(
+            title=f"タスク{i}",
+            start_schedule=start + timedelta(days=i),
+            end_schedule=start + timedelta(days=i, hours=1),
+            user_id=user_id,
+            category_id=categories[i % len(categories)].category_id,
+        )
+        for i in range(count)
+    ]
+    db_session.add_all(schedules)
+    db_session.flush()
+    for schedule in schedules:
+        db_session.add_all(
+            AchievementModel(schedule_id=schedule.schedule_id, eco_action_id=eco_action.eco_action_id, is_completed=False)
+            for eco_action in eco_actions if eco_action.category_id == schedule.category_id
+        )
+    db_session.commit()
+    return schedules
+
+def test_list_schedules_query_count(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories, query_counter):
+    """スケジュール一覧の取得で、スケジュールごとにSQLが発行されないことを確認"""
+    user_id = test_user.id
+    _create_schedules(db_session, user_id, seed_categories, seed_eco_actions, count=30)
+    master_data_cache.get(db_session)
+
+    with query_counter.limit(MAX_QUERIES_LIST):
+        response = client.get(f"/users/{user_id}/schedules", headers=authorization_header)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 30
+    assert all(schedule["category"] is not None for schedule in data)
+    assert sum(len(schedule["eco_action_achievements"]) for schedule in data) > 0
+
+def test_get_schedule_query_count(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories, query_counter):
+    """単一のスケジュールの取得で発行されるSQLが上限以下であることを確認"""
+    schedule_id = _create_schedules(db_session, test_user.id, seed_categories, seed_eco_actions, count=2)[1].schedule_id
+
+    with query_counter.limit(MAX_QUERIES_DETAIL):
+        response = client.get(f"/schedules/{schedule_id}", headers=authorization_header)
+
+    assert response.status_code == 200
+    assert len(response.json()["eco_action_achievements"]) == 2
+
+def test_crud_list_loads_relationships_eagerly(db_session, test_user, seed_eco_actions, seed_categories, query_counter):
+    """同期版のcrud.scheduleでも、レスポンスの変換時に追加のSQLが発行されないことを確認"""
+    import crud.schedule
+    from schemas.schedule import ScheduleResponse
+
+    user_id = test_user.id
+    _create_schedules(db_session, user_id, seed_categories, seed_eco_actions, count=10)
+    db_session.expire_all()
+
+    with query_counter.limit(2):
+        schedules = crud.schedule.get_schedules_by_user(db_session, user_id=user_id)
+        [ScheduleResponse.model_validate(schedule) for schedule in schedules]
+
+# スケジュールの更新で発行してよいSQLの上限(認証の2件と、更新後のスケジュールの取得の2件を含む)
+# タイトル・説明・日時の変更は、変更番号の更新とスケジュールのUPDATEの2件だけで、達成記録は再計算しない
+# カテゴリの変更は、変更前のカテゴリの取得と、達成記録の削除・作成の3件が加わる
+MAX_QUERIES_UPDATE = {
+    "title": 6,
+    "description": 6,
+    "time": 6,
+    "same_category": 5,
+    "category": 9,
+}
+
+def _update_data(kind: str, categories, schedule: ScheduleModel) -> dict:
+    if kind == "title":
+        return {"title": "変更後"}
+    if kind == "description":
+        return {"description": "説明"}
+    if kind == "time":
+        return {"start_schedule": "2025-12-01T09:00:00", "end_schedule": "2025-12-01T10:00:00"}
+    if kind == "same_category":
+        return {"category_id": str(schedule.category_id)}
+    return {"category_id": str(next(c.category_id for c in categories if c.category_id != schedule.category_id))}
+
+@pytest.mark.parametrize("kind", list(MAX_QUERIES_UPDATE))
+def test_update_schedule_query_count(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories, query_counter, kind):
+    """スケジュールの更新で、変更したフィールドに応じたSQLだけが発行されることを確認"""
+    schedule = _create_schedules(db_session, test_user.id, seed_categories, seed_eco_actions, count=1)[0]
+    schedule_id = schedule.schedule_id
+    update_data = _update_data(kind, seed_categories, schedule)
+    master_data_cache.get(db_session)
+
+    with query_counter.limit(MAX_QUERIES_UPDATE[kind]):
+        response = client.put(f"/schedules/{schedule_id}", json=update_data, headers=authorization_header)
+
+    assert response.status_code == 200
+    statements = " ".join(query_counter.statements).upper()
+    assert ("EXISTS" in statements) == (kind == "category")
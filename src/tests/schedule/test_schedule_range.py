@@ -0,0 +1,121 @@
+from datetime import datetime
+
+from models.schedule import Schedule as ScheduleModel
+from models.eco_action_achievement import EcoActionAchievement as AchievementModel
+
+def _create_schedule(db_session, user_id, title: str, start: str, end: str, all_day: bool = False):
+    db_session.add(ScheduleModel(
+        title=title,
+        start_schedule=datetime.fromisoformat(start),
+        end_schedule=datetime.fromisoformat(end),
+        all_day=all_day,
+        user_id=user_id,
+    ))
+
+def _titles(response) -> list[str]:
+    assert response.status_code == 200
+    return [schedule["title"] for schedule in response.json()]
+
+def test_range_returns_overlapping_schedules(client, db_session, test_user, authorization_header, another_user):
+    """指定した期間と重なるログインユーザーのスケジュールだけを開始日時順に返すことを確認"""
+    user_id = test_user.id
+    _create_schedule(db_session, user_id, "前月", "2025-10-20T10:00:00", "2025-10-20T11:00:00")
+    _create_schedule(db_session, user_id, "月をまたぐ", "2025-10-31T23:00:00", "2025-11-01T01:00:00")
+    _create_schedule(db_session, user_id, "月中", "2025-11-15T10:00:00", "2025-11-15T11:00:00")
+    _create_schedule(db_session, user_id, "境界で終わる", "2025-10-31T22:00:00", "2025-11-01T00:00:00")
+    _create_schedule(db_session, user_id, "翌月", "2025-12-01T00:00:00", "2025-12-01T01:00:00")
+    _create_schedule(db_session, another_user.id, "他のユーザー", "2025-11-15T10:00:00", "2025-11-15T11:00:00")
+    db_session.commit()
+
+    response = client.get(
+        "/users/me/schedules",
+        params={"from": "2025-11-01T00:00:00", "to": "2025-12-01T00:00:00"},
+        headers=authorization_header,
+    )
+
+    assert _titles(response) == ["月をまたぐ", "月中"]
+
+def test_range_includes_multi_day_all_day_schedules(client, db_session, test_user, authorization_header):
+    """複数日の終日スケジュールは、終了日を含めて重なりを判定することを確認"""
+    user_id = test_user.id
+    # 10/30〜11/1の終日(終了日時は終了日の0時で保存される)
+    _create_schedule(db_session, user_id, "連休", "2025-10-30T00:00:00", "2025-11-01T00:00:00", all_day=True)
+    # 11/8の終日(時刻付きで保存されていても日単位で扱う)
+    _create_schedule(db_session, user_id, "終日", "2025-11-08T09:00:00", "2025-11-08T09:00:00", all_day=True)
+    _create_schedule(db_session, user_id, "前週の終日", "2025-10-29T00:00:00", "2025-10-31T00:00:00", all_day=True)
+    db_session.commit()
+
+    # 11/1〜11/7の週
+    response = client.get(
+        "/users/me/schedules",
+        params={"from": "2025-11-01T00:00:00", "to": "2025-11-08T00:00:00"},
+        headers=authorization_header,
+    )
+    assert _titles(response) == ["連休"]
+
+    # 11/8の日
+    response = client.get(
+        "/users/me/schedules",
+        params={"from": "2025-11-08T00:00:00", "to": "2025-11-09T00:00:00"},
+        headers=authorization_header,
+    )
+    assert _titles(response) == ["終日"]
+
+def test_range_validation(client, test_user, authorization_header):
+    """期間の指定が不正な場合は400になることを確認"""
+    response = client.get(
+        "/users/me/schedules",
+        params={"from": "2025-11-01T00:00:00", "to": "2025-11-01T00:00:00"},
+        headers=authorization_header,
+    )
+    assert response.status_code == 400
+
+    response = client.get(
+        "/users/me/schedules",
+        params={"from": "2025-01-01T00:00:00", "to": "2026-06-01T00:00:00"},
+        headers=authorization_header,
+    )
+    assert response.status_code == 400
+
+def test_delete_schedules_in_range(client, db_session, test_user, authorization_header, another_user, seed_categories, seed_eco_actions, query_counter):
+    """開始日時が期間内のログインユーザーのスケジュールと達成記録が、まとめて削除されることを確認"""
+    category_id = next(c.category_id for c in seed_categories if c.category_name == '通勤・通学')
+    week = {"from": "2025-11-03T00:00:00", "to": "2025-11-10T00:00:00"}
+    created = {}
+    for title, start, end in [
+        ("前の週から続く", "2025-11-02T23:00:00", "2025-11-03T01:00:00"),
+        ("月曜", "2025-11-03T00:00:00", "2025-11-03T01:00:00"),
+        ("日曜", "2025-11-09T23:00:00", "2025-11-10T01:00:00"),
+        ("翌週", "2025-11-10T00:00:00", "2025-11-10T01:00:00"),
+    ]:
+        response = client.post(
+            f"/users/{test_user.id}/schedules", headers=authorization_header,
+            json={"title": title, "start_schedule": start, "end_schedule": end, "category_id": str(category_id)},
+        )
+        created[title] = response.json()["schedule_id"]
+    _create_schedule(db_session, another_user.id, "他のユーザー", "2025-11-05T10:00:00", "2025-11-05T11:00:00")
+    db_session.commit()
+    cursor = client.get("/users/me/schedules/changes", headers=authorization_header).json()["cursor"]
+
+    # 認証の2件と、変更番号の更新・スケジュールのDELETE・削除記録のINSERTの3件(達成記録は外部キーで削除される)
+    with query_counter.limit(5):
+        response = client.request("DELETE", "/users/me/schedules", params=week, headers=authorization_header)
+
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted_schedule_ids"]) == sorted([created["月曜"], created["日曜"]])
+    assert _titles(client.get("/users/me/schedules", params={"from": "2025-11-01T00:00:00", "to": "2025-12-01T00:00:00"}, headers=authorization_header)) == [
+        "前の週から続く", "翌週",
+    ]
+    remaining = {str(a.schedule_id) for a in db_session.query(AchievementModel).all()}
+    assert remaining == {created["前の週から続く"], created["翌週"]}
+    assert db_session.query(ScheduleModel).filter(ScheduleModel.user_id == another_user.id).count() == 1
+
+    # 差分同期で削除が伝わる
+    changes = client.get("/users/me/schedules/changes", params={"cursor": cursor}, headers=authorization_header).json()
+    assert sorted(changes["deleted_schedule_ids"]) == sorted([created["月曜"], created["日曜"]])
+
+    # 削除するものがなければ空のリストを返す
+    response = client.request("DELETE", "/users/me/schedules", params=week, headers=authorization_header)
+    assert response.json() == {"deleted_schedule_ids": []}
+    response = client.request("DELETE", "/users/me/schedules", params={"from": week["to"], "to": week["from"]}, headers=authorization_header)
+    assert response.status_code == 400
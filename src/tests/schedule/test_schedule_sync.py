@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+from core.achievement_reconciler import reconcile_category
+from crud.sync import delete_expired_tombstones
+from models.eco_action import EcoAction
+from models.sync_tombstone import SyncTombstone
+
+URL = "/users/me/schedules/changes"
+
+
+def _schedule(title: str, category_id=None, day: int = 1) -> dict:
+    schedule = {"title": title, "start_schedule": f"2025-11-{day:02d}T10:00:00", "end_schedule": f"2025-11-{day:02d}T11:00:00"}
+    if category_id:
+        schedule["category_id"] = str(category_id)
+    return schedule
+
+
+def _sync(client, headers: dict, cursor: str | None = None, limit: int = 100) -> dict:
+    params = {"limit": limit}
+    if cursor is not None:
+        params["cursor"] = cursor
+    response = client.get(URL, params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_schedule_changes_since_cursor(client, db_session, test_user, another_user, authorization_header, seed_eco_actions, seed_categories):
+    """カーソル以降に作成・変更・削除されたスケジュールだけが返ることを確認"""
+    category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    schedules_url = f"/users/{test_user.id}/schedules"
+    first = client.post(schedules_url, json=_schedule("授業1", category.category_id), headers=authorization_header).json()
+    second = client.post(schedules_url, json=_schedule("授業2", day=2), headers=authorization_header).json()
+    client.post(f"/users/{another_user.id}/schedules", json=_schedule("他人の予定"), headers=authorization_header)
+
+    # 初回は全てのスケジュール
+    data = _sync(client, authorization_header)
+    assert {s["schedule_id"] for s in data["schedules"]} == {first["schedule_id"], second["schedule_id"]}
+    assert data["deleted_schedule_ids"] == []
+    assert data["has_more"] is False
+    cursor = data["cursor"]
+
+    # 変更がなければ何も返らない
+    assert _sync(client, authorization_header, cursor)["schedules"] == []
+
+    # 達成状態の一括更新で、スケジュールが達成記録ごと返る
+    achievement = first["eco_action_achievements"][0]
+    client.patch(
+        "/achievements/status/bulk",
+        json={"updates": [{"schedule_id": achievement["schedule_id"], "eco_action_id": achievement["eco_action_id"], "is_completed": True}]},
+        headers=authorization_header,
+    )
+    data = _sync(client, authorization_header, cursor)
+    assert [s["schedule_id"] for s in data["schedules"]] == [first["schedule_id"]]
+    assert any(a["is_completed"] for a in data["schedules"][0]["eco_action_achievements"])
+    cursor = data["cursor"]
+
+    # 更新と削除
+    client.put(f"/schedules/{first['schedule_id']}", json={"title": "休講"}, headers=authorization_header)
+    client.delete(f"/schedules/{second['schedule_id']}", headers=authorization_header)
+    data = _sync(client, authorization_header, cursor)
+    assert [s["title"] for s in data["schedules"]] == ["休講"]
+    assert data["deleted_schedule_ids"] == [second["schedule_id"]]
+    assert data["schedules"][0]["sync_version"] > 0
+    assert db_session.query(SyncTombstone).filter(SyncTombstone.user_id == another_user.id).count() == 0
+
+
+def test_schedule_changes_are_paginated(client, db_session, test_user, authorization_header):
+    """変更と削除が、変更番号の順にlimit件ずつ返ることを確認"""
+    schedules_url = f"/users/{test_user.id}/schedules"
+    cursor = _sync(client, authorization_header)["cursor"]
+
+    # 一括作成した3件は同じ変更番号になる
+    created = client.post(
+        f"{schedules_url}/bulk", json={"schedules": [_schedule(f"予定{i}", day=i + 1) for i in range(3)]}, headers=authorization_header
+    ).json()["created"]
+    client.delete(f"/schedules/{created[0]['schedule_id']}", headers=authorization_header)
+    created.append(client.post(schedules_url, json=_schedule("追加"), headers=authorization_header).json())
+
+    schedule_ids, deleted_ids = [], []
+    for _ in range(10):
+        data = _sync(client, authorization_header, cursor, limit=2)
+        assert len(data["schedules"]) + len(data["deleted_schedule_ids"]) <= 2
+        schedule_ids += [s["schedule_id"] for s in data["schedules"]]
+        deleted_ids += data["deleted_schedule_ids"]
+        cursor = data["cursor"]
+        if not data["has_more"]:
+            break
+
+    assert sorted(schedule_ids) == sorted(s["schedule_id"] for s in created[1:])
+    assert deleted_ids == [created[0]["schedule_id"]]
+    assert _sync(client, authorization_header, cursor) == {"schedules": [], "deleted_schedule_ids": [], "cursor": cursor, "has_more": False, "reset": False}
+
+
+def test_reconciliation_marks_schedules_changed(client, db_session, test_user, authorization_header, seed_eco_actions, seed_categories):
+    """エコ活動の追加に伴う達成記録の再計算も、差分として返ることを確認"""
+    category = next(c for c in seed_categories if c.category_name == '通勤・通学')
+    client.post(f"/users/{test_user.id}/schedules", json=_schedule("授業", category.category_id), headers=authorization_header)
+    cursor = _sync(client, authorization_header)["cursor"]
+
+    db_session.add(EcoAction(category_id=category.category_id, content="自転車で通学する"))
+    db_session.commit()
+    reconcile_category(db_session, category.category_id)
+
+    data = _sync(client, authorization_header, cursor)
+    assert len(data["schedules"]) == 1
+    assert len(data["schedules"][0]["eco_action_achievements"]) == 3
+
+
+def test_schedule_changes_rejects_invalid_cursor(client, authorization_header):
+    assert client.get(URL, params={"cursor": "invalid"}, headers=authorization_header).status_code == 400
+
+
+def test_expired_tombstones_are_cleaned_up_and_old_cursors_reset(client, db_session, test_user, authorization_header):
+    """保持期間を過ぎた削除記録は削除され、それより前のカーソルでは全件の取り直し(reset)になることを確認"""
+    schedules_url = f"/users/{test_user.id}/schedules"
+    kept = client.post(schedules_url, json=_schedule("残す"), headers=authorization_header).json()
+    removed = client.post(schedules_url, json=_schedule("消す", day=2), headers=authorization_header).json()
+    old_cursor = _sync(client, authorization_header)["cursor"]
+
+    client.delete(f"/schedules/{removed['schedule_id']}", headers=authorization_header)
+    recent_cursor = _sync(client, authorization_header, old_cursor)["cursor"]
+
+    # 保持期間を過ぎた削除記録をジョブで削除する
+    db_session.query(SyncTombstone).update({SyncTombstone.deleted_at: datetime.utcnow() - timedelta(days=31)})
+    db_session.commit()
+    assert delete_expired_tombstones(db_session, older_than=datetime.utcnow() - timedelta(days=30)) == 1
+    assert db_session.query(SyncTombstone).count() == 0
+
+    # 削除を受け取っていないカーソルでは、全件を返して置き換えさせる
+    data = _sync(client, authorization_header, old_cursor)
+    assert data["reset"] is True
+    assert [s["schedule_id"] for s in data["schedules"]] == [kept["schedule_id"]]
+    assert data["deleted_schedule_ids"] == []
+
+    # 取り直した後のカーソルと、削除を受け取った後のカーソルは通常の差分同期になる
+    assert _sync(client, authorization_header, data["cursor"])["reset"] is False
+    data = _sync(client, authorization_header, recent_cursor)
+    assert data["reset"] is False
+    assert data["schedules"] == []